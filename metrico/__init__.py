@@ -1,6 +1,7 @@
 from logging import getLogger
 
 from metrico.database import MetricoDB
+from metrico.database.aio import AsyncMetricoDB
 from metrico.utils.config import MetricoConfig
 
 logger = getLogger(__name__)
@@ -24,4 +25,4 @@ except:
 
 
 __version__ = "0.0.1"
-__all__ = ["MetricoConfig", "MetricoDB", "Hunter", "Analyzer"]
+__all__ = ["MetricoConfig", "MetricoDB", "AsyncMetricoDB", "Hunter", "Analyzer"]
@@ -1,11 +1,16 @@
 from metrico.database import models
+from metrico.database.rollup import iter_segments
+from metrico.schemas import RollupPeriod
 
 
 class Analyzer:
     ...
 
 
-def get_lost(media: models.Media):
+def get_lost(media: models.Media, period: RollupPeriod | None = None):
+    if period is not None:
+        return get_lost_rollup(media, period)
+
     last_stats, lost = None, [0, 0, 0]
     for stat in media.stats:
         if last_stats:
@@ -21,3 +26,15 @@ def get_lost(media: models.Media):
         last_stats = [stat.comments, stat.likes, stat.views]
 
     return lost
+
+
+def get_lost_rollup(media: models.Media, period: RollupPeriod):
+    last_stats, lost = None, [0, 0, 0]
+    for first, last, segment_lost in iter_segments(media, period):
+        for i in range(3):
+            lost[i] += segment_lost[i]
+            if last_stats and last_stats[i] is not None and first[i] is not None and first[i] < last_stats[i]:
+                lost[i] += last_stats[i] - first[i]
+        last_stats = last
+
+    return lost
@@ -5,9 +5,11 @@ from rich.table import Column, Table
 
 from metrico import Hunter
 from metrico.analyze import get_lost
-from metrico.cli.utils import MetricoBasicFilterArgumentParser, find_index
+from metrico.cli.utils import MetricoBasicFilterArgumentParser, find_index, print_next_cursor
 from metrico.database import MetricoDB
 from metrico.database.query import AccountOrder, AccountQuery
+from metrico.database.rollup import get_stats
+from metrico.schemas import RollupPeriod
 from metrico.utils.config import MetricoConfig
 from metrico.utils.misc import update_list
 
@@ -40,9 +42,9 @@ def list_accounts(config: MetricoConfig, args):
         # row_styles=["magenta", "white on magenta dim"],
     )
     db = MetricoDB(config=config)
+    account_query, account = AccountQuery.from_namespace(args), None
     with Live(table, refresh_per_second=4):
-        account_query = AccountQuery.from_namespace(args)
-        for account in db.iter_query(account_query):
+        for account in db.iter_query(account_query, yield_per=100):
             values = [
                 f"{account.id}",
                 f"{account.status}",
@@ -57,33 +59,34 @@ def list_accounts(config: MetricoConfig, args):
                 values += [
                     f"{account.stats.count():>3}",
                     f"{account.info.count():>3}",
-                    f"{account.comments.count()}",
-                    f"{account.medias.count()}",
-                    f"{account.followers.count()}",
-                    f"{account.subscriptions.count()}",
+                    f"{account.comments_count}",
+                    f"{account.medias_count}",
+                    f"{account.followers_count}",
+                    f"{account.subscriptions_count}",
                 ]
-            if args.show_dt and account.stats.count():
-                index_dt = account.stats.count() - 1
+            if args.show_dt and (stats := get_stats(account, args.rollup)):
+                index_dt = len(stats) - 1
                 if args.dt:
-                    index_dt = find_index(account.stats, args.dt)
+                    index_dt = find_index(stats, args.dt)
                 values += [
-                    f"{account.stats[index_dt].timestamp:%Y-%m-%d %H:%M}",
-                    f"{account.stats[0].timestamp:%Y-%m-%d %H:%M}",
-                    f"{(account.stats[0].timestamp - account.stats[index_dt].timestamp).total_seconds() / 3600:5.1f}",
-                    f"{account.stats[0].medias - account.stats[index_dt].medias}",
-                    f"{(account.stats[0].views or 0) - (account.stats[index_dt].views or 0)}",
-                    f"{(account.stats[0].followers or 0) - (account.stats[index_dt].followers or 0)}",
-                    f"{(account.stats[0].subscriptions or 0) - (account.stats[index_dt].subscriptions or 0)}",
+                    f"{stats[index_dt].timestamp:%Y-%m-%d %H:%M}",
+                    f"{stats[0].timestamp:%Y-%m-%d %H:%M}",
+                    f"{(stats[0].timestamp - stats[index_dt].timestamp).total_seconds() / 3600:5.1f}",
+                    f"{stats[0].medias - stats[index_dt].medias}",
+                    f"{(stats[0].views or 0) - (stats[index_dt].views or 0)}",
+                    f"{(stats[0].followers or 0) - (stats[index_dt].followers or 0)}",
+                    f"{(stats[0].subscriptions or 0) - (stats[index_dt].subscriptions or 0)}",
                 ]
             if args.show_lost:
                 lost_total = [0, 0, 0]
                 for media in account.medias.limit(args.lost_limit):
-                    lost = get_lost(media)
+                    lost = get_lost(media, args.rollup)
                     for i in range(3):
                         lost_total[i] += lost[i]
                 values += [f"{lost_total[0]}", f"{lost_total[1]}", f"{lost_total[2]}"]
 
             table.add_row(*values)
+    print_next_cursor(account_query, account, args.limit)
 
 
 def parse_args():
@@ -101,9 +104,12 @@ def parse_args():
     sub_list.add_argument("--dt", type=int, default=0, help="Set dt [h] for the changing stats")
     sub_list.add_argument("--show_lost", action="store_true", help="Show lost values of account medias")
     sub_list.add_argument("--lost_limit", type=int, default=50, help="Limit for the medias")
+    sub_list.add_argument("--rollup", type=lambda x: RollupPeriod[x], choices=list(RollupPeriod), help="Read the stats from the hourly or daily rollups")
 
     sub_update = subparsers.add_parser("update")
     sub_update.add_argument("--threads", type=int, default=8, help="Parallel hunting, default=8")
+    sub_update.add_argument("--pipeline", action="store_true", help="Fetch with --threads threads, store with one writer")
+    sub_update.add_argument("--write_batch_size", type=int, default=100, help="Items per commit of the pipeline, default=100")
     sub_update.add_argument("--media_count", type=int, default=-1, help="-2 = only new, -1 = skipp; 0 = alle, n = last n medias, default=-1")
     sub_update.add_argument("--comment_count", type=int, default=-1, help="-2 = only new, -1 = skipp; 0 = alle, n = last n comments, default=-1")
     sub_update.add_argument("--subscription_count", type=int, default=-1, help="-2 = only new, -1 = skipp; 0 = alle, n = last n subscription, default=-1")
@@ -125,6 +131,16 @@ def main() -> int:
             db = MetricoDB(config.db)
             print(db.count_query(sub_stmt))
 
+        case "update" if args.pipeline:
+            Hunter(config=config).update_pipeline(
+                query=AccountQuery.from_namespace(args),
+                fetchers=args.threads,
+                write_batch_size=args.write_batch_size,
+                media_count=args.media_count,
+                comment_count=args.comment_count,
+                subscription_count=args.subscription_count,
+            )
+
         case "update":
             Hunter(config=config).update_query(
                 query=AccountQuery.from_namespace(args),
@@ -3,14 +3,16 @@ from rich.live import Live
 from rich.table import Table
 
 from metrico import MetricoDB
-from metrico.cli.utils import MetricoBasicFilterArgumentParser, to_local_time
+from metrico.cli.utils import MetricoBasicFilterArgumentParser, print_next_cursor, to_local_time
 from metrico.database.query import MediaCommentOrder, MediaCommentQuery
 
 
 def list_media_comment(db: MetricoDB, args):
     table = Table("ID", "Account", "Media", "Media-Account", "Created", "Likes", "Text")
+    query, comment = MediaCommentQuery.from_namespace(args), None
+    query.load = ["account", "media.account"]
     with Live(table, refresh_per_second=4):
-        for comment in db.iter_query(MediaCommentQuery.from_namespace(args)):
+        for comment in db.iter_query(query, yield_per=100):
             table.add_row(
                 f"{comment.id:>7}",
                 f"[{comment.account_id}] {comment.account.info_name[:32]}",
@@ -20,6 +22,7 @@ def list_media_comment(db: MetricoDB, args):
                 f"{comment.likes}",
                 f"{comment.text[:100]}",
             )
+    print_next_cursor(query, comment, args.limit)
 
 
 def parse_args():
@@ -10,7 +10,7 @@ from metrico.database import MetricoDB, models
 def media_info(media: models.Media):
     print(f"ID: {media.id} - Identifier: {media.identifier} - Account: {media.account.info_name} [id={media.account.id}] - Platform: {media.account.platform}")
     print(
-        f"  Update:\n    Info:     {media.info_last_update} [{media.info.count()}]\n    Data:     {media.stats_last_update} [{media.stats.count()}]\n    Comments: {media.comments_last_update} [{media.comments.count()}]"
+        f"  Update:\n    Info:     {media.info_last_update} [{media.info.count()}]\n    Data:     {media.stats_last_update} [{media.stats.count()}]\n    Comments: {media.comments_last_update} [{media.comments_count}]"
     )
 
     print(
@@ -8,8 +8,10 @@ from scipy.stats import shapiro
 
 from metrico import Analyzer, Hunter, MetricoConfig, MetricoDB
 from metrico.analyze import get_lost
-from metrico.cli.utils import MetricoBasicFilterArgumentParser, find_index, to_local_time
+from metrico.cli.utils import MetricoBasicFilterArgumentParser, find_index, print_next_cursor, to_local_time
 from metrico.database.query import MediaOrder, MediaQuery
+from metrico.database.rollup import get_stats
+from metrico.schemas import RollupPeriod
 from metrico.utils.misc import update_list
 
 
@@ -33,12 +35,13 @@ def get_headers(args):
     return headers
 
 
-def get_values_fit(media):
-    if media.stats_comments < 10 or media.stats_likes < 10 or media.stats_views < 10 or media.stats.count() < 5:
+def get_values_fit(media, args):
+    stats = get_stats(media, args.rollup)
+    if media.stats_comments < 10 or media.stats_likes < 10 or media.stats_views < 10 or len(stats) < 5:
         return ["-", "-", "-", "-", "-", "-"]
 
     timestamp, views, likes, comments = [], [], [], []
-    for stat in media.stats:
+    for stat in stats:
         tmp = (stat.timestamp - media.created_at).total_seconds() / 60 / 60
         if tmp <= 0:
             continue
@@ -86,7 +89,7 @@ def get_values_fit(media):
 def get_values_lost(media, args):
     if args.simple:
         views, likes, comments = [], [], []
-        for stat in media.stats:
+        for stat in get_stats(media, args.rollup):
             tmp = (stat.timestamp - media.created_at).total_seconds() / 60 / 60
             if tmp <= 0:
                 continue
@@ -100,7 +103,7 @@ def get_values_lost(media, args):
             f"{max(views) - media.stats_views}",
         ]
 
-    return map(str, get_lost(media))
+    return map(str, get_lost(media, args.rollup))
 
 
 def get_values(media, args):
@@ -116,21 +119,22 @@ def get_values(media, args):
     ]
     if args.show_rel:
         values += [
-            f"{media.comments.count():>5}",
+            f"{media.comments_count:>5}",
             f"{media.stats.count():>3}",
             f"{media.info.count():>3}",
         ]
     if args.show_dt:
-        index_dt = media.stats.count() - 1
+        stats = get_stats(media, args.rollup)
+        index_dt = len(stats) - 1
         if args.dt:
-            index_dt = find_index(media.stats, args.dt)
+            index_dt = find_index(stats, args.dt)
         values += [
-            f"{to_local_time(media.stats[index_dt].timestamp):%Y-%m-%d %H:%M}",
-            f"{to_local_time(media.stats[0].timestamp):%Y-%m-%d %H:%M}",
-            f"{(media.stats[0].timestamp - media.stats[index_dt].timestamp).total_seconds() / 3600:5.1f}",
-            f"{media.stats[0].comments - media.stats[index_dt].comments}",
-            f"{media.stats[0].likes - media.stats[index_dt].likes}",
-            f"{media.stats[0].views - media.stats[index_dt].views}",
+            f"{to_local_time(stats[index_dt].timestamp):%Y-%m-%d %H:%M}",
+            f"{to_local_time(stats[0].timestamp):%Y-%m-%d %H:%M}",
+            f"{(stats[0].timestamp - stats[index_dt].timestamp).total_seconds() / 3600:5.1f}",
+            f"{stats[0].comments - stats[index_dt].comments}",
+            f"{stats[0].likes - stats[index_dt].likes}",
+            f"{stats[0].views - stats[index_dt].views}",
         ]
     if args.show_lost:
         values += get_values_lost(media, args)
@@ -151,7 +155,7 @@ def get_values(media, args):
                 f"{100 * dot:6.4f}",
             ]
     if args.show_fit:
-        values += get_values_fit(media)
+        values += get_values_fit(media, args)
     return values
 
 
@@ -159,10 +163,13 @@ def list_medias(config: MetricoConfig, args):
     headers = get_headers(args)
     table = Table(*headers)
     db = MetricoDB(config=config)
+    query, media = MediaQuery.from_namespace(args), None
+    query.load = ["account"]
     with Live(table, refresh_per_second=4):
-        for media in db.iter_query(MediaQuery.from_namespace(args)):
+        for media in db.iter_query(query, yield_per=100):
             values = get_values(media, args)
             table.add_row(*values)
+    print_next_cursor(query, media, args.limit)
 
 
 def parse_args():
@@ -178,9 +185,12 @@ def parse_args():
     sub_list.add_argument("--simple", action="store_true", help="Make it simple")
     sub_list.add_argument("--show_analyze", action="store_true", help="Show some analyze values")
     sub_list.add_argument("--show_fit", action="store_true", help="Show the log fit values")
+    sub_list.add_argument("--rollup", type=lambda x: RollupPeriod[x], choices=list(RollupPeriod), help="Read the stats from the hourly or daily rollups")
 
     sub_update = subparsers.add_parser("update")
     sub_update.add_argument("--threads", type=int, default=8, help="Parallel hunting, default=8")
+    sub_update.add_argument("--pipeline", action="store_true", help="Fetch with --threads threads, store with one writer")
+    sub_update.add_argument("--write_batch_size", type=int, default=100, help="Items per commit of the pipeline, default=100")
     sub_update.add_argument("--comment_count", type=int, default=-1, help="-2 = only new, -1 = skipp; 0 = alle, n = last n comments, default=-1")
 
     subparsers.add_parser("count")
@@ -200,6 +210,14 @@ def main() -> int:
             db = MetricoDB(config=config)
             print(db.count_query(sub_stmt))
 
+        case "update" if args.pipeline:
+            Hunter(config=config).update_pipeline(
+                query=MediaQuery.from_namespace(args),
+                fetchers=args.threads,
+                write_batch_size=args.write_batch_size,
+                comment_count=args.comment_count,
+            )
+
         case "update":
             Hunter(config=config).update_query(
                 query=MediaQuery.from_namespace(args),
@@ -5,6 +5,7 @@ import random
 import string
 import sys
 import time
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 
@@ -14,8 +15,9 @@ from rich.table import Table
 
 from metrico import Hunter, MetricoDB, schemas
 from metrico.cli.utils import MetricoArgumentParser, console
-from metrico.database import models
+from metrico.database.counter import COUNTED_MODELS
 from metrico.utils.config import MetricoConfig
+from metrico.utils.misc import update_list
 
 
 def get_random_string(length: int = 32) -> str:
@@ -36,12 +38,20 @@ def show_config(obj: MetricoConfig, args) -> int:
     return 0
 
 
-def benchmark(hunter: Hunter, args) -> int:
+BENCHMARK_PROFILES: dict[str, schemas.DatabaseSqliteConfig] = {
+    "plain": schemas.DatabaseSqliteConfig(journal_mode=None, synchronous=None, busy_timeout=None),
+    "wal": schemas.DatabaseSqliteConfig(),
+    "wal-fast": schemas.DatabaseSqliteConfig(synchronous="OFF", mmap_size=268435456, cache_size=-65536),
+}
+
+
+def run_benchmark(hunter: Hunter, args) -> tuple[float, dict[str, int], dict[str, int]]:
     platform = "test"
 
     hunter.config.db.url = "sqlite://"
     if args.sqlite:
-        Path("testing.db").unlink(missing_ok=True)
+        for suffix in ["", "-wal", "-shm"]:
+            Path(f"testing.db{suffix}").unlink(missing_ok=True)
         hunter.config.db.url = "sqlite:///testing.db"
     hunter.db.reload_config()
 
@@ -78,8 +88,14 @@ def benchmark(hunter: Hunter, args) -> int:
 
     for loop in range(args.loops):
         console.log(f"Running loop {loop}")
-        for account_id in account_ids:
-            hunter.update_account(account_id, media_count=args.media_count, comment_count=args.comment_count, subscription_count=args.subscription_count)
+        update_list(
+            ids=account_ids,
+            func=hunter.update_account,
+            threads=args.threads,
+            media_count=args.media_count,
+            comment_count=args.comment_count,
+            subscription_count=args.subscription_count,
+        )
 
     end = time.time()
 
@@ -94,15 +110,35 @@ def benchmark(hunter: Hunter, args) -> int:
         "Media-Comment": args.accounts * args.medias * args.comments,
         "Account-Subscription": 0,
     }
-    error = any(stats[key] != results[key] for key in stats)
-
-    table = Table("", *stats.keys())
-    table.add_row("DB", *[str(value) for value in stats.values()])
-    table.add_row("Ref", *[str(results.get(key, "")) for key in stats.keys()])
-
+    return end - start, stats, results
+
+
+def benchmark(config: MetricoConfig, args) -> int:
+    if not args.profiles:
+        duration, stats, results = run_benchmark(Hunter(config=config), args)
+        error = any(stats[key] != results[key] for key in stats)
+
+        table = Table("", *stats.keys())
+        table.add_row("DB", *[str(value) for value in stats.values()])
+        table.add_row("Ref", *[str(results.get(key, "")) for key in stats.keys()])
+
+        console.print(table)
+        console.print(f"Result: {duration:.2f} sec")
+        console.print(f"Error:  {error}")
+        return 0
+
+    # the pragmas only make a difference for a database file
+    args.sqlite = True
+    table = Table("Profile", "Pragmas", "Result [sec]", "Error")
+    for name in args.profiles:
+        profile_config = config.copy(deep=True)
+        profile_config.db.sqlite = BENCHMARK_PROFILES[name]
+        console.log("Profile:", name)
+        duration, stats, results = run_benchmark(Hunter(config=profile_config), args)
+        error = any(stats[key] != results[key] for key in stats)
+        pragmas = ", ".join(f"{key}={value}" for key, value in asdict(profile_config.db.sqlite).items() if value is not None)
+        table.add_row(name, pragmas or "-", f"{duration:.2f}", str(error))
     console.print(table)
-    console.print(f"Result: {end - start:.2f} sec")
-    console.print(f"Error:  {error}")
     return 0
 
 
@@ -113,40 +149,30 @@ def stats_all(config: MetricoConfig, args):
             table.add_row(*row)
         return table
 
-    alchemy_map = {
-        "Account": models.Account,
-        "Account-Subscription": models.AccountSubscription,
-        "Account-Info": models.AccountInfo,
-        "Account-Data": models.AccountStats,
-        "Media": models.Media,
-        "Media-Info": models.MediaInfo,
-        "Media-Data": models.MediaStats,
-        "Media-Comment": models.MediaComment,
-    }
+    alchemy_map = COUNTED_MODELS
 
-    db: MetricoDB = MetricoDB(config=config.db)
+    db: MetricoDB = MetricoDB(config=config)
     rows: list[list[str]] = []
     values_last: list[Any] = []
     with Live() as live:
         while True:
             try:
-                with db.Session() as session:
-                    values = [datetime.now()] + [session.query(model).count() for name, model in alchemy_map.items()]
-                    if values_last:
-                        values_dt = [values[i] - values_last[i] for i in range(len(values))]
-                        rows.append([f"{values[0]}"] + [f"{values[i]} [{values_dt[i]/values_dt[0].total_seconds():.2f}]" for i in range(1, len(values))])
-                    else:
-                        rows.append([str(value) for value in values])
-
-                    live.update(update_data(rows))
-                    if not args.dynamic:
-                        break
-
-                    if len(rows) > args.limit:
-                        rows = rows[-args.limit :]
-
-                    values_last = values
-                    time.sleep(args.dt)
+                values = [datetime.now()] + list(db.stats(exact=args.exact).values())
+                if values_last:
+                    values_dt = [values[i] - values_last[i] for i in range(len(values))]
+                    rows.append([f"{values[0]}"] + [f"{values[i]} [{values_dt[i]/values_dt[0].total_seconds():.2f}]" for i in range(1, len(values))])
+                else:
+                    rows.append([str(value) for value in values])
+
+                live.update(update_data(rows))
+                if not args.dynamic:
+                    break
+
+                if len(rows) > args.limit:
+                    rows = rows[-args.limit :]
+
+                values_last = values
+                time.sleep(args.dt)
             except KeyboardInterrupt:
                 break
             except Exception as exc:
@@ -214,6 +240,33 @@ def add_item(config: MetricoConfig, args):
     console.print("create", item)
 
 
+def rollup_stats(config: MetricoConfig, args) -> int:
+    results = MetricoDB(config=config).rollup(retention_days=args.retention_days)
+    table = Table("Table", "Rows")
+    for name, count in results.items():
+        table.add_row(name, str(count))
+    console.print(table)
+    return 0
+
+
+def schedule(config: MetricoConfig, args) -> int:
+    hunter: Hunter = Hunter(config=config)
+    hunter.run_scheduler(
+        rounds=args.rounds,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        round_size=args.round_size,
+        candidates=args.candidates,
+        interval=args.interval,
+        min_age=args.min_age,
+        weights={"account": args.account_weight, "media": args.media_weight},
+        growth_factor=args.growth_factor,
+        account_kwargs={"media_count": args.media_count, "comment_count": args.comment_count, "subscription_count": args.subscription_count},
+        media_kwargs={"comment_count": args.comment_count},
+    )
+    return 0
+
+
 def main() -> int:
     parser = MetricoArgumentParser("utils")
     subparsers = parser.add_subparsers(dest="action", help="sub-command help")
@@ -230,6 +283,8 @@ def main() -> int:
     sub_benchmark.add_argument("--comment_count", type=int, default=0)
     sub_benchmark.add_argument("--subscription_count", type=int, default=0)
     sub_benchmark.add_argument("--sqlite", action="store_true")
+    sub_benchmark.add_argument("--threads", type=int, default=0, help="Update the accounts in parallel, default=0")
+    sub_benchmark.add_argument("--profiles", nargs="*", choices=list(BENCHMARK_PROFILES), help="Compare sqlite engine profiles on a database file")
 
     sub_make_migrations = subparsers.add_parser("makemigrations")
     sub_make_migrations.add_argument("comment", type=str, help="Comment of migration")
@@ -238,6 +293,26 @@ def main() -> int:
     sub_stats.add_argument("--dynamic", action="store_true")
     sub_stats.add_argument("--limit", type=int, default=10)
     sub_stats.add_argument("--dt", type=int, default=2)
+    sub_stats.add_argument("--exact", action="store_true", help="Count the rows with COUNT(*) instead of reading the row counters")
+    subparsers.add_parser("recount", help="Set the row and relationship counters to the exact values")
+
+    sub_rollup = subparsers.add_parser("rollup", help="Roll up the raw stats into hourly and daily buckets")
+    sub_rollup.add_argument("--retention_days", type=int, help="Delete rolled up raw stats older than n days, default=db.stats_retention_days")
+
+    sub_schedule = subparsers.add_parser("schedule", help="Update the accounts and medias by staleness and growth until Ctrl+C")
+    sub_schedule.add_argument("--rounds", type=int, default=0, help="Number of rounds, default=0 (forever)")
+    sub_schedule.add_argument("--concurrency", type=int, default=4, help="Max parallel updates, default=4")
+    sub_schedule.add_argument("--rate", type=float, default=0, help="Max updates per second, default=0 (no limit)")
+    sub_schedule.add_argument("--round_size", type=int, default=100, help="Max updates of one round, default=100")
+    sub_schedule.add_argument("--candidates", type=int, default=0, help="Max stalest objects of each kind to rank, default=0 (10 * round_size)")
+    sub_schedule.add_argument("--interval", type=float, default=300, help="Max seconds of a round, default=300")
+    sub_schedule.add_argument("--min_age", type=float, default=3600, help="Seconds since the last update until an object is due, default=3600")
+    sub_schedule.add_argument("--account_weight", type=float, default=1.0)
+    sub_schedule.add_argument("--media_weight", type=float, default=1.0)
+    sub_schedule.add_argument("--growth_factor", type=float, default=10.0)
+    sub_schedule.add_argument("--media_count", type=int, default=-2, help="-2 = only new, -1 = skipp; 0 = alle, n = last n medias, default=-2")
+    sub_schedule.add_argument("--comment_count", type=int, default=-2, help="-2 = only new, -1 = skipp; 0 = alle, n = last n comments, default=-2")
+    sub_schedule.add_argument("--subscription_count", type=int, default=-1, help="-1 = skipp; 0 = alle, n = last n subscriptions, default=-1")
 
     sub_add = subparsers.add_parser("add")
     sub_add.add_argument("--full", action="store_true")
@@ -248,7 +323,7 @@ def main() -> int:
         case "config":
             return show_config(config, args)
         case "benchmark":
-            return benchmark(metrico, args)
+            return benchmark(config, args)
         case "makemigrations":
             db = MetricoDB(config=config)
             db.make_migrations(message=args.comment)
@@ -256,6 +331,12 @@ def main() -> int:
             MetricoDB(config=config.db).migrate()
         case "stats":
             stats_all(config, args)
+        case "recount":
+            MetricoDB(config=config).recount()
+        case "rollup":
+            return rollup_stats(config, args)
+        case "schedule":
+            return schedule(config, args)
         case "add":
             add_item(config, args)
         case _:
@@ -5,7 +5,7 @@ from dateutil import tz
 from rich.console import Console
 
 from metrico import MetricoConfig
-from metrico.database.query import AccountOrder, MediaCommentOrder, MediaOrder
+from metrico.database.query import AccountOrder, BasicQuery, MediaCommentOrder, MediaOrder
 from metrico.schemas import ModelStatus
 from metrico.utils.misc import config_logger
 
@@ -19,13 +19,13 @@ def to_local_time(value: datetime):
     return value.replace(tzinfo=TIME_ZONE_UTC).astimezone(TIME_ZONE)
 
 
-def find_index(stats, delta: int):
-    if stats.count() < 2:
+def find_index(stats: list, delta: int):
+    if len(stats) < 2:
         return 0
     dt_index = 1
     dt_best = stats[0].timestamp - stats[dt_index].timestamp
     dt_error = abs((delta * 3600) - dt_best.total_seconds())
-    for current_index in range(2, stats.count()):
+    for current_index in range(2, len(stats)):
         current_dt = stats[0].timestamp - stats[current_index].timestamp
         current_error = abs((delta * 3600) - current_dt.total_seconds())
         if current_error < dt_error:
@@ -79,6 +79,15 @@ class MetricoBasicFilterArgumentParser(MetricoArgumentParser):
         self.add_argument("--filter_datetime", nargs=2, type=lambda s: datetime.strptime(s, "%Y-%m-%d"))
         self.add_argument("--filter_account", nargs="*", type=str)
         self.add_argument("--filter_account_id", nargs="*", type=int)
+        self.add_argument("--after", type=str, help="Start after this cursor, printed below a limited list")
+        self.add_argument("--search", type=str, help="Full-text search, e.g. the comment text or the media caption")
+        self.add_argument("--seed", type=int, help="Seed of the random order, for a reproducible sample")
+
+
+def print_next_cursor(query: BasicQuery, obj, limit: int | None):
+    """Print the cursor for the next page of a limited list"""
+    if limit and obj is not None and query.get_order_field() is not None:
+        console.print(f"Next page: --after {query.get_cursor(obj)}")
 
 
 # def basic_filter_arguments(parser):
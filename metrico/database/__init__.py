@@ -1,20 +1,31 @@
+from typing import Iterable, Iterator
+
+from dataclasses import asdict
 from logging import getLogger
 from pathlib import Path
 
 from alembic import command
 from alembic.config import Config
-from sqlalchemy import create_engine, event, func, select
+from sqlalchemy import create_engine, event, func, make_url, select
 from sqlalchemy.orm import Session, sessionmaker
 
 from metrico.utils.config import ConfigMixin, MetricoConfig
+from metrico.utils.misc import chunked
 
 from .. import schemas
-from . import crud, models
+from . import counter, crud, models, rollup
 from .query import BasicQuery, MediaCommentOrder, MediaCommentQuery, MediaOrder, MediaQuery
 
 logger = getLogger(__name__)
 
 
+def get_alembic_config(url: str) -> Config:
+    alembic_cfg = Config()
+    alembic_cfg.set_main_option("script_location", "metrico.database:migrations")
+    alembic_cfg.set_main_option("sqlalchemy.url", url)
+    return alembic_cfg
+
+
 class TriggerAccountCaller:
     def __init__(self, name: str):
         self.name = name
@@ -35,6 +46,20 @@ class TriggerMediaCaller:
             session.commit()
 
 
+class SqlitePragmaCaller:
+    def __init__(self, config: schemas.DatabaseSqliteConfig):
+        self.pragmas = {name: value for name, value in asdict(config).items() if value is not None and value != ""}
+        for name, value in self.pragmas.items():
+            if not str(value).lstrip("-").isalnum():
+                raise ValueError(f"Invalid value {value!r} for sqlite pragma {name}")
+
+    def __call__(self, dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")  # nosec
+        cursor.close()
+
+
 class MetricoDB(ConfigMixin):
     def __init__(self, filename: str | Path | None = None, config: MetricoConfig | dict | None = None):
         super().__init__(filename=filename, config=config)
@@ -47,10 +72,7 @@ class MetricoDB(ConfigMixin):
             event.listen(models.Media, "after_insert", TriggerMediaCaller(trigger))
 
     def _get_alembic_config(self):
-        alembic_cfg = Config()
-        alembic_cfg.set_main_option("script_location", "metrico.database:migrations")
-        alembic_cfg.set_main_option("sqlalchemy.url", self.config.url)
-        return alembic_cfg
+        return get_alembic_config(self.config.db.url)
 
     def _get_session(self, session: Session | None = None):
         if session is None:
@@ -58,10 +80,26 @@ class MetricoDB(ConfigMixin):
         return session
 
     def reload_config(self):
-        self.engine = create_engine(self.config.db.url, echo=self.config.db.enable_echo)
-        self.Session = sessionmaker(autoflush=True, bind=self.engine)  # pylint: disable=invalid-name
+        url = make_url(self.config.db.url)
+        if url.get_backend_name() == "sqlite":
+            self.engine = create_engine(url, echo=self.config.db.enable_echo)
+            event.listen(self.engine, "connect", SqlitePragmaCaller(self.config.db.sqlite))
+        else:
+            self.engine = create_engine(url, echo=self.config.db.enable_echo, **asdict(self.config.db.pool))
+        self.Session = sessionmaker(  # pylint: disable=invalid-name
+            class_=counter.RowCountSession,
+            autoflush=True,
+            bind=self.engine,
+            info={"account_cache_size": self.config.db.account_cache_size},
+        )
         return self.engine, self.Session
 
+    @property
+    def in_memory(self) -> bool:
+        """In-memory SQLite, every thread has its own empty database"""
+        url = make_url(self.config.db.url)
+        return url.get_backend_name() == "sqlite" and (url.database in (None, "", ":memory:") or url.query.get("mode") == "memory")
+
     def setup(self):
         models.Base.metadata.create_all(self.engine)
 
@@ -77,25 +115,61 @@ class MetricoDB(ConfigMixin):
             alembic_cfg.attributes["connection"] = connection
             command.upgrade(alembic_cfg, "head")
 
-    def stats(self, model: str | None = None):
-        alchemy_map = {
-            "Account": models.Account,
-            "Account-Subscription": models.AccountSubscription,
-            "Account-Info": models.AccountInfo,
-            "Account-Data": models.AccountStats,
-            "Media": models.Media,
-            "Media-Info": models.MediaInfo,
-            "Media-Data": models.MediaStats,
-            "Media-Comment": models.MediaComment,
-        }
+    def stats(self, model: str | None = None, exact: bool = False):
+        """
+        Number of rows by model name, read from the maintained row counters
+
+        :param model: only the count of this model
+        :param exact: count the rows with COUNT(*), this scans every table
+        """
+        with self.Session() as session:
+            if exact:
+                if model in counter.COUNTED_MODELS:
+                    return session.query(counter.COUNTED_MODELS[model]).count()
+                return {name: session.query(obj).count() for name, obj in counter.COUNTED_MODELS.items()}
+
+            counts = counter.get_row_counts(session)
+            session.commit()
+            if model in counts:
+                return counts[model]
+            return counts
+
+    def recount(self) -> dict[str, int]:
+        """Set the row counters and the relationship counters (e.g. Account.medias_count) to the exact values"""
         with self.Session() as session:
-            if model in alchemy_map:
-                return session.query(alchemy_map[model]).count()
-            return {name: session.query(model).count() for name, model in alchemy_map.items()}
+            counts = counter.recount(session)
+            counter.recount_relationships(session)
+            session.commit()
+            return counts
 
-    def iter_query(self, stmt: BasicQuery):
+    def rollup(self, retention_days: int | None = None, session: Session | None = None) -> dict[str, int]:
+        """
+        Roll up the raw stats into hourly and daily buckets and delete old raw stats
+
+        :param retention_days: overwrite db.stats_retention_days of the config
+        :return: number of created buckets and deleted rows by table name
+        """
+        if retention_days is None:
+            retention_days = self.config.db.stats_retention_days
+        if session is not None:
+            return rollup.rollup(session, retention_days=retention_days)
+        with self.Session() as local_session:
+            results = rollup.rollup(local_session, retention_days=retention_days)
+            local_session.commit()
+            return results
+
+    def iter_query(self, stmt: BasicQuery, yield_per: int = 0):
+        with self.Session() as session:
+            yield from stmt.iter(session, yield_per=yield_per)
+
+    def iter_query_ids(self, stmt: BasicQuery, chunk_size: int = 1000) -> Iterator[list[int]]:
+        """
+        Stream the ids of the query in chunks, the memory is bounded by the chunk size.
+        The read transaction stays open until the iteration is done, with SQLite this needs
+        the WAL journal mode (default) to not block the writers in the meantime.
+        """
         with self.Session() as session:
-            yield from stmt.iter(session)
+            yield from chunked(stmt.iter_ids(session, yield_per=chunk_size), chunk_size)
 
     def count_query(self, stmt: BasicQuery):
         with self.Session() as session:
@@ -132,18 +206,76 @@ class MetricoDB(ConfigMixin):
             local_session.refresh(media)
             return media
 
+    def ingest(self, platform: str, datas: Iterable[schemas.Account | schemas.Media], batch_size: int = 500, session: Session | None = None) -> list[int]:
+        """
+        Create or update many accounts and medias with a few statements per batch
+
+        :param platform: the platform of all objects
+        :param datas: the account or media objects, it is consumed lazily
+        :param batch_size: objects per batch, without a session every batch is committed
+        :param session: use this session and don't commit
+        :return: the account or media ids in the same order as datas
+        :raises ValueError: for a media without account, the batches before it are already stored
+        """
+        ids: list[int] = []
+        for batch in chunked(datas, batch_size):
+            if session is not None:
+                ids += self._ingest_batch(session, platform, batch)
+                continue
+            with self.Session() as local_session:
+                ids += self._ingest_batch(local_session, platform, batch)
+                local_session.commit()
+        return ids
+
+    def _ingest_batch(self, session: Session, platform: str, batch: list[schemas.Account | schemas.Media]) -> list[int]:
+        accounts = [data for data in batch if isinstance(data, schemas.Account)]
+        medias = [data for data in batch if isinstance(data, schemas.Media)]
+        if missing := [data.identifier for data in medias if data.account is None]:
+            raise ValueError(f"The medias {missing} have no account")
+        # media accounts first, so the full account data wins for duplicated identifiers
+        media_accounts = [data.account for data in medias if data.account is not None]
+        account_ids, new_accounts = crud.bulk_create_accounts(session, platform, media_accounts + accounts)
+        media_ids, new_medias = crud.bulk_create_medias(session, platform, medias, account_ids=account_ids)
+
+        # the ORM after_insert events are not called for bulk inserts
+        if new_accounts and (trigger := self.config.db.on_create_account_trigger):
+            crud.bulk_add_to_trigger(session, trigger, accounts=new_accounts)
+        if new_medias and (trigger := self.config.db.on_create_media_trigger):
+            crud.bulk_add_to_trigger(session, trigger, medias=new_medias)
+
+        ids = []
+        for data in batch:
+            match data:
+                case schemas.Account():
+                    ids.append(account_ids[data.identifier])
+                case schemas.Media() if data.account is not None:
+                    ids.append(media_ids[(data.account.identifier, data.identifier, data.media_type)])
+        return ids
+
     def get_account(self, account_id: int | str, session: Session | None = None):
         if session is not None:
             return crud.get_account(session, account_id=account_id)
         with self.Session() as local_session:
             return crud.get_account(local_session, account_id=account_id)
 
+    def get_accounts(self, account_ids: list[int], session: Session | None = None):
+        if session is not None:
+            return crud.get_accounts(session, account_ids)
+        with self.Session() as local_session:
+            return crud.get_accounts(local_session, account_ids)
+
     def get_media(self, media_id: int, session: Session | None = None):
         if session is not None:
             return crud.get_media(session, media_id=media_id)
         with self.Session() as local_session:
             return crud.get_media(local_session, media_id=media_id)
 
+    def get_medias(self, media_ids: list[int], session: Session | None = None):
+        if session is not None:
+            return crud.get_medias(session, media_ids)
+        with self.Session() as local_session:
+            return crud.get_medias(local_session, media_ids)
+
     def get_trigger(self, trigger: str | int, session: Session | None = None):
         if session is not None:
             return crud.get_trigger(session, trigger)
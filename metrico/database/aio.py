@@ -0,0 +1,136 @@
+"""
+Asynchronous version of MetricoDB, built on the SQLAlchemy asyncio extension.
+
+The crud functions stay synchronous, they run with AsyncSession.run_sync in the
+greenlet of the async session. Install the extra dependencies with: pip install metrico[async]
+Keep in mind, SQLite allows only one writer at the same time, so bundle concurrent writes in one task.
+"""
+from typing import AsyncIterator
+
+from dataclasses import asdict
+from pathlib import Path
+
+from alembic import command
+from sqlalchemy import URL, event, func, make_url, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from metrico import schemas
+from metrico.utils.config import ConfigMixin, MetricoConfig
+
+from . import SqlitePragmaCaller, TriggerAccountCaller, TriggerMediaCaller, counter, crud, get_alembic_config, models
+from .query import BasicQuery
+
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def get_async_url(url: str | URL) -> URL:
+    """Use the async driver of the dialect, if the url has no explicit driver"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if "+" not in url.drivername and backend in ASYNC_DRIVERS:
+        return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url
+
+
+class AsyncMetricoDB(ConfigMixin):
+    def __init__(self, filename: str | Path | None = None, config: MetricoConfig | dict | None = None):
+        super().__init__(filename=filename, config=config)
+        self.engine, self.Session = self.reload_config()  # pylint: disable=invalid-name
+
+        if trigger := self.config.db.on_create_account_trigger:
+            event.listen(models.Account, "after_insert", TriggerAccountCaller(trigger))
+        if trigger := self.config.db.on_create_media_trigger:
+            event.listen(models.Media, "after_insert", TriggerMediaCaller(trigger))
+
+    def reload_config(self):
+        url = get_async_url(self.config.db.url)
+        if url.get_backend_name() == "sqlite":
+            self.engine = create_async_engine(url, echo=self.config.db.enable_echo)
+            event.listen(self.engine.sync_engine, "connect", SqlitePragmaCaller(self.config.db.sqlite))
+        else:
+            self.engine = create_async_engine(url, echo=self.config.db.enable_echo, **asdict(self.config.db.pool))
+        # objects are used after the commit, without expire_on_commit they don't need an implicit (sync) refresh
+        self.Session = async_sessionmaker(  # pylint: disable=invalid-name
+            bind=self.engine,
+            sync_session_class=counter.RowCountSession,
+            autoflush=True,
+            expire_on_commit=False,
+            info={"account_cache_size": self.config.db.account_cache_size},
+        )
+        return self.engine, self.Session
+
+    async def setup(self):
+        async with self.engine.begin() as connection:
+            await connection.run_sync(models.Base.metadata.create_all)
+
+    async def migrate(self):
+        def upgrade(connection):
+            alembic_cfg = get_alembic_config(self.config.db.url)
+            alembic_cfg.attributes["connection"] = connection
+            command.upgrade(alembic_cfg, "head")
+
+        async with self.engine.begin() as connection:
+            await connection.run_sync(upgrade)
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+    async def iter_query(self, stmt: BasicQuery) -> AsyncIterator:
+        async with self.Session() as session:
+            result = await session.stream_scalars(stmt.query())
+            async for obj in result:
+                yield obj
+
+    async def count_query(self, stmt: BasicQuery):
+        async with self.Session() as session:
+            sub_stmt = stmt.query()
+            count_stmt = select(func.count()).select_from(sub_stmt.subquery())
+            return await session.scalar(count_stmt)
+
+    async def create(self, platform: str, data: schemas.Account | schemas.Media, session: AsyncSession | None = None):
+        match data:
+            case schemas.Account():
+                return await self.create_account(platform, data, session)
+            case schemas.Media():
+                return await self.create_media(platform, data, session)
+
+    async def create_account(self, platform: str, data: schemas.Account, session: AsyncSession | None = None):
+        if session is not None:
+            return await session.run_sync(crud.create_account, platform, data)
+
+        async with self.Session() as local_session:
+            account = await local_session.run_sync(crud.create_account, platform, data)
+            await local_session.commit()
+            await local_session.refresh(account)
+            return account
+
+    async def create_media(self, platform: str, data: schemas.Media, session: AsyncSession | None = None):
+        if session is not None:
+            return await session.run_sync(self._create_media, platform, data)
+
+        async with self.Session() as local_session:
+            media = await local_session.run_sync(self._create_media, platform, data)
+            await local_session.commit()
+            await local_session.refresh(media)
+            return media
+
+    @staticmethod
+    def _create_media(session, platform: str, data: schemas.Media):
+        account = crud.create_account(session, platform, data.account)
+        return crud.create_media(session, account, data)
+
+    async def get_account(self, account_id: int | str, session: AsyncSession | None = None):
+        if session is not None:
+            return await session.run_sync(crud.get_account, account_id)
+        async with self.Session() as local_session:
+            return await local_session.run_sync(crud.get_account, account_id)
+
+    async def get_media(self, media_id: int, session: AsyncSession | None = None):
+        if session is not None:
+            return await session.run_sync(crud.get_media, media_id)
+        async with self.Session() as local_session:
+            return await local_session.run_sync(crud.get_media, media_id)
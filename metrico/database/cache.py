@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from copy import deepcopy
+from logging import getLogger
+
+from sqlalchemy.orm import Session
+
+from metrico import schemas
+from metrico.database import models
+
+logger = getLogger(__name__)
+
+
+class AccountCache:
+    """
+    Bounded LRU identity map (platform, identifier) -> account for the lifetime of one session.
+    It also remembers the last data written to the account, so a repeated author
+    with the same data needs no database round trip at all.
+
+    :param maxsize: max number of cached accounts
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.items: OrderedDict[tuple[str, str], tuple[models.Account, schemas.Account | None]] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self) -> str:
+        return f"AccountCache(size={len(self)}, hits={self.hits}, misses={self.misses}, hit_ratio={self.hit_ratio:.2f})"
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, session: Session, platform: str, identifier: str) -> tuple[models.Account | None, schemas.Account | None]:
+        """
+        Get the cached account and the last written data.
+        Accounts which are not persistent in the session anymore are dropped, a rollback clears the cache (see metrico.database.counter).
+        """
+        key = (platform, identifier)
+        if (item := self.items.get(key)) is not None and item[0] in session:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return item
+
+        self.items.pop(key, None)
+        self.misses += 1
+        return None, None
+
+    def set(self, platform: str, identifier: str, account: models.Account, data: schemas.Account | None = None):
+        key = (platform, identifier)
+        # the hunters can change their data objects later on, so store a copy
+        self.items[key] = (account, deepcopy(data))
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+
+def get_account_cache(session: Session) -> AccountCache:
+    """Get the account cache of the session, the size comes from session.info["account_cache_size"]"""
+    if (cache := session.info.get("account_cache")) is None:
+        cache = session.info["account_cache"] = AccountCache(session.info.get("account_cache_size", 1024))
+    return cache
@@ -0,0 +1,118 @@
+"""
+Maintained counters, so neither MetricoDB.stats nor the hunting decisions need COUNT(*) queries.
+
+Row counters: ORM inserts and deletes are counted after every flush. Core statements (bulk inserts,
+upserts, deletes) report their changes with add_row_count. All changes of a transaction
+are written with one UPDATE per table right before the commit, a rollback drops them.
+
+Relationship counters (e.g. Account.medias_count): the crud create paths increment the
+counter column of the parent with an atomic "SET x = x + n". Deletes are not tracked, recount
+rebuilds all counters.
+"""
+from sqlalchemy import bindparam, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+COUNTED_MODELS = {
+    "Account": models.Account,
+    "Account-Subscription": models.AccountSubscription,
+    "Account-Info": models.AccountInfo,
+    "Account-Data": models.AccountStats,
+    "Media": models.Media,
+    "Media-Info": models.MediaInfo,
+    "Media-Data": models.MediaStats,
+    "Media-Comment": models.MediaComment,
+}
+COUNTED_TABLES = {model.__tablename__ for model in COUNTED_MODELS.values()}
+
+# model -> (relationship to the parent, foreign key, counter column of the parent)
+RELATIONSHIP_COUNTERS = {
+    models.Media: [("account", "account_id", "medias_count")],
+    models.MediaComment: [("media", "media_id", "comments_count"), ("account", "account_id", "comments_count")],
+    models.AccountSubscription: [("account", "account_id", "subscriptions_count"), ("subscribed_account", "subscribed_account_id", "followers_count")],
+}
+
+
+class RowCountSession(Session):
+    """Session which keeps the row_count table up to date"""
+
+
+def add_row_count(session: Session, model, delta: int):
+    name = model.__tablename__
+    if delta and name in COUNTED_TABLES:
+        deltas = session.info.setdefault("row_count", {})
+        deltas[name] = deltas.get(name, 0) + delta
+
+
+@event.listens_for(RowCountSession, "after_flush")
+def after_flush(session: Session, _):
+    for obj in session.new:
+        add_row_count(session, type(obj), 1)
+    for obj in session.deleted:
+        add_row_count(session, type(obj), -1)
+
+
+@event.listens_for(RowCountSession, "before_commit")
+def before_commit(session: Session):
+    # the commit flushes after this event, so flush the pending objects first
+    session.flush()
+    if deltas := {name: delta for name, delta in session.info.pop("row_count", {}).items() if delta}:
+        table = models.RowCount.__table__
+        stmt = update(table).where(table.c.name == bindparam("b_name")).values(count=table.c.count + bindparam("b_delta"))
+        session.execute(stmt, [{"b_name": name, "b_delta": delta} for name, delta in deltas.items()])
+
+
+@event.listens_for(RowCountSession, "after_rollback")
+def after_rollback(session: Session):
+    session.info.pop("row_count", None)
+    # the last written data of the accounts may be rolled back, see metrico.database.cache
+    if (cache := session.info.get("account_cache")) is not None:
+        cache.clear()
+
+
+def add_relationship_count(obj, delta: int = 1):
+    """Increment the relationship counters of the parents of a new object, it is written with the next flush"""
+    for name, _, column in RELATIONSHIP_COUNTERS.get(type(obj), []):
+        if (parent := getattr(obj, name)) is None:
+            continue
+        if inspect(parent).persistent:
+            setattr(parent, column, getattr(type(parent), column) + delta)
+        else:
+            setattr(parent, column, (getattr(parent, column) or 0) + delta)
+
+
+def recount_relationships(session: Session):
+    """Set all relationship counters to the exact values"""
+    values: dict = {}
+    for model, counters in RELATIONSHIP_COUNTERS.items():
+        for name, foreign_key, column in counters:
+            parent = getattr(model, name).property.mapper.class_
+            count = select(func.count()).select_from(model).where(getattr(model, foreign_key) == parent.id).scalar_subquery()
+            values.setdefault(parent, {})[column] = count
+    for parent, columns in values.items():
+        session.execute(update(parent.__table__).values({name: count for name, count in columns.items()}))
+
+
+def get_row_counts(session: Session) -> dict[str, int]:
+    """
+    Get the maintained row counts by model name.
+    Missing counters (e.g. a database created with setup) are initialized with COUNT(*).
+    """
+    counts = dict(session.execute(select(models.RowCount.name, models.RowCount.count)).tuples().all())
+    for model in COUNTED_MODELS.values():
+        if model.__tablename__ not in counts:
+            counts[model.__tablename__] = session.scalar(select(func.count()).select_from(model)) or 0
+            session.add(models.RowCount(name=model.__tablename__, count=counts[model.__tablename__]))
+    return {name: counts[model.__tablename__] for name, model in COUNTED_MODELS.items()}
+
+
+def recount(session: Session) -> dict[str, int]:
+    """Set all counters to the exact COUNT(*) values"""
+    counts = {}
+    for name, model in COUNTED_MODELS.items():
+        counts[name] = session.scalar(select(func.count()).select_from(model)) or 0
+        session.merge(models.RowCount(name=model.__tablename__, count=counts[name]))
+    # changes of this transaction are already part of the exact values
+    session.info.pop("row_count", None)
+    return counts
@@ -3,16 +3,22 @@ CRUD comes from: Create, Read, Update, and Delete.
 
 No session.commit !!!
 """
+from typing import Any, Sequence
+
 from dataclasses import asdict
 from datetime import datetime
 from logging import getLogger
 
-from sqlalchemy import delete
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql import func
 
 from metrico import schemas
 from metrico.database import models
+from metrico.database.cache import get_account_cache
+from metrico.database.counter import add_relationship_count, add_row_count
 
 logger = getLogger(__name__)
 
@@ -20,6 +26,7 @@ logger = getLogger(__name__)
 def create_obj(session: Session, model, **data):
     created_obj = model(**data)
     session.add(created_obj)
+    add_relationship_count(created_obj)
     session.flush()
     logger.debug("create: %s", created_obj)
     return created_obj
@@ -63,12 +70,34 @@ def add_rel_data(session: Session, obj_name, obj, name, model, fields):
         create_obj(session, model, **{obj_name: obj}, **fields)
 
 
+def get_stats_growth(old: int | None, views: int | None, last_update: Any) -> float | None:
+    """
+    Relative growth of the views per day since the last stats update, the update scheduler refreshes growing objects more often.
+    The interval is at least one hour, so two updates in a row don't inflate the rate.
+    """
+    # a pending func.now() of this session is no datetime
+    if views is None or old is None or not isinstance(last_update, datetime):
+        return None
+    days = max((datetime.utcnow() - last_update).total_seconds() / 86400, 1 / 24)
+    return (views - old) / max(old, 1) / days
+
+
+def set_stats_growth(obj: models.Account | models.Media, views: int | None):
+    if (growth := get_stats_growth(obj.stats_views, views, obj.stats_last_update)) is not None:
+        obj.stats_growth = growth
+
+
 def create_account(session: Session, platform: str, data: schemas.Account | None, update: bool = True):
     if data is None:
         return None
-    account = get_or_create(session, models.Account, filter_by={"platform": platform, "identifier": data.identifier})
-    if update:
+    cache = get_account_cache(session)
+    account, last_data = cache.get(session, platform, data.identifier)
+    if account is None:
+        account = get_or_create(session, models.Account, filter_by={"platform": platform, "identifier": data.identifier})
+    if update and data != last_data:
         update_account(session, account, data)
+        last_data = data
+    cache.set(platform, data.identifier, account, last_data)
     return account
 
 
@@ -93,6 +122,12 @@ def get_account(session: Session, account_id: int | str) -> models.Account | Non
     return session.query(models.Account).filter_by(id=account_id).one_or_none()
 
 
+def get_accounts(session: Session, account_ids: Sequence[int]) -> list[models.Account]:
+    """Accounts in the order of the ids, missing ids are skipped"""
+    accounts = {account.id: account for account in session.scalars(select(models.Account).where(models.Account.id.in_(account_ids)))}
+    return [accounts[account_id] for account_id in account_ids if account_id in accounts]
+
+
 def update_account(
     session: Session,
     account: models.Account,
@@ -102,6 +137,8 @@ def update_account(
         match arg:
             case schemas.Account():
                 update_account(session, account, arg.created, arg.info, arg.stats)
+                if arg.media_list and arg.media_list != account.media_list:
+                    account.media_list = arg.media_list
 
             case schemas.Created():
                 if arg.value:
@@ -111,6 +148,7 @@ def update_account(
                 add_rel_data(session, "account", account, "info", models.AccountInfo, asdict(arg))
 
             case schemas.AccountStats():
+                set_stats_growth(account, arg.views)
                 add_rel_data(session, "account", account, "stats", models.AccountStats, asdict(arg))
 
             case schemas.Subscription():
@@ -127,6 +165,17 @@ def get_media(session: Session, media_id: int | str):
     return session.query(models.Media).filter_by(id=media_id).one_or_none()
 
 
+def get_media_identifiers(session: Session, account: models.Account) -> set[str]:
+    """Identifiers of the stored medias of the account, it is covered by the index ix_media_account_id_identifier"""
+    return set(session.scalars(select(models.Media.identifier).where(models.Media.account_id == account.id)))
+
+
+def get_medias(session: Session, media_ids: Sequence[int]) -> list[models.Media]:
+    """Medias with their accounts in the order of the ids, missing ids are skipped"""
+    medias = {media.id: media for media in session.scalars(select(models.Media).where(models.Media.id.in_(media_ids)).options(joinedload(models.Media.account)))}
+    return [medias[media_id] for media_id in media_ids if media_id in medias]
+
+
 def update_media(
     session: Session, media: models.Media, *args: schemas.Media | schemas.Created | schemas.MediaInfo | schemas.MediaStats | schemas.MediaComment | None
 ):
@@ -143,6 +192,7 @@ def update_media(
                 add_rel_data(session, "media", media, "info", models.MediaInfo, asdict(arg))
 
             case schemas.MediaStats():
+                set_stats_growth(media, arg.views)
                 add_rel_data(session, "media", media, "stats", models.MediaStats, asdict(arg))
 
             case schemas.MediaComment():
@@ -162,6 +212,68 @@ def update_media(
                 logger.warning("Objects of type %s can not be updated with the media model", type(arg))
 
 
+def upsert_media_comments(session: Session, media: models.Media, datas: Sequence[schemas.MediaComment]) -> int | None:
+    """
+    Create or update a page of comments with one INSERT ... ON CONFLICT DO UPDATE statement.
+    It needs the unique constraint on (media_id, identifier). Other dialects fall back to update_media.
+
+    :return: the number of new comments, None for the fallback
+    """
+    match session.get_bind().dialect.name:
+        case "sqlite":
+            dialect_insert = sqlite.insert
+        case "postgresql":
+            dialect_insert = postgresql.insert
+        case _:
+            update_media(session, media, *datas)
+            return None
+
+    rows: dict[str, dict[str, Any]] = {}
+    for data in datas:
+        account = create_account(session, media.account.platform, data.account) if data.account else None
+        content = data.content or schemas.MediaCommentContent(text=None, likes=None, created_at=None)  # type: ignore
+        rows[data.identifier] = {
+            "media_id": media.id,
+            "identifier": data.identifier,
+            "account_id": account.id if account else None,
+            "text": content.text,
+            "likes": content.likes,
+            "created_at": content.created_at or func.now(),
+        }
+    if not rows:
+        return 0
+
+    # the upsert does not tell which rows are new, the unique index answers it cheaply
+    existing_stmt = select(models.MediaComment.identifier, models.MediaComment.account_id).where(
+        models.MediaComment.media_id == media.id, models.MediaComment.identifier.in_(list(rows))
+    )
+    existing = dict(session.execute(existing_stmt).tuples().all())
+    added = len(rows) - len(existing)
+    add_row_count(session, models.MediaComment, added)
+    if added:
+        media.comments_count = models.Media.comments_count + added
+
+    account_counts: dict[int, int] = {}
+    for identifier, row in rows.items():
+        old_account_id, new_account_id = existing.get(identifier), row["account_id"]
+        if new_account_id is None or (identifier in existing and new_account_id == old_account_id):
+            continue
+        account_counts[new_account_id] = account_counts.get(new_account_id, 0) + 1
+        if old_account_id is not None:
+            account_counts[old_account_id] = account_counts.get(old_account_id, 0) - 1
+    bulk_add_count(session, models.Account, "comments_count", account_counts)
+
+    stmt = dialect_insert(models.MediaComment).values(list(rows.values()))
+    # like get_or_create with update_fields=True, a None value keeps the stored value
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.MediaComment.media_id, models.MediaComment.identifier],
+        set_={name: func.coalesce(stmt.excluded[name], getattr(models.MediaComment, name)) for name in ["account_id", "text", "likes", "created_at"]},
+    )
+    session.execute(stmt)
+    logger.debug("upsert: %i x MediaComment for %s", len(rows), media)
+    return added
+
+
 def get_trigger_id(session: Session, trigger: models.Trigger | str | int):
     match trigger:
         case str():
@@ -250,3 +362,193 @@ def remove_from_trigger(
         session.execute(stmt)
     # if commit:
     #     session.commit()
+
+
+def bulk_rel_data(name: str, current: dict[str, Any], data) -> tuple[dict[str, Any], dict[str, Any] | None]:
+    """
+    Same rules as add_rel_data, but the changes are returned instead of written
+
+    :return: the new column values for the object and the history row or None, if nothing changed
+    """
+    fields, values = asdict(data), {f"{name}_last_update": None}
+    for field, value in fields.items():
+        if value is None:
+            fields[field] = current[f"{name}_{field}"]
+            continue
+        if current[f"{name}_{field}"] != value:
+            values[f"{name}_{field}"] = value
+    return values, fields if len(values) > 1 else None
+
+
+def bulk_update(session: Session, model, values: dict[int, dict[str, Any]]):
+    """
+    Update many rows by id with executemany, one statement for every distinct set of columns.
+    A value of None for a *_last_update column sets the column to func.now().
+    """
+    shapes: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+    for obj_id, obj_values in values.items():
+        if not obj_values:
+            continue
+        shapes.setdefault(tuple(sorted(obj_values)), []).append({"b_id": obj_id, **{f"b_{key}": value for key, value in obj_values.items()}})
+
+    table = model.__table__
+    for keys, params in shapes.items():
+        columns = {key: func.now() if key.endswith("_last_update") else bindparam(f"b_{key}") for key in keys}
+        stmt = update(table).where(table.c.id == bindparam("b_id")).values(columns)
+        session.execute(stmt, [{key: value for key, value in param.items() if not key.endswith("_last_update")} for param in params])
+
+
+def bulk_add_count(session: Session, model, column: str, counts: dict[int, int]):
+    """Add to a counter column of many rows by id with executemany, see metrico.database.counter"""
+    if params := [{"b_id": obj_id, "b_delta": delta} for obj_id, delta in counts.items() if delta]:
+        table = model.__table__
+        stmt = update(table).where(table.c.id == bindparam("b_id")).values({column: table.c[column] + bindparam("b_delta")})
+        session.execute(stmt, params)
+        # loaded objects would keep the old value
+        for obj_id in counts:
+            if (obj := session.identity_map.get(identity_key(model, obj_id))) is not None:
+                session.expire(obj, [column])
+
+
+def bulk_insert(session: Session, model, rows: list[dict[str, Any]]):
+    if rows:
+        session.execute(insert(model), rows)
+        add_row_count(session, model, len(rows))
+        logger.debug("bulk create: %i x %s", len(rows), model.__name__)
+
+
+def bulk_create_accounts(session: Session, platform: str, datas: Sequence[schemas.Account]) -> tuple[dict[str, int], list[int]]:
+    """
+    Batched version of create_account. Existing accounts are resolved with one IN lookup,
+    missing accounts are inserted in bulk and info/stats history rows are written with executemany.
+
+    :return: mapping identifier -> account id and the ids of the new accounts
+    """
+    unique = {data.identifier: data for data in datas if data is not None}
+    if not unique:
+        return {}, []
+
+    columns = [models.Account.id, models.Account.identifier, models.Account.created_at, models.Account.media_list]
+    columns += [getattr(models.Account, f"info_{field}") for field in schemas.AccountInfo.__dataclass_fields__]
+    columns += [getattr(models.Account, f"stats_{field}") for field in schemas.AccountStats.__dataclass_fields__]
+    columns.append(models.Account.stats_last_update)
+
+    def select_rows(identifiers):
+        stmt = (
+            select(*columns)
+            .where(models.Account.platform == platform, models.Account.identifier.in_(identifiers))
+            .order_by(models.Account.timestamp, models.Account.id)
+        )
+        # the newest row wins, like in get_or_create
+        return {row.identifier: row._asdict() for row in session.execute(stmt)}
+
+    session.flush()
+    rows = select_rows(list(unique))
+    missing = [identifier for identifier in unique if identifier not in rows]
+    if missing:
+        bulk_insert(session, models.Account, [{"platform": platform, "identifier": identifier} for identifier in missing])
+        rows.update(select_rows(missing))
+
+    values: dict[int, dict[str, Any]] = {}
+    infos, stats = [], []
+    for identifier, data in unique.items():
+        row = rows[identifier]
+        values[row["id"]] = {}
+        if data.created and data.created.value:
+            values[row["id"]]["created_at"] = data.created.value
+        if data.media_list and data.media_list != row["media_list"]:
+            values[row["id"]]["media_list"] = data.media_list
+        if data.info:
+            info_values, info_row = bulk_rel_data("info", row, data.info)
+            values[row["id"]].update(info_values)
+            if info_row is not None:
+                infos.append({"account_id": row["id"], **info_row})
+        if data.stats:
+            stats_values, stats_row = bulk_rel_data("stats", row, data.stats)
+            values[row["id"]].update(stats_values)
+            if (growth := get_stats_growth(row["stats_views"], data.stats.views, row["stats_last_update"])) is not None:
+                values[row["id"]]["stats_growth"] = growth
+            if stats_row is not None:
+                stats.append({"account_id": row["id"], **stats_row})
+
+    bulk_update(session, models.Account, values)
+    bulk_insert(session, models.AccountInfo, infos)
+    bulk_insert(session, models.AccountStats, stats)
+    return {identifier: row["id"] for identifier, row in rows.items()}, [rows[identifier]["id"] for identifier in missing]
+
+
+def bulk_create_medias(
+    session: Session, platform: str, datas: Sequence[schemas.Media], account_ids: dict[str, int] | None = None
+) -> tuple[dict[tuple[str, str, schemas.MediaType], int], list[int]]:
+    """
+    Batched version of create_media
+
+    :param account_ids: already resolved media accounts, if None they are resolved with bulk_create_accounts
+    :return: mapping (account identifier, identifier, media_type) -> media id and the ids of the new medias
+    """
+    if account_ids is None:
+        account_ids, _ = bulk_create_accounts(session, platform, [data.account for data in datas if data.account is not None])
+    unique: dict[tuple[int, str, schemas.MediaType], schemas.Media] = {}
+    for data in datas:
+        if data.account is None:
+            logger.warning("media %s has no account -> skipped", data.identifier)
+            continue
+        unique[(account_ids[data.account.identifier], data.identifier, data.media_type)] = data
+    if not unique:
+        return {}, []
+
+    columns = [models.Media.id, models.Media.account_id, models.Media.identifier, models.Media.media_type, models.Media.created_at]
+    columns += [getattr(models.Media, f"info_{field}") for field in schemas.MediaInfo.__dataclass_fields__]
+    columns += [getattr(models.Media, f"stats_{field}") for field in schemas.MediaStats.__dataclass_fields__]
+    columns.append(models.Media.stats_last_update)
+
+    def select_rows(keys):
+        stmt = (
+            select(*columns)
+            .where(models.Media.account_id.in_({key[0] for key in keys}), models.Media.identifier.in_({key[1] for key in keys}))
+            .order_by(models.Media.timestamp, models.Media.id)
+        )
+        result = {(row.account_id, row.identifier, row.media_type): row._asdict() for row in session.execute(stmt)}
+        return {key: row for key, row in result.items() if key in keys}
+
+    rows = select_rows(set(unique))
+    missing = [key for key in unique if key not in rows]
+    if missing:
+        bulk_insert(session, models.Media, [{"account_id": key[0], "identifier": key[1], "media_type": key[2]} for key in missing])
+        rows.update(select_rows(set(missing)))
+        media_counts: dict[int, int] = {}
+        for key in missing:
+            media_counts[key[0]] = media_counts.get(key[0], 0) + 1
+        bulk_add_count(session, models.Account, "medias_count", media_counts)
+
+    values: dict[int, dict[str, Any]] = {}
+    infos, stats = [], []
+    for key, data in unique.items():
+        row = rows[key]
+        values[row["id"]] = {}
+        if data.created and data.created.value:
+            values[row["id"]]["created_at"] = data.created.value
+        if data.info:
+            info_values, info_row = bulk_rel_data("info", row, data.info)
+            values[row["id"]].update(info_values)
+            if info_row is not None:
+                infos.append({"media_id": row["id"], **info_row})
+        if data.stats:
+            stats_values, stats_row = bulk_rel_data("stats", row, data.stats)
+            values[row["id"]].update(stats_values)
+            if (growth := get_stats_growth(row["stats_views"], data.stats.views, row["stats_last_update"])) is not None:
+                values[row["id"]]["stats_growth"] = growth
+            if stats_row is not None:
+                stats.append({"media_id": row["id"], **stats_row})
+
+    bulk_update(session, models.Media, values)
+    bulk_insert(session, models.MediaInfo, infos)
+    bulk_insert(session, models.MediaStats, stats)
+    return {(data.account.identifier, data.identifier, data.media_type): rows[key]["id"] for key, data in unique.items()}, [rows[key]["id"] for key in missing]  # type: ignore
+
+
+def bulk_add_to_trigger(session: Session, trigger: models.Trigger | str | int, accounts: list[int] | None = None, medias: list[int] | None = None):
+    """Add new objects to a trigger, there is no check for existing entries"""
+    trigger_id = get_trigger_id(session, trigger)
+    bulk_insert(session, models.TriggerAccount, [{"trigger_id": trigger_id, "account_id": account_id} for account_id in accounts or []])
+    bulk_insert(session, models.TriggerMedia, [{"trigger_id": trigger_id, "media_id": media_id} for media_id in medias or []])
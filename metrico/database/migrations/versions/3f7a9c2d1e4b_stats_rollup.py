@@ -0,0 +1,62 @@
+"""stats rollup
+
+Revision ID: 3f7a9c2d1e4b
+Revises: 8c3d1e7f2b6a
+Create Date: 2023-03-08 20:14:52.731905
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f7a9c2d1e4b"
+down_revision = "8c3d1e7f2b6a"
+branch_labels = None
+depends_on = None
+
+
+def stats_columns(fields: dict[str, type]) -> list[sa.Column]:
+    columns = []
+    for field, column_type in fields.items():
+        for suffix in ["first", "last", "min", "max"]:
+            columns.append(sa.Column(f"{field}_{suffix}", column_type(), nullable=True))
+        columns.append(sa.Column(f"{field}_lost", column_type(), nullable=False))
+    return columns
+
+
+def upgrade() -> None:
+    op.create_table(
+        "account_stats_rollup",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("period", sa.Enum("HOUR", "DAY", name="rollupperiod"), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+        *stats_columns({"medias": sa.Integer, "views": sa.BigInteger, "followers": sa.BigInteger, "subscriptions": sa.BigInteger}),
+        sa.ForeignKeyConstraint(
+            ["account_id"],
+            ["account.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("account_id", "period", "bucket", name="uq_account_stats_rollup_account_id_period_bucket"),
+    )
+    op.create_table(
+        "media_stats_rollup",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("media_id", sa.Integer(), nullable=False),
+        sa.Column("period", sa.Enum("HOUR", "DAY", name="rollupperiod"), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+        *stats_columns({"comments": sa.Integer, "likes": sa.Integer, "views": sa.BigInteger}),
+        sa.ForeignKeyConstraint(
+            ["media_id"],
+            ["media.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("media_id", "period", "bucket", name="uq_media_stats_rollup_media_id_period_bucket"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("media_stats_rollup")
+    op.drop_table("account_stats_rollup")
@@ -0,0 +1,26 @@
+"""media comment unique
+
+Revision ID: 5b8e2f4c9a1d
+Revises: 1d29c7a82c3a
+Create Date: 2023-03-04 18:42:11.514202
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b8e2f4c9a1d"
+down_revision = "1d29c7a82c3a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # keep only the newest row of duplicated comments, the unique constraint would fail otherwise
+    op.execute("DELETE FROM media_comment WHERE id NOT IN (SELECT max_id FROM (SELECT MAX(id) AS max_id FROM media_comment GROUP BY media_id, identifier) AS newest)")
+    with op.batch_alter_table("media_comment") as batch_op:
+        batch_op.create_unique_constraint("uq_media_comment_media_id_identifier", ["media_id", "identifier"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("media_comment") as batch_op:
+        batch_op.drop_constraint("uq_media_comment_media_id_identifier", type_="unique")
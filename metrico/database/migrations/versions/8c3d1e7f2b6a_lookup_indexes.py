@@ -0,0 +1,45 @@
+"""lookup indexes
+
+Revision ID: 8c3d1e7f2b6a
+Revises: 5b8e2f4c9a1d
+Create Date: 2023-03-05 11:07:36.204118
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8c3d1e7f2b6a"
+down_revision = "5b8e2f4c9a1d"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_account_platform_identifier": ("account", ["platform", "identifier", "timestamp"]),
+    "ix_account_info_name": ("account", ["info_name"]),
+    "ix_account_created_at": ("account", ["created_at"]),
+    "ix_account_subscription_account_id": ("account_subscription", ["account_id", "subscribed_account_id", "timestamp"]),
+    "ix_account_subscription_subscribed_account_id": ("account_subscription", ["subscribed_account_id", "timestamp"]),
+    "ix_account_info_account_id": ("account_info", ["account_id", "timestamp"]),
+    "ix_account_stats_account_id": ("account_stats", ["account_id", "timestamp"]),
+    "ix_media_account_id_identifier": ("media", ["account_id", "identifier", "media_type", "timestamp"]),
+    "ix_media_account_id_created_at": ("media", ["account_id", "created_at"]),
+    "ix_media_created_at": ("media", ["created_at"]),
+    "ix_media_comment_media_id_created_at": ("media_comment", ["media_id", "created_at"]),
+    "ix_media_comment_account_id_created_at": ("media_comment", ["account_id", "created_at"]),
+    "ix_media_comment_created_at": ("media_comment", ["created_at"]),
+    "ix_media_info_media_id": ("media_info", ["media_id", "timestamp"]),
+    "ix_media_stats_media_id": ("media_stats", ["media_id", "timestamp"]),
+    "ix_trigger_account_trigger_id": ("trigger_account", ["trigger_id", "account_id", "timestamp"]),
+    "ix_trigger_media_trigger_id": ("trigger_media", ["trigger_id", "media_id", "timestamp"]),
+    "ix_trigger_stats_trigger_id": ("trigger_stats", ["trigger_id", "timestamp"]),
+}
+
+
+def upgrade() -> None:
+    for name, (table, columns) in INDEXES.items():
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, (table, _) in reversed(INDEXES.items()):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,23 @@
+"""media stats last update index
+
+Revision ID: a3c5e7f9b1d2
+Revises: f1b3d5e7a9c4
+Create Date: 2023-03-19 16:40:22.905117
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3c5e7f9b1d2"
+down_revision = "f1b3d5e7a9c4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the stalest medias first, e.g. MediaQuery(order_by=MediaOrder.UPDATED, order_asc=True)
+    op.create_index("ix_media_stats_last_update", "media", ["stats_last_update"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_stats_last_update", table_name="media")
@@ -0,0 +1,33 @@
+"""row count
+
+Revision ID: a4c6e8f0b2d7
+Revises: 3f7a9c2d1e4b
+Create Date: 2023-03-10 09:31:17.905264
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a4c6e8f0b2d7"
+down_revision = "3f7a9c2d1e4b"
+branch_labels = None
+depends_on = None
+
+TABLES = ["account", "account_subscription", "account_info", "account_stats", "media", "media_info", "media_stats", "media_comment"]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "row_count",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    # start with the exact values, afterwards the counters are maintained by the sessions
+    for table in TABLES:
+        op.execute(f"INSERT INTO row_count (name, count) SELECT '{table}', COUNT(*) FROM {table}")  # nosec
+
+
+def downgrade() -> None:
+    op.drop_table("row_count")
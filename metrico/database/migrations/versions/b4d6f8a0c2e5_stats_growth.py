@@ -0,0 +1,29 @@
+"""stats growth
+
+Revision ID: b4d6f8a0c2e5
+Revises: a3c5e7f9b1d2
+Create Date: 2023-03-20 09:31:57.442871
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b4d6f8a0c2e5"
+down_revision = "a3c5e7f9b1d2"
+branch_labels = None
+depends_on = None
+
+TABLES = ["account", "media"]
+
+
+def upgrade() -> None:
+    # the next stats update sets the growth
+    for table in TABLES:
+        op.add_column(table, sa.Column("stats_growth", sa.Float(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("stats_growth")
@@ -0,0 +1,38 @@
+"""relationship counters
+
+Revision ID: b7d9f1a3c5e8
+Revises: a4c6e8f0b2d7
+Create Date: 2023-03-12 18:04:41.221730
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d9f1a3c5e8"
+down_revision = "a4c6e8f0b2d7"
+branch_labels = None
+depends_on = None
+
+# table, counter column, child table, foreign key
+COUNTERS = [
+    ("account", "medias_count", "media", "account_id"),
+    ("account", "comments_count", "media_comment", "account_id"),
+    ("account", "subscriptions_count", "account_subscription", "account_id"),
+    ("account", "followers_count", "account_subscription", "subscribed_account_id"),
+    ("media", "comments_count", "media_comment", "media_id"),
+]
+
+
+def upgrade() -> None:
+    for table, column, _, _ in COUNTERS:
+        op.add_column(table, sa.Column(column, sa.Integer(), server_default="0", nullable=False))
+    # start with the exact values, afterwards the counters are maintained by the crud functions
+    for table, column, child, foreign_key in COUNTERS:
+        op.execute(f"UPDATE {table} SET {column} = (SELECT COUNT(*) FROM {child} WHERE {child}.{foreign_key} = {table}.id)")  # nosec
+
+
+def downgrade() -> None:
+    for table, column, _, _ in COUNTERS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(column)
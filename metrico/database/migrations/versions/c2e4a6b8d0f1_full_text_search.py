@@ -0,0 +1,51 @@
+"""full text search
+
+Revision ID: c2e4a6b8d0f1
+Revises: b7d9f1a3c5e8
+Create Date: 2023-03-14 20:12:09.517734
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c2e4a6b8d0f1"
+down_revision = "b7d9f1a3c5e8"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "account": ("info_name", "info_bio"),
+    "media": ("info_title", "info_caption"),
+    "media_comment": ("text",),
+}
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table, columns in COLUMNS.items():
+        names = ", ".join(columns)
+        if dialect == "sqlite":
+            fts = f"{table}_fts"
+            new, old = ", ".join(f"new.{item}" for item in columns), ", ".join(f"old.{item}" for item in columns)
+            delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+            insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+            op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='id')")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END")
+            # index the existing rows
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif dialect == "postgresql":
+            document = " || ' ' || ".join(f"coalesce({item}, '')" for item in columns)
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin (to_tsvector('simple'::regconfig, {document}))")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table in COLUMNS:
+        if dialect == "sqlite":
+            for trigger in ["insert", "delete", "update"]:
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        elif dialect == "postgresql":
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
@@ -0,0 +1,23 @@
+"""account stats last update index
+
+Revision ID: c6e8a0b2d4f7
+Revises: b4d6f8a0c2e5
+Create Date: 2023-03-21 10:12:45.318204
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c6e8a0b2d4f7"
+down_revision = "b4d6f8a0c2e5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the stalest accounts first, e.g. the candidates of the UpdateScheduler
+    op.create_index("ix_account_stats_last_update", "account", ["stats_last_update"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_account_stats_last_update", table_name="account")
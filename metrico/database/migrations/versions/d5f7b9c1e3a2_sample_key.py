@@ -0,0 +1,46 @@
+"""sample key
+
+Revision ID: d5f7b9c1e3a2
+Revises: c2e4a6b8d0f1
+Create Date: 2023-03-16 08:47:55.306182
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d5f7b9c1e3a2"
+down_revision = "c2e4a6b8d0f1"
+branch_labels = None
+depends_on = None
+
+# table -> index columns
+TABLES = {
+    "account": ["sample_key"],
+    "media": ["sample_key"],
+    "media_comment": ["sample_key"],
+    "trigger_account": ["trigger_id", "sample_key"],
+    "trigger_media": ["trigger_id", "sample_key"],
+}
+# uniform random value in [0, 1)
+RANDOM = {
+    "sqlite": "random() / 18446744073709551616.0 + 0.5",
+    "postgresql": "random()",
+    "mysql": "rand()",
+}
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table, columns in TABLES.items():
+        op.add_column(table, sa.Column("sample_key", sa.Float(), server_default="0", nullable=False))
+        if dialect in RANDOM:
+            op.execute(f"UPDATE {table} SET sample_key = {RANDOM[dialect]}")  # nosec
+        op.create_index(f"ix_{table}_{'_'.join(columns)}", table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for table, columns in TABLES.items():
+        op.drop_index(f"ix_{table}_{'_'.join(columns)}", table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("sample_key")
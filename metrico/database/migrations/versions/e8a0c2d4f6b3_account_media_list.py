@@ -0,0 +1,24 @@
+"""account media list
+
+Revision ID: e8a0c2d4f6b3
+Revises: d5f7b9c1e3a2
+Create Date: 2023-03-18 11:26:40.648013
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e8a0c2d4f6b3"
+down_revision = "d5f7b9c1e3a2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("account", sa.Column("media_list", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("account") as batch_op:
+        batch_op.drop_column("media_list")
@@ -0,0 +1,25 @@
+"""media comments synced at
+
+Revision ID: f1b3d5e7a9c4
+Revises: e8a0c2d4f6b3
+Create Date: 2023-03-19 10:12:05.318442
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f1b3d5e7a9c4"
+down_revision = "e8a0c2d4f6b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # no mark for the existing medias, their next comment update is a full one
+    op.add_column("media", sa.Column("comments_synced_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("media") as batch_op:
+        batch_op.drop_column("comments_synced_at")
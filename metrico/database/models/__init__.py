@@ -1,4 +1,6 @@
 from .account import Account, AccountInfo, AccountStats, AccountSubscription
 from .basic import Base
 from .media import Media, MediaComment, MediaInfo, MediaStats
+from .rollup import AccountStatsRollup, MediaStatsRollup
+from .row_count import RowCount
 from .trigger import Trigger, TriggerAccount, TriggerMedia, TriggerStats
@@ -1,40 +1,60 @@
 # ruff: noqa: F821
 from typing import Optional
 
+import random
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, ForeignKey
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
 from metrico.schemas import ModelStatus
 
-from .basic import Base
+from .basic import Base, ServerDateTime
 
 
 class Account(Base):
     __tablename__ = "account"
+    __table_args__ = (
+        Index("ix_account_platform_identifier", "platform", "identifier", "timestamp"),
+        Index("ix_account_info_name", "info_name"),
+        Index("ix_account_created_at", "created_at"),
+        Index("ix_account_sample_key", "sample_key"),
+        Index("ix_account_stats_last_update", "stats_last_update"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     status: Mapped[ModelStatus] = mapped_column(default=ModelStatus.OKAY)
     platform: Mapped[str]
+    # random key of the random order, see metrico.database.query.get_sample_ids
+    sample_key: Mapped[float] = mapped_column(default=random.random, server_default="0")
 
     identifier: Mapped[str]
     created_at: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
 
     subscriptions_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
+    # see schemas.Account.media_list, saves the lookup of the list before every media update
+    media_list: Mapped[Optional[str]]
     # medias_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
 
+    # maintained counters of the relationships, see metrico.database.counter
+    medias_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    comments_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    subscriptions_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    followers_count: Mapped[int] = mapped_column(default=0, server_default="0")
+
     info_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     info_name: Mapped[Optional[str]]
     info_bio: Mapped[Optional[str]]
 
-    stats_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
+    stats_last_update: Mapped[datetime] = mapped_column(ServerDateTime, server_default=func.now())
     stats_medias: Mapped[Optional[int]]
     stats_views: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
     stats_followers: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
     stats_subscriptions: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    # relative growth of the views per day at the last stats update, see metrico.database.crud.set_stats_growth
+    stats_growth: Mapped[float] = mapped_column(default=0, server_default="0")
 
     medias: Mapped[list["Media"]] = relationship(  # type: ignore
         back_populates="account",
@@ -76,6 +96,12 @@ class Account(Base):
         order_by="AccountStats.timestamp.desc()",
         lazy="dynamic",
     )
+    stats_rollups: Mapped[list["AccountStatsRollup"]] = relationship(  # type: ignore
+        back_populates="account",
+        cascade="all, delete-orphan",
+        order_by="AccountStatsRollup.bucket.desc()",
+        lazy="dynamic",
+    )
 
     def __repr__(self) -> str:
         return f"Account(id={self.id}, status={self.status!r} platform={self.platform}, identifier={self.identifier})"
@@ -83,6 +109,10 @@ class Account(Base):
 
 class AccountSubscription(Base):
     __tablename__ = "account_subscription"
+    __table_args__ = (
+        Index("ix_account_subscription_account_id", "account_id", "subscribed_account_id", "timestamp"),
+        Index("ix_account_subscription_subscribed_account_id", "subscribed_account_id", "timestamp"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
@@ -101,6 +131,7 @@ class AccountSubscription(Base):
 
 class AccountInfo(Base):
     __tablename__ = "account_info"
+    __table_args__ = (Index("ix_account_info_account_id", "account_id", "timestamp"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
@@ -115,6 +146,7 @@ class AccountInfo(Base):
 
 class AccountStats(Base):
     __tablename__ = "account_stats"
+    __table_args__ = (Index("ix_account_stats_account_id", "account_id", "timestamp"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
@@ -1,3 +1,5 @@
+from sqlalchemy import DateTime
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import DeclarativeBase
 
 #
@@ -29,3 +31,11 @@ from sqlalchemy.orm import DeclarativeBase
 
 class Base(DeclarativeBase):
     pass
+
+
+# timestamps written by the database (func.now()), SQLite stores them without microseconds. The bound values need
+# the same text, otherwise the keyset cursor of an ordered timestamp never equals the stored value.
+ServerDateTime = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
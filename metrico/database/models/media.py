@@ -1,22 +1,32 @@
 from typing import Optional
 
+import random
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
 from metrico.schemas import MediaType, ModelStatus
 
 from .account import Account
-from .basic import Base
+from .basic import Base, ServerDateTime
 
 
 class Media(Base):
     __tablename__ = "media"
+    __table_args__ = (
+        Index("ix_media_account_id_identifier", "account_id", "identifier", "media_type", "timestamp"),
+        Index("ix_media_account_id_created_at", "account_id", "created_at"),
+        Index("ix_media_created_at", "created_at"),
+        Index("ix_media_sample_key", "sample_key"),
+        Index("ix_media_stats_last_update", "stats_last_update"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     status: Mapped[ModelStatus] = mapped_column(default=ModelStatus.OKAY)
+    # random key of the random order, see metrico.database.query.get_sample_ids
+    sample_key: Mapped[float] = mapped_column(default=random.random, server_default="0")
     account: Mapped["Account"] = relationship(back_populates="medias")
     account_id: Mapped[int] = mapped_column(ForeignKey("account.id"))
 
@@ -25,16 +35,22 @@ class Media(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
 
     comments_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
+    # high-water mark: start (UTC) of the last complete comment update, the incremental update stops there
+    comments_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(), nullable=True)
+    # maintained counter of the comments, see metrico.database.counter
+    comments_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     info_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     info_title: Mapped[Optional[str]]
     info_caption: Mapped[Optional[str]]
     info_disable_comments: Mapped[bool] = mapped_column(Boolean(), default=False)
 
-    stats_last_update: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
+    stats_last_update: Mapped[datetime] = mapped_column(ServerDateTime, server_default=func.now())
     stats_comments: Mapped[Optional[int]]
     stats_likes: Mapped[Optional[int]]
     stats_views: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    # relative growth of the views per day at the last stats update, see metrico.database.crud.set_stats_growth
+    stats_growth: Mapped[float] = mapped_column(default=0, server_default="0")
 
     comments: Mapped[list["MediaComment"]] = relationship(
         back_populates="media",
@@ -54,6 +70,12 @@ class Media(Base):
         order_by="MediaStats.timestamp.desc()",
         lazy="dynamic",
     )
+    stats_rollups: Mapped[list["MediaStatsRollup"]] = relationship(  # type: ignore
+        back_populates="media",
+        cascade="all, delete-orphan",
+        order_by="MediaStatsRollup.bucket.desc()",
+        lazy="dynamic",
+    )
 
     def __repr__(self) -> str:
         return f"Media(id={self.id!r}, account={self.account_id!r}, info_title={self.info_title!r})"
@@ -64,10 +86,19 @@ class Media(Base):
 
 class MediaComment(Base):
     __tablename__ = "media_comment"
+    __table_args__ = (
+        UniqueConstraint("media_id", "identifier", name="uq_media_comment_media_id_identifier"),
+        Index("ix_media_comment_media_id_created_at", "media_id", "created_at"),
+        Index("ix_media_comment_account_id_created_at", "account_id", "created_at"),
+        Index("ix_media_comment_created_at", "created_at"),
+        Index("ix_media_comment_sample_key", "sample_key"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     status: Mapped[ModelStatus] = mapped_column(default=ModelStatus.OKAY)
+    # random key of the random order, see metrico.database.query.get_sample_ids
+    sample_key: Mapped[float] = mapped_column(default=random.random, server_default="0")
     media: Mapped["Media"] = relationship(back_populates="comments")
     media_id: Mapped[int] = mapped_column(ForeignKey("media.id"))
 
@@ -85,6 +116,7 @@ class MediaComment(Base):
 
 class MediaInfo(Base):
     __tablename__ = "media_info"
+    __table_args__ = (Index("ix_media_info_media_id", "media_id", "timestamp"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
@@ -101,6 +133,7 @@ class MediaInfo(Base):
 
 class MediaStats(Base):
     __tablename__ = "media_stats"
+    __table_args__ = (Index("ix_media_stats_media_id", "media_id", "timestamp"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
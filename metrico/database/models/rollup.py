@@ -0,0 +1,78 @@
+# ruff: noqa: F821
+from typing import Optional
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from metrico.schemas import RollupPeriod
+
+from .basic import Base
+
+
+class AccountStatsRollup(Base):
+    __tablename__ = "account_stats_rollup"
+    __table_args__ = (UniqueConstraint("account_id", "period", "bucket", name="uq_account_stats_rollup_account_id_period_bucket"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    account: Mapped["Account"] = relationship(back_populates="stats_rollups")
+    account_id: Mapped[int] = mapped_column(ForeignKey("account.id"))
+    period: Mapped[RollupPeriod]
+    bucket: Mapped[datetime] = mapped_column(DateTime())
+    samples: Mapped[int]
+
+    medias_first: Mapped[Optional[int]]
+    medias_last: Mapped[Optional[int]]
+    medias_min: Mapped[Optional[int]]
+    medias_max: Mapped[Optional[int]]
+    medias_lost: Mapped[int] = mapped_column(default=0)
+    views_first: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_last: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_min: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_max: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_lost: Mapped[int] = mapped_column(BigInteger(), default=0)
+    followers_first: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    followers_last: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    followers_min: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    followers_max: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    followers_lost: Mapped[int] = mapped_column(BigInteger(), default=0)
+    subscriptions_first: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    subscriptions_last: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    subscriptions_min: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    subscriptions_max: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    subscriptions_lost: Mapped[int] = mapped_column(BigInteger(), default=0)
+
+    def __repr__(self) -> str:
+        return f"AccountStatsRollup(period={self.period!r}, bucket={self.bucket!r}, samples={self.samples!r}, followers_last={self.followers_last!r})"
+
+
+class MediaStatsRollup(Base):
+    __tablename__ = "media_stats_rollup"
+    __table_args__ = (UniqueConstraint("media_id", "period", "bucket", name="uq_media_stats_rollup_media_id_period_bucket"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    media: Mapped["Media"] = relationship(back_populates="stats_rollups")
+    media_id: Mapped[int] = mapped_column(ForeignKey("media.id"))
+    period: Mapped[RollupPeriod]
+    bucket: Mapped[datetime] = mapped_column(DateTime())
+    samples: Mapped[int]
+
+    comments_first: Mapped[Optional[int]]
+    comments_last: Mapped[Optional[int]]
+    comments_min: Mapped[Optional[int]]
+    comments_max: Mapped[Optional[int]]
+    comments_lost: Mapped[int] = mapped_column(default=0)
+    likes_first: Mapped[Optional[int]]
+    likes_last: Mapped[Optional[int]]
+    likes_min: Mapped[Optional[int]]
+    likes_max: Mapped[Optional[int]]
+    likes_lost: Mapped[int] = mapped_column(default=0)
+    views_first: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_last: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_min: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_max: Mapped[Optional[int]] = mapped_column(BigInteger(), nullable=True)
+    views_lost: Mapped[int] = mapped_column(BigInteger(), default=0)
+
+    def __repr__(self) -> str:
+        return f"MediaStatsRollup(period={self.period!r}, bucket={self.bucket!r}, samples={self.samples!r}, likes_last={self.likes_last!r})"
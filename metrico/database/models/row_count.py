@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .basic import Base
+
+
+class RowCount(Base):
+    __tablename__ = "row_count"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger(), default=0)
+
+    def __repr__(self) -> str:
+        return f"RowCount(name={self.name!r}, count={self.count!r})"
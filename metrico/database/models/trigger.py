@@ -1,8 +1,9 @@
 from typing import TYPE_CHECKING
 
+import random
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey
+from sqlalchemy import DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -41,10 +42,16 @@ class Trigger(Base):
 
 class TriggerAccount(Base):
     __tablename__ = "trigger_account"
+    __table_args__ = (
+        Index("ix_trigger_account_trigger_id", "trigger_id", "account_id", "timestamp"),
+        Index("ix_trigger_account_trigger_id_sample_key", "trigger_id", "sample_key"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     trigger_id: Mapped[int] = mapped_column(ForeignKey("trigger.id"))
     account_id: Mapped[int] = mapped_column(ForeignKey("account.id"))
+    # random key of the random order, see metrico.database.query.get_sample_ids
+    sample_key: Mapped[float] = mapped_column(default=random.random, server_default="0")
 
     trigger: Mapped[list["Trigger"]] = relationship(back_populates="accounts")
     account: Mapped[list["Account"]] = relationship()
@@ -52,10 +59,16 @@ class TriggerAccount(Base):
 
 class TriggerMedia(Base):
     __tablename__ = "trigger_media"
+    __table_args__ = (
+        Index("ix_trigger_media_trigger_id", "trigger_id", "media_id", "timestamp"),
+        Index("ix_trigger_media_trigger_id_sample_key", "trigger_id", "sample_key"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     trigger_id: Mapped[int] = mapped_column(ForeignKey("trigger.id"))
     media_id: Mapped[int] = mapped_column(ForeignKey("media.id"))
+    # random key of the random order, see metrico.database.query.get_sample_ids
+    sample_key: Mapped[float] = mapped_column(default=random.random, server_default="0")
 
     trigger: Mapped[list["Trigger"]] = relationship(back_populates="medias")
     media: Mapped[list["Media"]] = relationship()
@@ -63,6 +76,7 @@ class TriggerMedia(Base):
 
 class TriggerStats(Base):
     __tablename__ = "trigger_stats"
+    __table_args__ = (Index("ix_trigger_stats_trigger_id", "trigger_id", "timestamp"),)
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(), server_default=func.now())
     trigger_id: Mapped[int] = mapped_column(ForeignKey("trigger.id"))
@@ -1,21 +1,113 @@
-from typing import Any
+from typing import Any, Iterator
 
+import base64
+import binascii
+import json
 from argparse import Namespace
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime
 from enum import Enum
 from logging import getLogger
+from random import Random
 
-from sqlalchemy import select
-from sqlalchemy.orm import InstrumentedAttribute, Session
-from sqlalchemy.sql import Select, func
+from sqlalchemy import BigInteger, CompoundSelect, Float, and_, case, cast, literal, or_, select, true, tuple_, union_all
+from sqlalchemy.orm import InstrumentedAttribute, Session, joinedload, selectinload
+from sqlalchemy.orm.strategy_options import _AbstractLoad
+from sqlalchemy.sql import ColumnElement, Select, func
 
 from metrico.database.models import Account, Base, Media, MediaComment
+from metrico.database.search import SEARCH_COLUMNS, SearchMatch
 from metrico.schemas import ModelStatus
 
 logger = getLogger(__name__)
 
 
+def encode_cursor(order: str, value: Any, obj_id: int) -> str:
+    if isinstance(value, datetime):
+        value = {"datetime": value.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps([order, value, obj_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, Any, int]:
+    try:
+        order, value, obj_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["datetime"])
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise ValueError(f"Invalid cursor {cursor!r}") from exc
+    return order, value, int(obj_id)
+
+
+# min rows of the key range estimate, more rows give a smaller variance of the sample
+SAMPLE_MIN_ROWS = 20
+# expected rows covered by the intervals per sample row
+SAMPLE_COVERAGE = 5
+SAMPLE_MAX_INTERVALS = 100
+# prime modulus of the sample order and the interval generator, the ids are smaller
+SAMPLE_PRIME = 2147483647
+SAMPLE_MULTIPLIER = 16807
+
+
+def get_sample_order(id_field: InstrumentedAttribute[int], rnd: Random) -> ColumnElement[int]:
+    """Seeded pseudo-random order of the ids, independent of the sample key"""
+    return (cast(id_field, BigInteger) * rnd.randrange(1, SAMPLE_PRIME)) % SAMPLE_PRIME
+
+
+def get_sample_ids(stmt: Select[Any], key: InstrumentedAttribute[float], limit: int, rnd: Random) -> CompoundSelect:
+    """
+    Candidate ids of a random sample, ordered by get_sample_order the first limit ids are the sample.
+
+    The sample key is random, so a key interval of a fixed width contains every row with the same
+    probability. The width is estimated from the keys of the next rows after a random start, such that
+    the random intervals cover about SAMPLE_COVERAGE rows per sample row (at least SAMPLE_MIN_ROWS).
+    Every row is a candidate with the same probability and the order does not depend on the keys, so
+    every row is in the sample with the same probability. The next limit rows after a random start
+    would pick a row after a large gap between the keys more often. Small tables are covered completely.
+    Every interval is an index range scan over the sample key, so the time is proportional to the limit
+    and not to the table size.
+
+    :param stmt: select of the id column with all filters
+    :param rnd: the same state gives the same sample, use the next values for get_sample_order
+    """
+    stmt = stmt.order_by(None).limit(None).offset(None)
+    size = max(limit, SAMPLE_MIN_ROWS)
+    # start in the first half, so fewer rows after it mean a small table
+    start = rnd.random() / 2
+    window = stmt.with_only_columns(key.label("key"), maintain_column_froms=True).where(key >= start).order_by(key).limit(size).subquery()
+    row_width = case((func.count() == size, (func.max(window.c.key) - start) / size), else_=1.0)
+    intervals = min(SAMPLE_COVERAGE * size, SAMPLE_MAX_INTERVALS)
+    # a materialized CTE, the estimate runs only once
+    width = select((row_width * SAMPLE_COVERAGE * size / intervals).label("width")).select_from(window).cte("sample_width")
+    # the interval begins of a seeded Lehmer generator, only the seed is a parameter of the cached statement
+    seed = cast(literal(rnd.randrange(1, SAMPLE_PRIME)), BigInteger)
+    begins = select(literal(1).label("number"), seed.label("state")).cte("sample_intervals", recursive=True)
+    begins = begins.union_all(select(begins.c.number + 1, begins.c.state * SAMPLE_MULTIPLIER % SAMPLE_PRIME).where(begins.c.number < intervals))
+    begin = cast(begins.c.state, Float) / SAMPLE_PRIME
+    covered = stmt.join(width, true())
+    # the intervals are wrapped around at 1
+    head = covered.join(begins, and_(key >= begin, key < begin + width.c.width))
+    tail = covered.join(begins, key < begin - 1 + width.c.width)
+    return union_all(head, tail)
+
+
+def get_load_option(model: type[Base], path: str) -> _AbstractLoad:
+    """
+    Eager load option for a dotted relationship path like "media.account".
+    Many-to-one relationships are joined, collections are loaded with a second SELECT ... IN.
+    """
+    option: Any = None
+    for name in path.split("."):
+        attr = getattr(model, name, None)
+        if attr is None or not hasattr(attr.property, "mapper"):
+            raise ValueError(f"{model.__name__} has no relationship {name!r} (load={path!r})")
+        if attr.property.lazy == "dynamic":
+            raise ValueError(f"The dynamic relationship {model.__name__}.{name} can not be loaded eagerly (load={path!r})")
+        loader = selectinload if attr.property.uselist else joinedload
+        option = loader(attr) if option is None else getattr(option, loader.__name__)(attr)
+        model = attr.property.mapper.class_
+    return option
+
+
 class IterMode(Enum):
     SCALAR = 0
     SCALARS = 1
@@ -66,6 +158,13 @@ class BasicQuery:
     created: tuple[datetime, datetime] | None = None
     status: ModelStatus | None = None
     accounts: str | int | list[str] | list[int] | None = None
+    after: str | None = None
+    # full-text search, all words must be in the searched columns of the model
+    search: str | None = None
+    # seed of the random order, the same seed gives the same sample
+    seed: int | None = None
+    # relationships to load with the objects, e.g. ["account", "media.account"]
+    load: list[str] | None = None
 
     @classmethod
     def from_namespace(cls, args: Namespace):
@@ -79,6 +178,9 @@ class BasicQuery:
         self.created = args.filter_datetime
         self.status = args.filter_status
         self.accounts = args.filter_account_id or args.filter_account
+        self.after = args.after
+        self.search = args.search
+        self.seed = args.seed
 
     def query(self, stmt: Select[Any] | None = None) -> Select[Any]:
         if stmt is None:
@@ -86,8 +188,75 @@ class BasicQuery:
         stmt = self.query_limit_offset(stmt)
         stmt = self.query_filter_created(stmt)
         stmt = self.query_filter_status(stmt)
+        stmt = self.query_filter_search(stmt)
+        stmt = self.query_after(stmt)
+        stmt = self.query_load(stmt)
+        return stmt
+
+    def query_load(self, stmt: Select[Any]) -> Select[Any]:
+        for path in self.load or []:
+            stmt = stmt.options(get_load_option(self.model, path))
         return stmt
 
+    def get_order_name(self) -> str:
+        return str(getattr(self, "order_by", None))
+
+    def get_order_field(self) -> InstrumentedAttribute[Any] | None:
+        """The ordered column, None for orders without keyset pagination (e.g. random)"""
+        return self.model.id  # type: ignore
+
+    def get_cursor(self, obj) -> str:
+        """Opaque cursor of an object, the next page starts after it"""
+        order_field = self.get_order_field()
+        if order_field is None:
+            raise ValueError(f"Keyset pagination is not supported for order {self.get_order_name()}")
+        return encode_cursor(self.get_order_name(), getattr(obj, order_field.key), obj.id)
+
+    def query_after(self, stmt: Select[Any]) -> Select[Any]:
+        """
+        Keyset pagination: only rows after the cursor in the order (order field nulls last, id).
+        The order field and id are indexed, so every page is a cheap index range scan, unlike an offset.
+        """
+        if not self.after:
+            return stmt
+        order_field = self.get_order_field()
+        if order_field is None:
+            raise ValueError(f"Keyset pagination is not supported for order {self.get_order_name()}")
+        order, value, obj_id = decode_cursor(self.after)
+        if order != self.get_order_name():
+            raise ValueError(f"The cursor is for order {order}, not {self.get_order_name()}")
+
+        order_asc = getattr(self, "order_asc", False)
+        id_field = self.model.id  # type: ignore
+        id_after = id_field > obj_id if order_asc else id_field < obj_id
+        if order_field is id_field:
+            return stmt.where(id_after)
+        if value is None:
+            return stmt.where(order_field.is_(None), id_after)
+        # a row value comparison is a single index range, the nulls are sorted after all values
+        keys, cursor = tuple_(order_field, id_field), tuple_(literal(value, order_field.type), literal(obj_id))
+        row_after = keys > cursor if order_asc else keys < cursor
+        if order_field.property.columns[0].nullable:
+            return stmt.where(or_(row_after, order_field.is_(None)))
+        return stmt.where(row_after)
+
+    def query_order_field(self, stmt: Select[Any], order_field: InstrumentedAttribute[Any], order_asc: bool) -> Select[Any]:
+        """Order by the field with nulls last and the id as tiebreaker"""
+        id_field = self.model.id  # type: ignore
+        if order_asc:
+            stmt = stmt.order_by(order_field.nulls_last())
+            return stmt if order_field is id_field else stmt.order_by(id_field)
+        stmt = stmt.order_by(order_field.desc().nulls_last())
+        return stmt if order_field is id_field else stmt.order_by(id_field.desc())
+
+    def query_sample(self, stmt: Select[Any]) -> Select[Any]:
+        """Random order of the filtered rows, with a limit only the candidate ids of the sample are read instead of sorting everything"""
+        rnd, key, id_field = Random(self.seed), self.model.sample_key, self.model.id  # type: ignore
+        if self.limit:
+            ids = stmt.with_only_columns(id_field, maintain_column_froms=True)
+            stmt = stmt.where(id_field.in_(get_sample_ids(ids, key, self.offset + self.limit, rnd)))
+        return stmt.order_by(get_sample_order(id_field, rnd), id_field)
+
     def query_limit_offset(self, stmt: Select[Any]) -> Select[Any]:
         if self.offset:
             stmt = stmt.offset(self.offset)
@@ -108,11 +277,49 @@ class BasicQuery:
                 return stmt.where(self.model.status == ModelStatus.FAIL)  # type: ignore
         return stmt
 
-    def iter(self, session: Session):
+    def query_filter_search(self, stmt: Select[Any]) -> Select[Any]:
+        if self.search and self.search.split() and self.model in SEARCH_COLUMNS:
+            stmt = stmt.where(SearchMatch(self.model, self.search))
+        return stmt
+
+    def iter(self, session: Session, yield_per: int = 0):
+        """
+        Iterate the result objects
+
+        :param yield_per: stream the result in batches of n rows with bounded memory, 0 = buffer the whole result
+        """
         stmt = self.query()
+        if yield_per > 0:
+            stmt = stmt.execution_options(yield_per=yield_per, stream_results=True)
         result = session.execute(stmt)
         yield from result.scalars()
 
+    def iter_ids(self, session: Session, yield_per: int = 1000) -> Iterator[int]:
+        """Iterate only the ids of the result, streamed like iter"""
+        # loader options need the entity, the ids don't need them anyway
+        stmt = replace(self, load=None).query().with_only_columns(self.model.id, maintain_column_froms=True)  # type: ignore
+        if yield_per > 0:
+            stmt = stmt.execution_options(yield_per=yield_per, stream_results=True)
+        yield from session.execute(stmt).scalars()
+
+    def iter_pages(self, session: Session, page_size: int = 100) -> Iterator[list[Any]]:
+        """
+        Iterate the results page by page with keyset pagination, starting after self.after.
+        The limit of the query is the total limit over all pages.
+        """
+        page_query, total = replace(self, limit=page_size, offset=0), 0
+        while True:
+            if self.limit:
+                page_query.limit = min(page_size, self.limit - total)
+            page = list(session.execute(page_query.query()).scalars())
+            if not page:
+                return
+            yield page
+            total += len(page)
+            if len(page) < page_query.limit or (self.limit and total >= self.limit):
+                return
+            page_query.after = page_query.get_cursor(page[-1])
+
 
 @dataclass
 class AccountQuery(BasicQuery):
@@ -132,42 +339,51 @@ class AccountQuery(BasicQuery):
         self.stats_views_null = args.filter_stats_views_null
 
     def query(self, stmt: Select[Any] | None = None) -> Select[Any]:
-        if self.medias:
+        joined = bool(self.medias)
+        if joined:
             stmt = select(Account).join(MediaComment, MediaComment.account_id == Account.id)
         stmt = super().query(stmt)
         stmt = self.query_order(stmt)
         stmt = self.query_filter_account(stmt)
         stmt = self.query_filter_comment_media(stmt)
         stmt = self.query_filter_stats(stmt)
-        stmt = stmt.group_by(Account.id)
+        # only the comment join needs the grouping, without it the order indexes can be used
+        if joined:
+            stmt = stmt.group_by(Account.id)
+        if self.order_by == AccountOrder.RANDOM:
+            stmt = self.query_sample(stmt)
         return stmt
 
-    def query_order(self, stmt: Select[Any]) -> Select[Any]:
-        order_field: InstrumentedAttribute[Any]
+    def get_order_field(self) -> InstrumentedAttribute[Any] | None:
         match self.order_by:
             case AccountOrder.CREATED:
-                order_field = Account.created_at
+                return Account.created_at
             case AccountOrder.UPDATED:
-                order_field = Account.stats_last_update
+                return Account.stats_last_update
             case AccountOrder.COMMENTS:
-                if self.order_asc:
-                    return stmt.order_by(func.count(MediaComment.id))
-                return stmt.order_by(func.count(MediaComment.id).desc())
+                # with the media filter only the comments of these medias count
+                return None if self.medias else Account.comments_count
+            case AccountOrder.RANDOM:
+                return None
             case AccountOrder.MEDIAS:
-                order_field = Account.stats_medias
+                return Account.stats_medias
             case AccountOrder.VIEWS:
-                order_field = Account.stats_views
+                return Account.stats_views
             case AccountOrder.FOLLOWERS:
-                order_field = Account.stats_followers
+                return Account.stats_followers
             case AccountOrder.SUBSCRIPTIONS:
-                order_field = Account.stats_subscriptions
+                return Account.stats_subscriptions
+        return Account.id
+
+    def query_order(self, stmt: Select[Any]) -> Select[Any]:
+        match self.order_by:
+            case AccountOrder.COMMENTS if self.medias:
+                if self.order_asc:
+                    return stmt.order_by(func.count(MediaComment.id))
+                return stmt.order_by(func.count(MediaComment.id).desc())
             case AccountOrder.RANDOM:
-                return stmt.order_by(func.random())
-            case _:
-                order_field = Account.id
-        if self.order_asc:
-            return stmt.order_by(order_field.nulls_last())
-        return stmt.order_by(order_field.desc().nulls_last())
+                return stmt
+        return self.query_order_field(stmt, self.get_order_field(), self.order_asc)  # type: ignore
 
     def query_filter_account(self, stmt: Select[Any]) -> Select[Any]:
         if isinstance(self.accounts, list) and len(self.accounts) == 1:
@@ -215,26 +431,30 @@ class MediaQuery(BasicQuery):
         stmt = super().query(stmt)
         stmt = self.query_order(stmt)
         stmt = self.query_filter_account(stmt)
+        if self.order_by == MediaOrder.RANDOM:
+            stmt = self.query_sample(stmt)
         return stmt
 
-    def query_order(self, stmt: Select[Any]) -> Select[Any]:
-        order_field: InstrumentedAttribute[Any]
+    def get_order_field(self) -> InstrumentedAttribute[Any] | None:
         match self.order_by:
             case MediaOrder.CREATED:
-                order_field = Media.created_at
+                return Media.created_at
+            case MediaOrder.UPDATED:
+                return Media.stats_last_update
             case MediaOrder.COMMENTS:
-                order_field = Media.stats_comments
+                return Media.stats_comments
             case MediaOrder.LIKES:
-                order_field = Media.stats_likes
+                return Media.stats_likes
             case MediaOrder.VIEWS:
-                order_field = Media.stats_views
+                return Media.stats_views
             case MediaOrder.RANDOM:
-                return stmt.order_by(func.random())
-            case _:
-                order_field = Media.id
-        if self.order_asc:
-            return stmt.order_by(order_field)
-        return stmt.order_by(order_field.desc())
+                return None
+        return Media.id
+
+    def query_order(self, stmt: Select[Any]) -> Select[Any]:
+        if self.order_by == MediaOrder.RANDOM:
+            return stmt
+        return self.query_order_field(stmt, self.get_order_field(), self.order_asc)  # type: ignore
 
     def query_filter_account(self, stmt: Select[Any]) -> Select[Any]:
         if isinstance(self.accounts, list) and len(self.accounts) == 1:
@@ -268,24 +488,26 @@ class MediaCommentQuery(BasicQuery):
         stmt = self.query_order(stmt)
         stmt = self.query_filter_account(stmt)
         stmt = self.query_filter_media_account(stmt)
+        if self.order_by == MediaCommentOrder.RANDOM:
+            stmt = self.query_sample(stmt)
         return stmt
 
-    def query_order(self, stmt: Select[Any]) -> Select[Any]:
-        order_field: InstrumentedAttribute[Any]
+    def get_order_field(self) -> InstrumentedAttribute[Any] | None:
         match self.order_by:
             case MediaCommentOrder.CREATED:
-                order_field = MediaComment.created_at
+                return MediaComment.created_at
             case MediaCommentOrder.TIMESTAMP:
-                order_field = MediaComment.timestamp
+                return MediaComment.timestamp
             case MediaCommentOrder.LIKES:
-                order_field = MediaComment.likes
-            case MediaOrder.RANDOM:
-                return stmt.order_by(func.random())
-            case _:
-                order_field = MediaComment.id
-        if self.order_asc:
-            return stmt.order_by(order_field)
-        return stmt.order_by(order_field.desc())
+                return MediaComment.likes
+            case MediaCommentOrder.RANDOM:
+                return None
+        return MediaComment.id
+
+    def query_order(self, stmt: Select[Any]) -> Select[Any]:
+        if self.order_by == MediaCommentOrder.RANDOM:
+            return stmt
+        return self.query_order_field(stmt, self.get_order_field(), self.order_asc)  # type: ignore
 
     def query_filter_account(self, stmt: Select[Any]) -> Select[Any]:
         if isinstance(self.accounts, list) and len(self.accounts) == 1:
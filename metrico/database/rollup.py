@@ -0,0 +1,194 @@
+"""
+Hourly and daily rollups of the raw stats rows.
+
+Every bucket stores first/last/min/max and the summed decrease (lost) of all fields.
+The job is incremental: the end of the newest bucket of a period is the watermark,
+only closed buckets after the watermark are rolled up.
+"""
+from typing import Any, Iterator
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from metrico.schemas import RollupPeriod
+
+from . import models
+from .counter import add_row_count
+from .crud import bulk_insert
+
+logger = getLogger(__name__)
+
+ROLLUP_DELTAS = {
+    RollupPeriod.HOUR: timedelta(hours=1),
+    RollupPeriod.DAY: timedelta(days=1),
+}
+
+
+@dataclass
+class RollupSource:
+    raw: Any
+    rollup: Any
+    key: str
+    fields: tuple[str, ...]
+
+
+ROLLUP_SOURCES = {
+    models.Account: RollupSource(models.AccountStats, models.AccountStatsRollup, "account_id", ("medias", "views", "followers", "subscriptions")),
+    models.Media: RollupSource(models.MediaStats, models.MediaStatsRollup, "media_id", ("comments", "likes", "views")),
+}
+
+
+def get_bucket(timestamp: datetime, period: RollupPeriod) -> datetime:
+    delta = ROLLUP_DELTAS[period]
+    return datetime.min + ((timestamp - datetime.min) // delta) * delta
+
+
+def get_watermark(session: Session, source: RollupSource, period: RollupPeriod) -> datetime | None:
+    """End of the newest rolled up bucket, everything before is already rolled up"""
+    bucket = session.scalar(select(func.max(source.rollup.bucket)).where(source.rollup.period == period))
+    return bucket + ROLLUP_DELTAS[period] if bucket is not None else None
+
+
+def _new_bucket(source: RollupSource, period: RollupPeriod, key: int, bucket: datetime, values: tuple) -> dict[str, Any]:
+    row: dict[str, Any] = {source.key: key, "period": period, "bucket": bucket, "samples": 0}
+    for field, value in zip(source.fields, values):
+        row.update({f"{field}_first": value, f"{field}_last": value, f"{field}_min": value, f"{field}_max": value, f"{field}_lost": 0})
+    return row
+
+
+def _add_sample(source: RollupSource, row: dict[str, Any], values: tuple):
+    row["samples"] += 1
+    for field, value in zip(source.fields, values):
+        if value is None:
+            continue
+        last = row[f"{field}_last"]
+        if last is not None and value < last:
+            row[f"{field}_lost"] += last - value
+        if row[f"{field}_first"] is None:
+            row[f"{field}_first"] = value
+        row[f"{field}_last"] = value
+        row[f"{field}_min"] = value if row[f"{field}_min"] is None else min(row[f"{field}_min"], value)
+        row[f"{field}_max"] = value if row[f"{field}_max"] is None else max(row[f"{field}_max"], value)
+
+
+def rollup_stats(session: Session, source: RollupSource, period: RollupPeriod, until: datetime, batch_size: int = 1000) -> int:
+    """
+    Roll up all raw rows between the watermark and the start of the bucket containing until
+
+    :return: number of created buckets
+    """
+    start, end = get_watermark(session, source, period), get_bucket(until, period)
+    if start is not None and start >= end:
+        return 0
+
+    key_column = getattr(source.raw, source.key)
+    stmt = select(key_column, source.raw.timestamp, *[getattr(source.raw, field) for field in source.fields]).where(source.raw.timestamp < end)
+    if start is not None:
+        stmt = stmt.where(source.raw.timestamp >= start)
+    stmt = stmt.order_by(key_column, source.raw.timestamp, source.raw.id).execution_options(yield_per=batch_size)
+
+    count, rows, row = 0, [], None
+    for key, timestamp, *values in session.execute(stmt):
+        bucket = get_bucket(timestamp, period)
+        if row is None or row[source.key] != key or row["bucket"] != bucket:
+            if row is not None:
+                rows.append(row)
+            row = _new_bucket(source, period, key, bucket, tuple(values))
+        _add_sample(source, row, tuple(values))
+
+        if len(rows) >= batch_size:
+            bulk_insert(session, source.rollup, rows)
+            count, rows = count + len(rows), []
+
+    if row is not None:
+        rows.append(row)
+    if rows:
+        bulk_insert(session, source.rollup, rows)
+        count += len(rows)
+    logger.debug("rollup %s %s: %s buckets until %s", source.raw.__tablename__, period, count, end)
+    return count
+
+
+def prune_stats(session: Session, source: RollupSource, before: datetime) -> int:
+    """
+    Delete raw rows older than before, but only those which are rolled up in every period
+
+    :return: number of deleted rows
+    """
+    watermarks = [get_watermark(session, source, period) for period in RollupPeriod]
+    if any(watermark is None for watermark in watermarks):
+        return 0
+    cutoff = min(before, *watermarks)  # type: ignore
+    result = session.execute(delete(source.raw).where(source.raw.timestamp < cutoff))
+    add_row_count(session, source.raw, -result.rowcount)
+    logger.debug("prune %s: %s rows before %s", source.raw.__tablename__, result.rowcount, cutoff)
+    return result.rowcount
+
+
+def rollup(session: Session, until: datetime | None = None, retention_days: int = 0) -> dict[str, int]:
+    """
+    Run the incremental rollup for all sources and periods and apply the retention
+
+    :param until: roll up all closed buckets before this timestamp, default is the database time
+    :param retention_days: delete raw rows older than n days, 0 = keep everything
+    :return: number of created buckets and deleted rows by table name
+    """
+    if until is None:
+        until = session.scalar(select(func.now()))
+    results = {}
+    for source in ROLLUP_SOURCES.values():
+        results[source.rollup.__tablename__] = sum(rollup_stats(session, source, period, until) for period in RollupPeriod)
+        if retention_days > 0:
+            results[source.raw.__tablename__] = prune_stats(session, source, until - timedelta(days=retention_days))
+    return results
+
+
+def iter_stats(obj: models.Account | models.Media, period: RollupPeriod) -> Iterator[tuple[Any, bool]]:
+    """Iterate the rollups of an account or media and afterwards the raw rows, which are not rolled up yet (oldest first)"""
+    source = ROLLUP_SOURCES[type(obj)]
+    end = None
+    for item in obj.stats_rollups.filter_by(period=period).order_by(None).order_by(source.rollup.bucket.asc()):
+        end = item.bucket + ROLLUP_DELTAS[period]
+        yield item, True
+
+    stats = obj.stats.order_by(None).order_by(source.raw.timestamp.asc(), source.raw.id.asc())
+    if end is not None:
+        stats = stats.filter(source.raw.timestamp >= end)
+    for item in stats:
+        yield item, False
+
+
+def iter_segments(obj: models.Account | models.Media, period: RollupPeriod) -> Iterator[tuple[tuple, tuple, tuple]]:
+    """Iterate (first, last, lost) values of all fields, a raw row is a segment without lost values"""
+    fields = ROLLUP_SOURCES[type(obj)].fields
+    for item, is_rollup in iter_stats(obj, period):
+        if is_rollup:
+            yield (
+                tuple(getattr(item, f"{field}_first") for field in fields),
+                tuple(getattr(item, f"{field}_last") for field in fields),
+                tuple(getattr(item, f"{field}_lost") for field in fields),
+            )
+        else:
+            values = tuple(getattr(item, field) for field in fields)
+            yield values, values, tuple(0 for _ in fields)
+
+
+def get_stats(obj: models.Account | models.Media, period: RollupPeriod | None = None) -> list:
+    """
+    Get the stats of an account or media, newest first.
+    With a period every bucket becomes one (not persisted) stats row with the last values of the bucket.
+    """
+    if period is None:
+        return obj.stats.all()
+
+    source = ROLLUP_SOURCES[type(obj)]
+    stats = []
+    for item, is_rollup in iter_stats(obj, period):
+        if is_rollup:
+            item = source.raw(timestamp=item.bucket, **{field: getattr(item, f"{field}_last") for field in source.fields})
+        stats.append(item)
+    return stats[::-1]
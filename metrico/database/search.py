@@ -0,0 +1,100 @@
+"""
+Full-text search over the comments, the media captions and the account bios.
+
+SQLite: an external content FTS5 table per model, the triggers keep it in sync with every insert,
+update and delete (the Core bulk statements too). PostgreSQL: a GIN index over the tsvector
+of the columns, it is maintained by the database. Other dialects fall back to LIKE.
+"""
+from typing import Any
+
+from sqlalchemy import DDL, Boolean, and_, column, event, func, literal_column, or_, select, table
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+
+from . import models
+
+SEARCH_COLUMNS = {
+    models.Account: ("info_name", "info_bio"),
+    models.Media: ("info_title", "info_caption"),
+    models.MediaComment: ("text",),
+}
+
+
+def get_fts_name(model) -> str:
+    return f"{model.__tablename__}_fts"
+
+
+def get_sqlite_ddl(model) -> list[str]:
+    name, fts, columns = model.__tablename__, get_fts_name(model), SEARCH_COLUMNS[model]
+    names = ", ".join(columns)
+    new, old = ", ".join(f"new.{item}" for item in columns), ", ".join(f"old.{item}" for item in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{name}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {name} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {name} BEGIN {delete} END",
+        # only changes of the searched columns touch the index, not the stats updates
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {name} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def get_postgresql_document(model, prefix: str = "") -> str:
+    columns = " || ' ' || ".join(f"coalesce({prefix}{item}, '')" for item in SEARCH_COLUMNS[model])
+    return f"to_tsvector('simple'::regconfig, {columns})"
+
+
+def get_postgresql_ddl(model) -> list[str]:
+    name = model.__tablename__
+    return [f"CREATE INDEX IF NOT EXISTS ix_{name}_search ON {name} USING gin ({get_postgresql_document(model)})"]
+
+
+def is_search_table(name: str) -> bool:
+    """FTS5 tables and their shadow tables, they are not part of the metadata"""
+    return any(name.startswith(get_fts_name(model)) for model in SEARCH_COLUMNS)
+
+
+for _model in SEARCH_COLUMNS:
+    for _statement in get_sqlite_ddl(_model):
+        event.listen(_model.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    for _statement in get_postgresql_ddl(_model):
+        event.listen(_model.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+def get_fts_query(value: str) -> str:
+    """Every word as a quoted FTS5 string, so the user input has no query syntax and all words must match"""
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in value.split())
+
+
+class SearchMatch(ColumnElement[bool]):
+    """Condition: the search columns of the model contain all words, compiled for the dialect of the session"""
+
+    type = Boolean()
+    inherit_cache = False
+
+    def __init__(self, model, value: str):
+        self.model = model
+        self.value = value
+
+
+@compiles(SearchMatch)
+def compile_search_match(element: SearchMatch, compiler, **kw: Any) -> str:
+    columns = [getattr(element.model, item) for item in SEARCH_COLUMNS[element.model]]
+    conditions = [or_(*[item.contains(word, autoescape=True) for item in columns]) for word in element.value.split()]
+    return compiler.process(and_(*conditions), **kw)
+
+
+@compiles(SearchMatch, "sqlite")
+def compile_search_match_sqlite(element: SearchMatch, compiler, **kw: Any) -> str:
+    fts_name = get_fts_name(element.model)
+    fts = table(fts_name, column("rowid"), column(fts_name))
+    ids = select(fts.c.rowid).where(fts.c[fts_name].op("MATCH")(get_fts_query(element.value)))
+    return compiler.process(element.model.id.in_(ids), **kw)
+
+
+@compiles(SearchMatch, "postgresql")
+def compile_search_match_postgresql(element: SearchMatch, compiler, **kw: Any) -> str:
+    # the same expression as the index, otherwise the planner can not use it
+    document = literal_column(get_postgresql_document(element.model, prefix=f"{element.model.__tablename__}."))
+    return compiler.process(document.op("@@")(func.plainto_tsquery(literal_column("'simple'::regconfig"), element.value)), **kw)
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+from functools import partial
 from logging import getLogger
 from pathlib import Path
 
+from metrico import schemas
 from metrico.const import DEFAULT_FILENAME
 from metrico.database import MetricoDB
 from metrico.database.query import AccountQuery, BasicQuery, MediaQuery
 from metrico.hunting.action import update_account, update_media
 from metrico.hunting.hunters.basic import BasicHunter
+from metrico.hunting.pipeline import Pipeline, PipelineStats, fetch_accounts, fetch_medias, write_item
+from metrico.hunting.scheduler import UpdateScheduler
 from metrico.hunting.triggers import MetricoTrigger
 from metrico.utils.config import ConfigMixin, MetricoConfig
 from metrico.utils.generic import DynamicClassDict
+from metrico.utils.misc import chunked
 
 logger = getLogger(__name__)
 
@@ -35,17 +40,65 @@ class Hunter(ConfigMixin):
     def run_trigger(self, name: str, **kwargs):
         self.trigger[name].run(self, **kwargs)
 
-    def update_query(self, query: BasicQuery, **kwargs):
-        with self.db.Session() as session:
-            ids = [item.id for item in query.iter(session)]
+    def update_query(self, query: BasicQuery, chunk_size: int = 1000, batch_size: int = 50, **kwargs):
+        """
+        Update all objects of the query
+
+        :param chunk_size: number of ids read from the database at once
+        :param batch_size: number of objects fetched from the platform at once, see update_accounts and update_medias
+        """
+        for ids in self.db.iter_query_ids(query, chunk_size=chunk_size):
+            logger.debug("update %i objects of %s", len(ids), query)
+            match query:
+                case AccountQuery():
+                    for batch in chunked(ids, batch_size):
+                        self.update_accounts(batch, **kwargs)
+                case MediaQuery():
+                    for batch in chunked(ids, batch_size):
+                        self.update_medias(batch, **kwargs)
+
+    def update_pipeline(
+        self,
+        query: BasicQuery,
+        fetchers: int = 4,
+        batch_size: int = 50,
+        write_batch_size: int = 100,
+        max_latency: float = 1.0,
+        queue_size: int = 1000,
+        **kwargs,
+    ) -> PipelineStats:
+        """
+        Like update_query, but the fetcher threads only call the platforms and one writer stores the results.
+        See metrico.hunting.pipeline, SQLite needs a database file.
 
+        :param fetchers: number of fetcher threads
+        :param batch_size: number of objects fetched from the platform at once
+        :param write_batch_size: max items of a commit
+        :param max_latency: max seconds from the first item of a batch to the commit
+        :param queue_size: max fetched items waiting for the writer
+        :raises ValueError: for an in-memory SQLite database
+        """
+        if self.db.in_memory:
+            raise ValueError("The pipeline needs a database file, the threads of an in-memory SQLite database don't share it. Use update_query.")
         match query:
             case AccountQuery():
-                for index in ids:
-                    self.update_account(index, **kwargs)
+                fetch = partial(fetch_accounts, self.db, self.hunters, **kwargs)
             case MediaQuery():
-                for index in ids:
-                    self.update_media(index, **kwargs)
+                fetch = partial(fetch_medias, self.db, self.hunters, **kwargs)
+            case _:
+                raise ValueError(f"No pipeline for {query}")
+        tasks = (batch for ids in self.db.iter_query_ids(query) for batch in chunked(ids, batch_size))
+        pipeline = Pipeline(fetch, write_item, self.db.Session, fetchers, queue_size, write_batch_size, max_latency)
+        return pipeline.run(tasks)
+
+    def run_scheduler(self, rounds: int = 0, **kwargs):
+        """
+        Update the due accounts and medias by priority until KeyboardInterrupt, see metrico.hunting.scheduler
+
+        :param rounds: number of rounds, 0 = forever
+        :param kwargs: options of UpdateScheduler
+        """
+        UpdateScheduler(self, **kwargs).run(rounds)
 
     def update_account(self, account_id: int, media_count: int = -1, comment_count: int = -1, subscription_count: int = -1):
         with self.db.Session() as session:
@@ -55,6 +108,46 @@ class Hunter(ConfigMixin):
             )
             session.commit()
 
+    def update_accounts(self, account_ids: list[int], media_count: int = -1, comment_count: int = -1, subscription_count: int = -1):
+        """Like update_account for many accounts, the data of all accounts of a platform is fetched at once"""
+        with self.db.Session() as session:
+            accounts = self.db.get_accounts(account_ids, session=session)
+            datas: dict[str, dict[str, schemas.Account | None]] = {}
+            for platform in {account.platform for account in accounts}:
+                datas[platform] = self.hunters[platform].get_accounts_data([account.identifier for account in accounts if account.platform == platform])
+
+            for account in accounts:
+                if (data := datas[account.platform].get(account.identifier)) is None:
+                    logger.warning("account:%8i - no data -> exit", account.id)
+                    account.status = schemas.ModelStatus.FAIL
+                else:
+                    update_account(
+                        session,
+                        hunter=self.hunters,
+                        account=account,
+                        media_count=media_count,
+                        comment_count=comment_count,
+                        subscription_count=subscription_count,
+                        data=data,
+                    )
+                session.commit()
+
+    def update_medias(self, media_ids: list[int], comment_count: int = -1):
+        """Like update_media for many medias, the data of all medias of a platform is fetched at once"""
+        with self.db.Session() as session:
+            medias = self.db.get_medias(media_ids, session=session)
+            datas: dict[str, dict[str, schemas.Media | None]] = {}
+            for platform in {media.account.platform for media in medias}:
+                datas[platform] = self.hunters[platform].get_medias_data([media.identifier for media in medias if media.account.platform == platform])
+
+            for media in medias:
+                if (data := datas[media.account.platform].get(media.identifier)) is None:
+                    logger.warning("media:%8i - no data -> exit", media.id)
+                    media.status = schemas.ModelStatus.FAIL
+                else:
+                    update_media(session, self.hunters, media, comment_count, data)
+                session.commit()
+
     def update_media(self, media_id: int, comment_count: int = -1):
         with self.db.Session() as session:
             media = self.db.get_media(media_id, session=session)
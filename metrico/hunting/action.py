@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+from datetime import datetime, timedelta
 from logging import getLogger
 
 from sqlalchemy.orm import Session
@@ -9,6 +10,8 @@ from sqlalchemy.sql import func
 
 from metrico import schemas
 from metrico.database import crud, models
+from metrico.database.cache import get_account_cache
+from metrico.utils.misc import chunked
 
 if TYPE_CHECKING:
     from metrico.core import MetricoHunters
@@ -16,6 +19,42 @@ if TYPE_CHECKING:
 
 logger = getLogger(__name__)
 
+COMMENT_PAGE_SIZE = 100
+# the incremental comment update loads the comments since the high-water mark minus this overlap (clock skew)
+COMMENT_SYNC_OVERLAP = timedelta(hours=1)
+
+
+def get_media_mode(account: models.Account, data: schemas.Account, media_count: int) -> tuple[int, bool]:
+    """Resolve media_count=-2 of update_account to (media_count, incremental)"""
+    if media_count == -2 and data.stats and data.stats.medias != account.medias_count:
+        # the listing stops at the first stored media
+        return 0, True
+    return media_count, False
+
+
+def get_subscription_count(account: models.Account, data: schemas.Account, subscription_count: int) -> int:
+    """Resolve subscription_count=-2 of update_account"""
+    if subscription_count == -2 and data.stats and data.stats.subscriptions != account.subscriptions_count:
+        return 0
+    return subscription_count
+
+
+def get_comment_mode(media: models.Media | None, data: schemas.Media, comment_count: int) -> tuple[int, bool]:
+    """Resolve comment_count=-2 of update_media to (comment_count, incremental), media is None for a new media"""
+    if data.info and data.info.disable_comments:
+        return -1, False
+    if comment_count == -2 and data.stats and data.stats.comments != (media.comments_count if media else 0):
+        # with a high-water mark only the new comments, otherwise all
+        return 0, media is not None and media.comments_synced_at is not None
+    return comment_count, False
+
+
+def get_comment_since(media: models.Media | None, incremental: bool) -> datetime | None:
+    """Creation time of the oldest comment the incremental update loads"""
+    if incremental and media is not None and media.comments_synced_at is not None:
+        return media.comments_synced_at - COMMENT_SYNC_OVERLAP
+    return None
+
 
 def update_account(
     session: Session,
@@ -32,8 +71,8 @@ def update_account(
     :param session: just the database session
     :param account: the selected account
     :param hunter: a MetricoCore object
-    :param media_count: -2 -> skipp if nothing to to, -1 -> skipp account medias, 0 -> update alle medias, n -> only the last n medias
-    :param comment_count: -2 -> skipp if nothing to to, -1 -> skipp media comments, 0 -> update media comments, n -> only the last n comments
+    :param media_count: -2 -> skipp if nothing to to or only the new medias, -1 -> skipp account medias, 0 -> update alle medias, n -> only the last n medias
+    :param comment_count: -2 -> skipp if nothing to to or only the new comments, -1 -> skipp media comments, 0 -> update media comments, n -> only the last n comments
     :param subscription_count: -2 -> skipp if nothing to to, -1 -> skipp subscription, 0 -> update subscription, n -> only the last n subscription
     :param data: set the data for the account, if None load the data from the account platform
     """
@@ -47,19 +86,15 @@ def update_account(
         return
 
     logger.info("account:%8i - update start ", account.id)
-    crud.update_account(session, account, data.info, data.stats)
+    crud.update_account(session, account, data)
 
     if hunter is None:
         logger.warning("account:%08i - no Hunter to get media or subscriptions data -> exit")
         return
 
-    if media_count == -2 and data.stats and data.stats.medias != account.medias.count():  # type: ignore
-        media_count = data.stats.medias - account.medias.count() if data.stats.medias else 0  # type: ignore
-    update_account_medias(session, hunter, account, media_count, comment_count)
-
-    if subscription_count == -2 and data.stats and data.stats.subscriptions != account.subscriptions.count():  # type: ignore
-        subscription_count = 0
-    update_account_subscriptions(session, hunter, account, subscription_count)
+    media_count, incremental = get_media_mode(account, data, media_count)
+    update_account_medias(session, hunter, account, media_count, comment_count, incremental)
+    update_account_subscriptions(session, hunter, account, get_subscription_count(account, data, subscription_count))
     logger.info("account:%8i - update finished ", account.id)
 
 
@@ -69,16 +104,25 @@ def update_account_medias(
     account: models.Account,
     media_count: int = 0,
     comment_count: int = -1,
+    incremental: bool = False,
 ):
+    """
+    :param incremental: only the new medias, the listing (newest first) stops at the first stored media.
+        The stored medias are not updated, e.g. update them with MediaQuery(order_by=MediaOrder.UPDATED, order_asc=True)
+    """
     # account.medias_last_update = func.now()
     # session.commit()
 
     if media_count < 0:
         logger.debug("account:%8i - update medias skipped ", account.id)
         return
+    if account.stats_medias == 0:
+        logger.debug("account:%8i - no medias ", account.id)
+        return
 
-    logger.info("account:%8i - update medias finished ", account.id)
-    for item in hunter[account.platform].iter_account_media(account.identifier, amount=media_count):
+    logger.info("account:%8i - update medias start (incremental=%s)", account.id, incremental)
+    known = crud.get_media_identifiers(session, account) if incremental else None
+    for item in hunter[account.platform].iter_account_media(account.identifier, amount=media_count, media_list=account.media_list, known=known):
         media = crud.create_media(session, account, item)
         if media is None:
             logger.warning("account:%8i - no media ", account.id)
@@ -126,15 +170,18 @@ def update_media(
 
     logger.info("media:%8i - update start", media.id)
     crud.update_media(session, media, data.created, data.info, data.stats)
-    if data.info and data.info.disable_comments:
-        comment_count = -1
-    if comment_count == -2 and data.stats and data.stats.comments != media.comments.count():  # type: ignore
-        comment_count = 0
-    update_media_comments(session, media, hunter, comment_count)
+    comment_count, incremental = get_comment_mode(media, data, comment_count)
+    update_media_comments(session, media, hunter, comment_count, incremental)
     logger.info("media:%8i - update finished", media.id)
 
 
-def update_media_comments(session: Session, media: models.Media, hunter: MetricoHunters, comment_count: int = -1):
+def update_media_comments(session: Session, media: models.Media, hunter: MetricoHunters, comment_count: int = -1, incremental: bool = False):
+    """
+    :param comment_count: -1 -> skipp, 0 -> all comments, n -> only the last n comments
+    :param incremental: only the new comments. The comments are loaded newest first since the high-water mark,
+        the update stops at the first page with a stored comment. New replies of old comments are skipped,
+        the next full update loads them.
+    """
     media.comments_last_update = func.now()
     # session.commit()
 
@@ -142,7 +189,17 @@ def update_media_comments(session: Session, media: models.Media, hunter: Metrico
         logger.debug("media:%8i - update comments skipped ", media.id)
         return
 
-    logger.info("media:%8i - update comments start ", media.id)
-    for comment in hunter[media.account.platform].iter_media_comments(media.identifier, amount=comment_count):
-        crud.update_media(session, media, comment)
+    logger.info("media:%8i - update comments start (incremental=%s)", media.id, incremental)
+    started = datetime.utcnow()
+    since = get_comment_since(media, incremental)
+    comments = hunter[media.account.platform].iter_media_comments(media.identifier, amount=comment_count, since=since)
+    for page in chunked(comments, COMMENT_PAGE_SIZE):
+        added = crud.upsert_media_comments(session, media, page)
+        if incremental and added is not None and added < len({item.identifier for item in page}):
+            # newest first, so all older comments are stored
+            logger.debug("media:%8i - stop at a stored comment", media.id)
+            break
+    if comment_count == 0:
+        media.comments_synced_at = started
     logger.info("media:%8i - update comments finished ", media.id)
+    logger.debug("media:%8i - %s", media.id, get_account_cache(session))
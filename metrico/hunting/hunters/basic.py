@@ -1,10 +1,14 @@
 # pylint: disable=unused-argument
 # mypy: disable-error-code=empty-body
-from typing import Any, Iterator
+from typing import Any, Container, Iterator
 
+from datetime import datetime
 from logging import getLogger
 
 from metrico import schemas
+from metrico.hunting.response_cache import CachedSession, ResponseCache
+from metrico.utils.quota import QuotaLedger
+from metrico.utils.wrappers import KeyPool
 
 logger = getLogger(__name__)
 
@@ -13,6 +17,30 @@ class BasicHunter(schemas.BasicClassItem):
     def __init__(self, config: dict):
         super().__init__(config)
         self.logger = getLogger(f"{__name__}.{self.__class__.__name__}")
+        self.cache: ResponseCache | None = ResponseCache.from_config(self.config.get("cache"))
+
+    def _setup_api(self, api):
+        """Use the response cache for the requests of an api client with a requests session"""
+        if self.cache is not None and hasattr(api, "session"):
+            api.session = CachedSession(self.cache)
+        return api
+
+    def _create_multi_api(self, cls, kwargs: list[dict[str, Any]], costs: dict[str, int] | None = None) -> KeyPool:
+        """
+        One api object for many keys, the calls of the threads are spread over all keys. Configured with
+        quota = {path = "quota.db", daily_limit = 10000, costs = {search_by_keywords = 100}}, requests_per_second = 5
+        and key_concurrency = 2 (parallel calls per key)
+        """
+        quota = self.config.get("quota") or {}
+        return KeyPool(
+            cls=cls,
+            kwargs=kwargs,
+            concurrency=self.config.get("key_concurrency", 2),
+            setup=self._setup_api,
+            quota=QuotaLedger.from_config(quota),
+            rate=self.config.get("requests_per_second", 0),
+            costs={**(costs or {}), **quota.get("costs", {})},
+        )
 
     def analyze(self, value: Any, amount: int = 10, full: bool = False) -> Iterator[schemas.Account | schemas.Media]:
         ...
@@ -20,14 +48,33 @@ class BasicHunter(schemas.BasicClassItem):
     def get_account_data(self, identifier: str) -> schemas.Account | None:
         ...
 
+    def get_accounts_data(self, identifiers: list[str]) -> dict[str, schemas.Account | None]:
+        """Data of many accounts by identifier, platforms with a batch endpoint overwrite it"""
+        return {identifier: self.get_account_data(identifier) for identifier in identifiers}
+
     def get_media_data(self, identifier: str) -> schemas.Media | None:
         ...
 
-    def iter_account_media(self, identifier: str, amount: int = 0) -> Iterator[schemas.Media]:
-        ...
+    def get_medias_data(self, identifiers: list[str]) -> dict[str, schemas.Media | None]:
+        """Data of many medias by identifier, platforms with a batch endpoint overwrite it"""
+        return {identifier: self.get_media_data(identifier) for identifier in identifiers}
+
+    def iter_account_media(
+        self, identifier: str, amount: int = 0, media_list: str | None = None, known: Container[str] | None = None
+    ) -> Iterator[schemas.Media]:
+        """
+        The medias newest first
+
+        :param media_list: the stored schemas.Account.media_list, if known
+        :param known: identifiers of the stored medias, the listing stops at the first of them
+        """
 
     def iter_account_subscriptions(self, identifier: str, amount: int = 0) -> Iterator[schemas.Subscription]:
         ...
 
-    def iter_media_comments(self, identifier: str, amount: int = 0) -> Iterator[schemas.MediaComment]:
-        ...
+    def iter_media_comments(self, identifier: str, amount: int = 0, since: datetime | None = None) -> Iterator[schemas.MediaComment]:
+        """
+        The comments newest first, the replies follow their comment
+
+        :param since: stop at the first comment created before it, the replies of older comments are skipped
+        """
@@ -97,14 +97,18 @@ class TestHunter(BasicHunter):
             media.stats.views += int(1 + 5 * add * random.random())
         return media
 
-    def iter_account_media(self, identifier: str, amount=0):
-        for index in range(self.accounts[int(identifier)].stats.medias):
-            yield self.get_media_data(f"{identifier}:{index}")
+    def iter_account_media(self, identifier: str, amount=0, media_list=None, known=None):
+        # the new medias are appended, so the newest first is the reversed list
+        medias = [self.get_media_data(f"{identifier}:{index}") for index in range(self.accounts[int(identifier)].stats.medias)]
+        for media in reversed(medias):
+            if known is not None and media.identifier in known:
+                return
+            yield media
 
     # def iter_account_subscriptions(self, identifier: str, amount: int = 0) -> Iterator[schemas.Subscription]:´
     #     ...
 
-    def iter_media_comments(self, identifier: str, amount: int = 0) -> Iterator[schemas.MediaComment]:
+    def iter_media_comments(self, identifier: str, amount: int = 0, since: datetime | None = None) -> Iterator[schemas.MediaComment]:
         def get_comment_data(comment_index: int) -> schemas.MediaComment:
             if comment_index in range(len(self.comments[media_index])):
                 comment = self.comments[media_index][comment_index]
@@ -120,5 +124,6 @@ class TestHunter(BasicHunter):
             return comment
 
         account_index, media_index = map(int, identifier.split(":"))
-        for index in range(self.medias[account_index][int(media_index)].stats.comments):
-            yield get_comment_data(index)
+        # the new comments are appended, so the newest first is the reversed list
+        comments = [get_comment_data(index) for index in range(self.medias[account_index][int(media_index)].stats.comments)]
+        yield from reversed(comments)
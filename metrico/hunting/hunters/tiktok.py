@@ -1,6 +1,5 @@
 from pytiktok import KitApi
 
-from metrico.hunting import MultiObjCaller
 from metrico.hunting.hunters.basic import BasicHunter
 
 
@@ -11,12 +10,12 @@ class TikTokHunter(BasicHunter):
 
     def _create_api(self):
         if key := self.config.get("key"):
-            return KitApi(access_token=key)
+            return self._setup_api(KitApi(access_token=key))
         return None
 
 
 class TikTokHunterMulti(TikTokHunter):
     def _create_api(self):
         if keys := self.config.get("keys"):
-            return MultiObjCaller(cls=KitApi, kwargs=[{"access_token": key} for key in keys])
+            return self._create_multi_api(KitApi, [{"access_token": key} for key in keys])
         raise Exception("Fail to create api!")
@@ -40,11 +40,13 @@ class TwitterHunter(BasicHunter):
             "subscriptions": result.data.public_metrics.following_count,
         }
 
-    def iter_account_media(self, identifier: str, amount: int = 0):
+    def iter_account_media(self, identifier: str, amount: int = 0, media_list: str | None = None, known=None):  # pylint: disable=unused-argument
         result = self.api.get_timelines(user_id=identifier, tweet_fields=["created_at", "public_metrics"], max_results=amount)
         for item in result.data:
             if not isinstance(item, TweetModel):
                 continue
+            if known is not None and item.id in known:
+                return
             yield {
                 "identifier": item.id,
                 "media_type": MediaType.TEXT,
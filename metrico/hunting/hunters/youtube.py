@@ -1,4 +1,4 @@
-from typing import Any, Iterator
+from typing import Any, Container, Iterator
 
 from datetime import datetime
 from urllib import parse as url_parse
@@ -7,7 +7,17 @@ from pyyoutube import Api
 
 from metrico import schemas
 from metrico.hunting.hunters.basic import BasicHunter
-from metrico.utils.wrappers import MultiObjCaller
+from metrico.utils.misc import chunked
+from metrico.utils.wrappers import iter_pages
+
+# max ids of one list request (videos.list, channels.list)
+MAX_IDS = 50
+# max results of one search.list or subscriptions.list request
+MAX_RESULTS = 50
+# max comment threads of one commentThreads.list (or comments.list) request
+MAX_COMMENTS = 100
+# quota cost of the api methods, all others cost 1 unit
+QUOTA_COSTS = {"search_by_keywords": 100}
 
 
 class YoutubeHunter(BasicHunter):
@@ -17,12 +27,13 @@ class YoutubeHunter(BasicHunter):
 
     def _create_api(self):
         if key := self.config.get("key"):
-            return Api(api_key=key)
+            return self._setup_api(Api(api_key=key))
         return None
 
     def _find_accounts(self, name: str, amount: int = 10, full: bool = False) -> Iterator[schemas.Account]:
-        result = self.api.search_by_keywords(q=name, search_type=["channel"], count=amount)
-        for item in result.items:
+        # every page costs 100 units, without an amount only the first page
+        pages = iter_pages(self.api.search_by_keywords, MAX_RESULTS, amount or MAX_RESULTS, q=name, search_type=["channel"])
+        for item in [item for page in pages for item in page.items or []]:
             if full:
                 if account := self.get_account_data(item.id.channelId):
                     yield account
@@ -49,35 +60,58 @@ class YoutubeHunter(BasicHunter):
                 yield from self._find_accounts(value, amount, full)
 
     def get_account_data(self, identifier: str) -> schemas.Account | None:
-        channel_by_id = self.api.get_channel_info(channel_id=identifier)
-        if channel_by_id is None or channel_by_id.items is None or len(channel_by_id.items) == 0:
-            return None
+        return self.get_accounts_data([identifier])[identifier]
+
+    def get_accounts_data(self, identifiers: list[str]) -> dict[str, schemas.Account | None]:
+        """One channels.list request (and one quota unit) for up to 50 channels"""
+        accounts: dict[str, schemas.Account | None] = dict.fromkeys(identifiers)
+        for chunk in chunked(accounts, MAX_IDS):
+            channels = self.api.get_channel_info(channel_id=chunk)
+            if channels is None or not channels.items:
+                continue
+            for channel in channels.items:
+                if channel.id in accounts:
+                    accounts[channel.id] = self._get_account_data(channel)
+        return accounts
 
+    def _get_account_data(self, channel) -> schemas.Account:
         subscriptions = None
         if self.config.get("load_subscription", False):
-            iter_subscriptions = self.iter_account_subscriptions(identifier, amount=0)
+            iter_subscriptions = self.iter_account_subscriptions(channel.id, amount=0)
             subscriptions = len(list(iter_subscriptions)) if iter_subscriptions is not None else None
 
         return schemas.Account(
-            identifier=identifier,
-            created=schemas.Created(datetime.fromisoformat(channel_by_id.items[0].snippet.publishedAt[:19])),
-            info=schemas.AccountInfo(name=channel_by_id.items[0].snippet.title, bio=channel_by_id.items[0].snippet.description.strip()),
+            identifier=channel.id,
+            media_list=channel.contentDetails.relatedPlaylists.uploads if channel.contentDetails and channel.contentDetails.relatedPlaylists else None,
+            created=schemas.Created(datetime.fromisoformat(channel.snippet.publishedAt[:19])),
+            info=schemas.AccountInfo(name=channel.snippet.title, bio=channel.snippet.description.strip()),
             stats=schemas.AccountStats(
-                medias=int(channel_by_id.items[0].statistics.videoCount or 0),
-                views=int(channel_by_id.items[0].statistics.viewCount or 0),
-                followers=int(channel_by_id.items[0].statistics.subscriberCount or 0),
+                medias=int(channel.statistics.videoCount or 0),
+                views=int(channel.statistics.viewCount or 0),
+                followers=int(channel.statistics.subscriberCount or 0),
                 subscriptions=subscriptions,
             ),
         )
 
     def get_media_data(self, identifier: str) -> schemas.Media | None:
-        videos = self.api.get_video_by_id(video_id=identifier)
-        if videos is None or not videos.items:
-            return None
+        return self.get_medias_data([identifier])[identifier]
+
+    def get_medias_data(self, identifiers: list[str]) -> dict[str, schemas.Media | None]:
+        """One videos.list request (and one quota unit) for up to 50 videos"""
+        medias: dict[str, schemas.Media | None] = dict.fromkeys(identifiers)
+        for chunk in chunked(medias, MAX_IDS):
+            videos = self.api.get_video_by_id(video_id=chunk)
+            if videos is None or not videos.items:
+                continue
+            for video in videos.items:
+                if video.id in medias:
+                    medias[video.id] = self._get_media_data(video)
+        return medias
 
-        video = videos.items[0]
+    @staticmethod
+    def _get_media_data(video) -> schemas.Media:
         return schemas.Media(
-            identifier=identifier,
+            identifier=video.id,
             media_type=schemas.MediaType.VIDEO,
             account=schemas.Account(identifier=video.snippet.channelId),
             created=schemas.Created(datetime.strptime(video.snippet.publishedAt, "%Y-%m-%dT%H:%M:%SZ")),
@@ -91,27 +125,45 @@ class YoutubeHunter(BasicHunter):
             ),
         )
 
-    def iter_account_media(self, identifier: str, amount=0):
-        channel_by_id = self.api.get_channel_info(channel_id=identifier)
-        if int(channel_by_id.items[0].statistics.videoCount) == 0:
-            return
-
-        playlist_id = channel_by_id.items[0].contentDetails.relatedPlaylists.uploads
+    def iter_account_media(self, identifier: str, amount=0, media_list: str | None = None, known: Container[str] | None = None):
+        playlist_id = media_list
         if playlist_id is None:
-            return
+            channel_by_id = self.api.get_channel_info(channel_id=identifier)
+            if int(channel_by_id.items[0].statistics.videoCount) == 0:
+                return
 
-        playlist = self.api.get_playlist_items(playlist_id=playlist_id, count=amount or None)
-        for item in playlist.items:
-            yield self.get_media_data(item.contentDetails.videoId)
+            playlist_id = channel_by_id.items[0].contentDetails.relatedPlaylists.uploads
+            if playlist_id is None:
+                return
+
+        # the uploads are newest first, one page per request, so the listing can stop at the first known video
+        page_token, count = None, 0
+        while True:
+            limit = min(MAX_IDS, amount - count) if amount else MAX_IDS
+            playlist = self.api.get_playlist_items(playlist_id=playlist_id, count=limit, limit=limit, page_token=page_token)
+            video_ids = [item.contentDetails.videoId for item in playlist.items]
+            stop = False
+            if known is not None and (index := next((index for index, video_id in enumerate(video_ids) if video_id in known), None)) is not None:
+                video_ids, stop = video_ids[:index], True
+
+            for video_id, media in self.get_medias_data(video_ids).items():
+                if media is None:
+                    self.logger.warning("no data for media %s of account %s", video_id, identifier)
+                    continue
+                yield media
+
+            count += len(playlist.items)
+            page_token = playlist.nextPageToken
+            if stop or not page_token or not playlist.items or (amount and count >= amount):
+                return
 
     def iter_account_subscriptions(self, identifier: str, amount: int = 0) -> Iterator[schemas.Subscription]:
         try:
-            subscription_by_channel = self.api.get_subscription_by_channel(channel_id=identifier, count=amount or None)
-            if subscription_by_channel.items is None:
-                return
+            pages = iter_pages(self.api.get_subscription_by_channel, MAX_RESULTS, amount, channel_id=identifier)
+            subscriptions = [item for page in pages for item in page.items or []]
         except:
             return
-        for subscription in subscription_by_channel.items:
+        for subscription in subscriptions:
             if subscription.snippet is None:
                 continue
             yield schemas.Subscription(
@@ -122,7 +174,7 @@ class YoutubeHunter(BasicHunter):
                 )
             )
 
-    def iter_media_comments(self, identifier: str, amount: int = 0) -> Iterator[schemas.MediaComment]:
+    def iter_media_comments(self, identifier: str, amount: int = 0, since: datetime | None = None) -> Iterator[schemas.MediaComment]:
         def get_comment_data(comment) -> schemas.MediaComment:
             account = None
             if comment.snippet.authorChannelId is not None:
@@ -139,26 +191,38 @@ class YoutubeHunter(BasicHunter):
                 ),
             )
 
-        try:
-            comments = self.api.get_comment_threads(video_id=identifier, count=amount or None)
-        except:
-            return
+        # one page per request, so the caller can stop before the next page is loaded
+        page_token, count = None, 0
+        while True:
+            limit = min(MAX_COMMENTS, amount - count) if amount else MAX_COMMENTS
+            try:
+                comments = self.api.get_comment_threads(video_id=identifier, order="time", count=limit, limit=limit, page_token=page_token)
+            except:
+                return
 
-        for thread in comments.items:
-            yield get_comment_data(thread.snippet.topLevelComment)
-            if thread.replies:
-                total_reply_count = int(thread.snippet.totalReplyCount)
-                if total_reply_count > len(thread.replies.comments):
-                    thread_comment = self.api.get_comments(parent_id=thread.id, count=None)
-                    for item in thread_comment.items:
-                        yield get_comment_data(item)
-                else:
-                    for item in thread.replies.comments:
-                        yield get_comment_data(item)
+            for thread in comments.items:
+                comment = get_comment_data(thread.snippet.topLevelComment)
+                if since is not None and comment.content.created_at < since:
+                    return
+                yield comment
+                if thread.replies:
+                    total_reply_count = int(thread.snippet.totalReplyCount)
+                    if total_reply_count > len(thread.replies.comments):
+                        for page in iter_pages(self.api.get_comments, MAX_COMMENTS, parent_id=thread.id):
+                            for item in page.items or []:
+                                yield get_comment_data(item)
+                    else:
+                        for item in thread.replies.comments:
+                            yield get_comment_data(item)
+
+            count += len(comments.items)
+            page_token = comments.nextPageToken
+            if not page_token or not comments.items or (amount and count >= amount):
+                return
 
 
 class YoutubeHunterMulti(YoutubeHunter):
     def _create_api(self):
         if keys := self.config.get("keys"):
-            return MultiObjCaller(cls=Api, kwargs=[{"api_key": key} for key in keys])
+            return self._create_multi_api(Api, [{"api_key": key} for key in keys], costs=QUOTA_COSTS)
         raise Exception("Fail to create api!")
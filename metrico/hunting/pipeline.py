@@ -0,0 +1,360 @@
+"""
+Producer/consumer pipeline for the hunting updates.
+
+Fetcher threads call the platform APIs and put the results into a bounded queue, a full queue blocks
+them (backpressure). One writer thread stores the items with a single session and commits in batches,
+after batch_size items or max_latency seconds. Only the writer writes, so SQLite never waits for its
+write lock. The fetchers only read, they need a database file, every thread has its own in-memory database
+(Hunter.update_pipeline rejects an in-memory SQLite database).
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Generic, Iterable, Iterator, TypeVar
+
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import getLogger
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from metrico import schemas
+from metrico.database import crud, models
+from metrico.hunting.action import COMMENT_PAGE_SIZE, get_comment_mode, get_comment_since, get_media_mode, get_subscription_count
+from metrico.utils.misc import chunked
+
+if TYPE_CHECKING:
+    from metrico.database import MetricoDB
+    from metrico.hunting import MetricoHunters
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# ends a worker
+STOP = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    errors: int = 0
+    # seconds of work and of waiting for the other stage (a full or an empty queue), summed over the threads
+    busy: float = 0.0
+    blocked: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """Items per second"""
+        return self.items / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.name}: {self.items} items, {self.rate:.1f} items/s, busy {self.busy:.1f}s, blocked {self.blocked:.1f}s, errors {self.errors}"
+
+
+@dataclass
+class PipelineStats:
+    fetch: StageStats = field(default_factory=lambda: StageStats("fetch"))
+    write: StageStats = field(default_factory=lambda: StageStats("write"))
+    commits: int = 0
+    max_queue: int = 0
+    interrupted: bool = False
+
+
+@dataclass
+class AccountItem:
+    account_id: int
+    data: schemas.Account | None
+    # None -> the subscriptions were skipped
+    subscriptions: list[schemas.Subscription] | None = None
+
+
+@dataclass
+class MediaItem:
+    account_id: int
+    data: schemas.Media | None
+    # None for a new media of the account listing
+    media_id: int | None = None
+
+
+@dataclass
+class CommentItem:
+    """A page of comments, the last page of a complete update has the high-water mark"""
+
+    account_id: int
+    media: schemas.Media
+    comments: list[schemas.MediaComment]
+    synced_at: datetime | None = None
+
+
+class Pipeline(Generic[T, R]):
+    def __init__(
+        self,
+        fetch: Callable[[T], Iterable[R]],
+        write: Callable[[Session, R], Any],
+        session_factory: Callable[[], Session],
+        fetchers: int = 4,
+        queue_size: int = 1000,
+        batch_size: int = 100,
+        max_latency: float = 1.0,
+    ):
+        """
+        :param fetch: called by the fetcher threads with every task, the items are written in this order
+        :param write: called by the writer with its session and every item
+        :param fetchers: number of fetcher threads
+        :param queue_size: max items between the stages
+        :param batch_size: max items of a commit
+        :param max_latency: max seconds from the first item of a batch to the commit
+        """
+        self.fetch, self.write, self.session_factory = fetch, write, session_factory
+        self.fetchers, self.queue_size, self.batch_size, self.max_latency = max(fetchers, 1), queue_size, max(batch_size, 1), max_latency
+        self.lock = Lock()
+
+    def run(self, tasks: Iterable[T]) -> PipelineStats:
+        """
+        Fetch and write all tasks. Ctrl-C stops the fetchers after their current item,
+        the fetched items are still written.
+        """
+        stats = PipelineStats()
+        stop = Event()
+        task_queue: Queue = Queue(maxsize=self.fetchers * 2)
+        item_queue: Queue = Queue(maxsize=self.queue_size)
+        fetchers = [Thread(target=self._fetch_worker, args=(task_queue, item_queue, stop, stats), daemon=True) for _ in range(self.fetchers)]
+        writer = Thread(target=self._write_worker, args=(item_queue, stats), daemon=True)
+        for thread in [*fetchers, writer]:
+            thread.start()
+
+        try:
+            for task in tasks:
+                task_queue.put(task)
+            for _ in fetchers:
+                task_queue.put(STOP)
+            self._join(fetchers)
+        except KeyboardInterrupt:
+            logger.warning("interrupted, write the fetched items")
+            stats.interrupted = True
+            stop.set()
+            self._clear(task_queue)
+            self._join(fetchers)
+        finally:
+            stats.fetch.finished = time.monotonic()
+            item_queue.put(STOP)
+            self._join([writer])
+            stats.write.finished = time.monotonic()
+
+        logger.info("%s", stats.fetch)
+        logger.info("%s, %i commits, max queue %i", stats.write, stats.commits, stats.max_queue)
+        return stats
+
+    @staticmethod
+    def _join(threads: list[Thread]):
+        # join with a timeout, so Ctrl-C reaches the main thread
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.1)
+
+    def _clear(self, task_queue: Queue):
+        """Drop the open tasks, a stop signal for every fetcher ends the waiting ones"""
+        while True:
+            try:
+                task_queue.get_nowait()
+            except Empty:
+                break
+        for _ in range(self.fetchers):
+            task_queue.put_nowait(STOP)
+
+    def _fetch_worker(self, task_queue: Queue, item_queue: Queue, stop: Event, stats: PipelineStats):
+        while not stop.is_set():
+            if (task := task_queue.get()) is STOP:
+                return
+            start = time.monotonic()
+            try:
+                for item in self.fetch(task):
+                    fetched = time.monotonic()
+                    item_queue.put(item)
+                    written = time.monotonic()
+                    with self.lock:
+                        stats.fetch.items += 1
+                        stats.fetch.busy += fetched - start
+                        stats.fetch.blocked += written - fetched
+                        stats.max_queue = max(stats.max_queue, item_queue.qsize())
+                    if stop.is_set():
+                        return
+                    start = written
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("fail to fetch %s", task)
+                with self.lock:
+                    stats.fetch.errors += 1
+
+    def _write_worker(self, item_queue: Queue, stats: PipelineStats):
+        with self.session_factory() as session:
+            batch: list[R] = []
+            first = 0.0
+            while True:
+                timeout = max(0.0, first + self.max_latency - time.monotonic()) if batch else None
+                start = time.monotonic()
+                try:
+                    item = item_queue.get(timeout=timeout)
+                except Empty:
+                    item = None
+                stats.write.blocked += time.monotonic() - start
+
+                if item is not None and item is not STOP:
+                    if not batch:
+                        first = time.monotonic()
+                    batch.append(item)
+                if batch and (item is None or item is STOP or len(batch) >= self.batch_size):
+                    self._write_batch(session, batch, stats)
+                    batch = []
+                if item is STOP:
+                    return
+
+    def _write_batch(self, session: Session, batch: list[R], stats: PipelineStats):
+        start = time.monotonic()
+        try:
+            for item in batch:
+                self.write(session, item)
+            session.commit()
+            stats.commits += 1
+            stats.write.items += len(batch)
+        except Exception:  # pylint: disable=broad-except
+            # find the broken items, every item in its own transaction
+            logger.exception("fail to write a batch of %i items, retry one by one", len(batch))
+            session.rollback()
+            for item in batch:
+                try:
+                    self.write(session, item)
+                    session.commit()
+                    stats.commits += 1
+                    stats.write.items += 1
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("fail to write %s", item)
+                    session.rollback()
+                    stats.write.errors += 1
+        stats.write.busy += time.monotonic() - start
+
+
+def get_stored_media(session: Session, account_id: int, identifier: str) -> models.Media | None:
+    return session.scalars(select(models.Media).where(models.Media.account_id == account_id, models.Media.identifier == identifier)).first()
+
+
+def fetch_media_comments(
+    session: Session, hunters: MetricoHunters, platform: str, account_id: int, media: models.Media | None, data: schemas.Media, comment_count: int
+) -> Iterator[CommentItem]:
+    """The comment pages of a media like update_media, media is None for a new media"""
+    comment_count, incremental = get_comment_mode(media, data, comment_count)
+    if comment_count < 0:
+        return
+
+    started = datetime.utcnow()
+    comments = hunters[platform].iter_media_comments(data.identifier, amount=comment_count, since=get_comment_since(media, incremental))
+    for page in chunked(comments, COMMENT_PAGE_SIZE):
+        yield CommentItem(account_id, data, page)
+        if incremental and media is not None:
+            stored = select(models.MediaComment.id).where(
+                models.MediaComment.media_id == media.id, models.MediaComment.identifier.in_([item.identifier for item in page])
+            )
+            if session.scalars(stored.limit(1)).first() is not None:
+                # newest first, so all older comments are stored
+                return
+    if comment_count == 0:
+        yield CommentItem(account_id, data, [], synced_at=started)
+
+
+def fetch_accounts(
+    db: MetricoDB,
+    hunters: MetricoHunters,
+    account_ids: list[int],
+    media_count: int = -1,
+    comment_count: int = -1,
+    subscription_count: int = -1,
+) -> Iterator[AccountItem | MediaItem | CommentItem]:
+    """The items of update_account for a batch of accounts, the data of all accounts of a platform is fetched at once"""
+    with db.Session() as session:
+        accounts = crud.get_accounts(session, account_ids)
+        datas: dict[str, dict[str, schemas.Account | None]] = {}
+        for platform in {account.platform for account in accounts}:
+            datas[platform] = hunters[platform].get_accounts_data([account.identifier for account in accounts if account.platform == platform])
+
+        for account in accounts:
+            if (data := datas[account.platform].get(account.identifier)) is None:
+                yield AccountItem(account.id, None)
+                continue
+
+            subscriptions = None
+            if (count := get_subscription_count(account, data, subscription_count)) >= 0:
+                subscriptions = list(hunters[account.platform].iter_account_subscriptions(account.identifier, amount=count))
+            yield AccountItem(account.id, data, subscriptions)
+
+            count, incremental = get_media_mode(account, data, media_count)
+            if count < 0 or (data.stats and data.stats.medias == 0):
+                continue
+            known = crud.get_media_identifiers(session, account) if incremental else None
+            medias = hunters[account.platform].iter_account_media(account.identifier, amount=count, media_list=data.media_list or account.media_list, known=known)
+            for item in medias:
+                yield MediaItem(account.id, item)
+                media = get_stored_media(session, account.id, item.identifier) if comment_count != -1 else None
+                yield from fetch_media_comments(session, hunters, account.platform, account.id, media, item, comment_count)
+
+
+def fetch_medias(db: MetricoDB, hunters: MetricoHunters, media_ids: list[int], comment_count: int = -1) -> Iterator[MediaItem | CommentItem]:
+    """The items of update_media for a batch of medias, the data of all medias of a platform is fetched at once"""
+    with db.Session() as session:
+        medias = crud.get_medias(session, media_ids)
+        datas: dict[str, dict[str, schemas.Media | None]] = {}
+        for platform in {media.account.platform for media in medias}:
+            datas[platform] = hunters[platform].get_medias_data([media.identifier for media in medias if media.account.platform == platform])
+
+        for media in medias:
+            data = datas[media.account.platform].get(media.identifier)
+            yield MediaItem(media.account_id, data, media.id)
+            if data is not None:
+                yield from fetch_media_comments(session, hunters, media.account.platform, media.account_id, media, data, comment_count)
+
+
+def write_item(session: Session, item: AccountItem | MediaItem | CommentItem):
+    """Store an item of the fetchers, the writes of update_account and update_media"""
+    match item:
+        case AccountItem():
+            account = session.get(models.Account, item.account_id)
+            if item.data is None:
+                logger.warning("account:%8i - no data", account.id)
+                account.status = schemas.ModelStatus.FAIL
+                return
+            crud.update_account(session, account, item.data)
+            if item.subscriptions is not None:
+                account.subscriptions_last_update = func.now()
+                crud.update_account(session, account, *item.subscriptions)
+
+        case MediaItem(media_id=None):
+            if item.data is not None:
+                media = crud.create_media(session, session.get(models.Account, item.account_id), item.data)
+                media.comments_last_update = func.now()
+
+        case MediaItem():
+            media = session.get(models.Media, item.media_id)
+            if item.data is None:
+                logger.warning("media:%8i - no data", media.id)
+                media.status = schemas.ModelStatus.FAIL
+                return
+            crud.update_media(session, media, item.data.created, item.data.info, item.data.stats)
+            media.comments_last_update = func.now()
+
+        case CommentItem():
+            media = crud.create_media(session, session.get(models.Account, item.account_id), item.media, update=False)
+            if item.comments:
+                crud.upsert_media_comments(session, media, item.comments)
+            if item.synced_at is not None:
+                media.comments_synced_at = item.synced_at
@@ -0,0 +1,191 @@
+"""
+Response cache for the platform APIs, it replaces the requests session of the api clients.
+
+GET responses are stored in a SQLite file with a TTL per endpoint (the last part of the url path, e.g. "videos").
+Expired responses with an ETag are revalidated with If-None-Match, the 304 answer has no body.
+The size of all bodies is bounded, the least recently used responses are evicted.
+
+The quota of a call is booked before the request (see metrico.utils.wrappers.MultiObjCaller), so the
+QuotaLedger also counts the calls answered from this cache. With a daily_limit the ledger is an upper
+bound of the real usage, and a key is switched a bit early.
+"""
+from typing import Any, Callable
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from threading import Lock
+from urllib import parse as url_parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Part of the requests without a full download, revalidated responses count as hits"""
+        total = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / total if total else 0.0
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: dict[str, str]
+    content: bytes
+    etag: str | None
+    stored: float
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = ":memory:",
+        ttl: int = 3600,
+        ttls: dict[str, int] | None = None,
+        max_size: int = 100 * 2**20,
+        ignore_params: tuple[str, ...] = ("key", "access_token"),
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param path: SQLite file of the cache
+        :param ttl: seconds until a response is revalidated, 0 = don't cache
+        :param ttls: ttl by endpoint, e.g. {"commentThreads": 600}
+        :param max_size: max size of all stored bodies in bytes
+        :param ignore_params: url parameters which are not part of the cache key, the credentials
+        """
+        self.ttl, self.ttls, self.max_size, self.ignore_params, self.clock = ttl, ttls or {}, max_size, ignore_params, clock
+        self.stats = ResponseCacheStats()
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS response "
+                "(key TEXT PRIMARY KEY, status_code INTEGER, headers TEXT, content BLOB, etag TEXT, size INTEGER, stored REAL, accessed REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_response_accessed ON response (accessed)")
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any] | None):
+        """The cache of the hunter config, e.g. cache = {path = "cache.db", ttl = 3600}"""
+        if not config:
+            return None
+        return cls(**config)
+
+    def get_endpoint(self, url: str) -> str:
+        return url_parse.urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+    def get_ttl(self, url: str) -> int:
+        return self.ttls.get(self.get_endpoint(url), self.ttl)
+
+    def get_key(self, url: str) -> str:
+        parts = url_parse.urlsplit(url)
+        query = sorted((name, value) for name, value in url_parse.parse_qsl(parts.query) if name not in self.ignore_params)
+        return hashlib.sha256(f"{parts.netloc}{parts.path}?{url_parse.urlencode(query)}".encode()).hexdigest()
+
+    def is_fresh(self, url: str, response: CachedResponse) -> bool:
+        return self.clock() - response.stored < self.get_ttl(url)
+
+    def get(self, url: str) -> CachedResponse | None:
+        with self.lock:
+            row = self.connection.execute("SELECT status_code, headers, content, etag, stored FROM response WHERE key = ?", (self.get_key(url),)).fetchone()
+        if row is None:
+            return None
+        status_code, headers, content, etag, stored = row
+        return CachedResponse(status_code, json.loads(headers), content, etag, stored)
+
+    def count(self, name: str):
+        """Add one to a stats counter, the cache is shared by the threads of all api objects"""
+        with self.lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+    def set(self, url: str, response: requests.Response):
+        headers = json.dumps(dict(response.headers))
+        now = self.clock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.get_key(url), response.status_code, headers, response.content, response.headers.get("ETag"), len(response.content), now, now),
+            )
+            self._evict()
+
+    def touch(self, url: str, revalidated: bool = False):
+        """Mark as recently used, a revalidated response is fresh again"""
+        now = self.clock()
+        with self.lock, self.connection:
+            if revalidated:
+                self.connection.execute("UPDATE response SET accessed = ?, stored = ? WHERE key = ?", (now, now, self.get_key(url)))
+            else:
+                self.connection.execute("UPDATE response SET accessed = ? WHERE key = ?", (now, self.get_key(url)))
+
+    def _evict(self):
+        size = self.connection.execute("SELECT coalesce(sum(size), 0) FROM response").fetchone()[0]
+        for key, item_size in self.connection.execute("SELECT key, size FROM response ORDER BY accessed").fetchall():
+            if size <= self.max_size:
+                break
+            self.connection.execute("DELETE FROM response WHERE key = ?", (key,))
+            size -= item_size
+            self.stats.evictions += 1
+
+    def size(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT coalesce(sum(size), 0) FROM response").fetchone()[0]
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM response")
+
+
+class CachedSession(requests.Session):
+    """Drop-in for the requests session of an api client, only GET requests are cached"""
+
+    def __init__(self, cache: ResponseCache):
+        super().__init__()
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        url = request.url or ""
+        if request.method != "GET" or self.cache.get_ttl(url) <= 0:
+            return super().send(request, **kwargs)
+
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.is_fresh(url, cached):
+            self.cache.touch(url)
+            self.cache.count("hits")
+            return self._build_response(request, cached)
+        if cached is not None and cached.etag:
+            request.headers["If-None-Match"] = cached.etag
+
+        response = super().send(request, **kwargs)
+        if cached is not None and response.status_code == 304:
+            self.cache.touch(url, revalidated=True)
+            self.cache.count("revalidated")
+            return self._build_response(request, cached)
+
+        self.cache.count("misses")
+        if response.status_code == 200:
+            self.cache.set(url, response)
+        return response
+
+    @staticmethod
+    def _build_response(request: requests.PreparedRequest, cached: CachedResponse) -> requests.Response:
+        response = requests.Response()
+        response.status_code = cached.status_code
+        response.headers = CaseInsensitiveDict(cached.headers)
+        response._content = cached.content  # pylint: disable=protected-access
+        response.url = request.url or ""
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
@@ -0,0 +1,186 @@
+"""
+Priority-based update scheduler, a long-running replacement of the static trigger lists.
+
+Every round reads the stalest due accounts and medias (not updated for min_age seconds), at most
+candidates of each kind from the stats_last_update index, and updates the round_size objects with the
+highest priority:
+
+    priority = weight * staleness in hours * (1 + growth_factor * growth)
+
+The growth is the relative growth of the views per day at the last stats update (stats_growth), so hot
+content is refreshed often and dormant content rarely. A hot object outside of the candidates waits
+until it is among the stalest ones. The updates run with max concurrency parallel calls and max rate
+updates per second. An exceeded quota of all api keys pauses the scheduler.
+A failed update does not change stats_last_update, so the object is skipped for a backoff, which doubles
+with every failure in a row. Otherwise a few broken objects would take every round.
+
+The growth is set by every stats update, ORM (crud.update_account/update_media) and bulk (MetricoDB.ingest).
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator
+
+import heapq
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from logging import getLogger
+from threading import Lock
+
+from sqlalchemy import select
+
+from metrico import schemas
+from metrico.database import models
+from metrico.utils.misc import RunSummary, run_all
+from metrico.utils.quota import QuotaExceeded, TokenBucket
+
+if TYPE_CHECKING:
+    from metrico.hunting import Hunter
+
+logger = getLogger(__name__)
+
+MODELS: dict[str, type[models.Account] | type[models.Media]] = {"account": models.Account, "media": models.Media}
+
+
+@dataclass(frozen=True)
+class ScheduleItem:
+    kind: str
+    id: int
+    priority: float
+
+
+def get_priority(last_update: datetime, growth: float | None, now: datetime, weight: float = 1.0, growth_factor: float = 10.0) -> float:
+    """Staleness in hours, scaled by the growth, a shrinking object counts like a dormant one"""
+    hours = max((now - last_update).total_seconds() / 3600, 0.0)
+    return weight * hours * (1 + growth_factor * max(growth or 0.0, 0.0))
+
+
+class UpdateScheduler:
+    def __init__(
+        self,
+        hunter: Hunter,
+        concurrency: int = 4,
+        rate: float = 0,
+        round_size: int = 100,
+        candidates: int = 0,
+        interval: float = 300,
+        min_age: float = 3600,
+        weights: dict[str, float] | None = None,
+        growth_factor: float = 10.0,
+        account_kwargs: dict[str, Any] | None = None,
+        media_kwargs: dict[str, Any] | None = None,
+        pause: float = 3600,
+        backoff: float = 3600,
+        max_backoff: float = 7 * 86400,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Any] = time.sleep,
+    ):
+        """
+        :param concurrency: max parallel updates, SQLite needs a database file for more than one
+        :param rate: max updates per second, 0 = no limit
+        :param round_size: max updates of one round
+        :param candidates: max stalest objects of each kind with a computed priority, 0 = 10 * round_size
+        :param interval: max seconds of a round, afterwards no update is started; the wait for due objects
+        :param min_age: seconds since the last update until an object is due
+        :param weights: weight by kind ("account", "media"), a weight of 0 disables the kind
+        :param growth_factor: scale of the growth in the priority
+        :param account_kwargs: arguments of Hunter.update_account, e.g. {"media_count": 0}
+        :param media_kwargs: arguments of Hunter.update_media, e.g. {"comment_count": 0}
+        :param pause: seconds without updates after an exceeded quota
+        :param backoff: seconds an object is skipped after a failed update, doubled for every failure in a row
+        :param max_backoff: max seconds an object is skipped
+        """
+        self.hunter, self.concurrency, self.rate, self.round_size, self.interval = hunter, concurrency, rate, round_size, interval
+        self.min_age, self.growth_factor, self.pause, self.clock, self.sleep = min_age, growth_factor, pause, clock, sleep
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.candidates = candidates or 10 * round_size
+        self.weights = {"account": 1.0, "media": 1.0} | (weights or {})
+        self.kwargs = {"account": account_kwargs or {}, "media": media_kwargs or {}}
+        self.bucket = TokenBucket(rate, capacity=1, clock=clock, sleep=sleep)
+        self.paused_until = 0.0
+        # (kind, id) -> failures in a row and the clock time of the next try
+        self.failures: dict[tuple[str, int], tuple[int, float]] = {}
+        self.lock = Lock()
+
+    @property
+    def paused(self) -> bool:
+        return self.clock() < self.paused_until
+
+    def iter_candidates(self, now: datetime) -> Iterator[ScheduleItem]:
+        """The stalest due objects with their priority, without the backed off objects"""
+        cutoff = now - timedelta(seconds=self.min_age)
+        with self.hunter.db.Session() as session:
+            for kind, model in MODELS.items():
+                if (weight := self.weights.get(kind, 0)) <= 0:
+                    continue
+                stmt = select(model.id, model.stats_last_update, model.stats_growth).where(
+                    model.status == schemas.ModelStatus.OKAY, model.stats_last_update <= cutoff
+                )
+                if backed_off := self.get_backed_off(kind):
+                    stmt = stmt.where(model.id.not_in(backed_off))
+                for obj_id, last_update, growth in session.execute(stmt.order_by(model.stats_last_update).limit(self.candidates)):
+                    yield ScheduleItem(kind, obj_id, get_priority(last_update, growth, now, weight, self.growth_factor))
+
+    def get_backed_off(self, kind: str) -> list[int]:
+        """Ids of the objects of the kind, which are skipped after a failed update"""
+        now = self.clock()
+        with self.lock:
+            return [obj_id for (obj_kind, obj_id), (_, until) in self.failures.items() if obj_kind == kind and now < until]
+
+    def add_failure(self, item: ScheduleItem):
+        with self.lock:
+            count = self.failures.get((item.kind, item.id), (0, 0.0))[0] + 1
+            delay = min(self.backoff * 2 ** (count - 1), self.max_backoff)
+            self.failures[(item.kind, item.id)] = count, self.clock() + delay
+        logger.warning("%s:%8i - update failed %i times, skip it for %i sec", item.kind, item.id, count, delay)
+
+    def get_queue(self) -> list[ScheduleItem]:
+        """The round_size candidates with the highest priority, highest first"""
+        return heapq.nlargest(self.round_size, self.iter_candidates(datetime.utcnow()), key=lambda item: item.priority)
+
+    def update(self, item: ScheduleItem):
+        try:
+            match item.kind:
+                case "account":
+                    self.hunter.update_account(item.id, **self.kwargs["account"])
+                case "media":
+                    self.hunter.update_media(item.id, **self.kwargs["media"])
+        except QuotaExceeded:
+            logger.warning("quota exceeded, pause for %i sec", self.pause)
+            self.paused_until = self.clock() + self.pause
+            raise
+        except Exception:
+            self.add_failure(item)
+            raise
+        with self.lock:
+            self.failures.pop((item.kind, item.id), None)
+
+    def iter_dispatch(self, items: Iterable[ScheduleItem]) -> Iterator[ScheduleItem]:
+        """The items at the max rate, until the quota is exceeded"""
+        for item in items:
+            if self.paused:
+                return
+            self.bucket.acquire()
+            yield item
+
+    def run_round(self) -> RunSummary[ScheduleItem]:
+        queue = self.get_queue()
+        summary = run_all(self.update, self.iter_dispatch(queue), workers=self.concurrency, budget=self.interval)
+        if queue:
+            logger.info("scheduler round: %s", summary)
+        return summary
+
+    def run(self, rounds: int = 0):
+        """Update the objects until KeyboardInterrupt, 0 rounds = forever, only rounds with updates count"""
+        count = 0
+        try:
+            while not rounds or count < rounds:
+                if self.paused:
+                    self.sleep(self.paused_until - self.clock())
+                elif self.run_round().results:
+                    count += 1
+                else:
+                    # nothing is due
+                    self.sleep(self.interval)
+        except KeyboardInterrupt:
+            logger.info("scheduler stopped after %i rounds", count)
@@ -3,11 +3,13 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 from logging import getLogger
+from random import Random
 
-from sqlalchemy.sql import func
+from sqlalchemy import select
 
 from metrico.database import crud
 from metrico.database.models import TriggerAccount, TriggerMedia
+from metrico.database.query import get_sample_ids, get_sample_order
 from metrico.utils.misc import update_list
 
 from .basic import BasicTrigger
@@ -24,7 +26,15 @@ class SimpleTrigger(BasicTrigger):
 
         match self.config.get("order"):
             case "random":
-                account_query, media_query = account_query.order_by(func.random()), media_query.order_by(func.random())
+                # set "seed" in the config for a reproducible sample
+                rnd, limit = Random(self.config.get("seed")), self.config.get("limit", 100)
+                if limit:
+                    account_ids = select(TriggerAccount.id).where(TriggerAccount.trigger_id == trigger.id)
+                    media_ids = select(TriggerMedia.id).where(TriggerMedia.trigger_id == trigger.id)
+                    account_query = account_query.filter(TriggerAccount.id.in_(get_sample_ids(account_ids, TriggerAccount.sample_key, limit, rnd)))
+                    media_query = media_query.filter(TriggerMedia.id.in_(get_sample_ids(media_ids, TriggerMedia.sample_key, limit, rnd)))
+                account_query = account_query.order_by(get_sample_order(TriggerAccount.id, rnd))
+                media_query = media_query.order_by(get_sample_order(TriggerMedia.id, rnd))
             case "desc":
                 account_query, media_query = account_query.order_by(TriggerAccount.timestamp.desc()), media_query.order_by(TriggerMedia.timestamp.desc())
             case "asc" | _:
@@ -35,28 +45,32 @@ class SimpleTrigger(BasicTrigger):
         return account_query, media_query
 
     def trigger_action(self, metrico: MetricoCore, account_ids: list[int], media_ids: list[int]) -> bool:
-        if account_ids:
-            update_list(
-                ids=account_ids,
-                func=metrico.update_account,
-                threads=self.config.get("threads", 4),
-                media_count=self.config.get("media_count", -1),
-                comment_count=self.config.get("comment_count", -1),
-                subscription_count=self.config.get("subscription_count", -1),
-            )
-        if media_ids:
-            update_list(
-                ids=media_ids,
-                func=metrico.update_media,
-                threads=self.config.get("threads", 4),
-                comment_count=self.config.get("comment_count", -1),
-            )
+        # "budget" in seconds for each list, the rest waits for the next run
+        accounts = update_list(
+            ids=account_ids,
+            func=metrico.update_account,
+            threads=self.config.get("threads", 4),
+            budget=self.config.get("budget"),
+            media_count=self.config.get("media_count", -1),
+            comment_count=self.config.get("comment_count", -1),
+            subscription_count=self.config.get("subscription_count", -1),
+        )
+        medias = update_list(
+            ids=media_ids,
+            func=metrico.update_media,
+            threads=self.config.get("threads", 4),
+            budget=self.config.get("budget"),
+            comment_count=self.config.get("comment_count", -1),
+        )
+        if accounts.failed or medias.failed:
+            logger.warning("trigger %s: failed accounts %s, failed medias %s", self.name, accounts.failed, medias.failed)
 
         if self.config.get("single_call", False):
+            # the failed and skipped objects stay in the trigger
             with metrico.db.Session() as local_session:
-                for account_id in account_ids:
+                for account_id in accounts.succeeded:
                     crud.remove_from_trigger(local_session, trigger=self.name, account=account_id)
-                for media_id in media_ids:
+                for media_id in medias.succeeded:
                     crud.remove_from_trigger(local_session, trigger=self.name, media=media_id)
                 local_session.commit()
-        return True
+        return accounts.success and medias.success
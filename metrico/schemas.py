@@ -31,6 +31,14 @@ class ModelStatus(Enum):
         return self.name
 
 
+class RollupPeriod(Enum):
+    HOUR = 0
+    DAY = 1
+
+    def __str__(self):
+        return self.name
+
+
 @dataclass
 class Created:
     value: Optional[datetime] = None
@@ -56,6 +64,8 @@ class Account:
     created: Optional[Created] = None
     info: Optional[AccountInfo] = None
     stats: Optional[AccountStats] = None
+    # platform id of the list with all medias, e.g. the uploads playlist of a YouTube channel
+    media_list: Optional[str] = None
 
 
 @dataclass
@@ -112,10 +122,36 @@ class BasicClassItem:
     config: dict
 
 
+@dataclass
+class DatabaseSqliteConfig:
+    """SQLite pragmas, set on every new connection. None keeps the SQLite default."""
+
+    journal_mode: Optional[str] = "WAL"
+    synchronous: Optional[str] = "NORMAL"
+    busy_timeout: Optional[int] = 5000
+    mmap_size: Optional[int] = None
+    cache_size: Optional[int] = None
+
+
+@dataclass
+class DatabasePoolConfig:
+    """Connection pool settings for server databases like PostgreSQL or MySQL"""
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_pre_ping: bool = True
+    pool_recycle: int = -1
+
+
 @dataclass
 class DatabaseConfig:
     url: str = "sqlite:///database.db"
     enable_echo: bool = False
+    account_cache_size: int = 1024
+    sqlite: DatabaseSqliteConfig = field(default_factory=DatabaseSqliteConfig)
+    pool: DatabasePoolConfig = field(default_factory=DatabasePoolConfig)
+    # delete raw stats older than n days, but only after they are rolled up, 0 = keep everything
+    stats_retention_days: int = 0
     on_create_account_trigger: str = ""
     on_create_media_trigger: str = ""
 
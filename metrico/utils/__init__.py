@@ -1 +1 @@
-from .misc import update_list
+from .misc import run_all, update_list
@@ -73,8 +73,10 @@ class ConfigMixin:
         self.config: MetricoConfig = MetricoConfig.load(filename) if filename is not None else MetricoConfig.default()
 
         # check the config
-        if isinstance(config, (MetricoConfig, dict)):
-            self.config.parse_obj(config)
+        if isinstance(config, MetricoConfig):
+            self.config = config
+        elif isinstance(config, dict):
+            self.config = MetricoConfig.parse_obj(config)
 
     @classmethod
     def default(cls):
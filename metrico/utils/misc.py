@@ -1,11 +1,16 @@
-from typing import Any, Callable
+from typing import Any, Callable, Generic, Iterable, Iterator, TypeVar
 
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
 from logging import Formatter, StreamHandler, getLogger
-from threading import Thread
-from time import sleep
 
 logger = getLogger(__name__)
 
+T = TypeVar("T")
+
 
 def config_logger(verbose: int, name: str | None = None):
     _logger = getLogger(name)
@@ -18,32 +23,130 @@ def config_logger(verbose: int, name: str | None = None):
     _logger.addHandler(handler)
 
 
-def thread_call(obj_ids, update_func, kwargs, threads_count) -> bool:
-    threads: list[Thread] = []
-    success: bool = False
-    try:
-        for obj_id in obj_ids:
-            while len(threads) > threads_count - 1:
-                threads = [t for t in threads if t.is_alive()]
-                sleep(0.1)
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """
+    Split an iterable into lists with up to size items
+
+    :param iterable: any iterable, it is consumed lazily
+    :param size: max length of every chunk, values < 1 yield everything in one chunk
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size if size > 0 else None)):
+        yield chunk
+
+
+@dataclass
+class RunResult(Generic[T]):
+    item: T
+    value: Any = None
+    error: BaseException | None = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class RunSummary(Generic[T]):
+    results: list[RunResult[T]] = field(default_factory=list)
+    # items which were not started, the time budget was over
+    skipped: list[T] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> list[T]:
+        return [result.item for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> list[T]:
+        return [result.item for result in self.results if not result.ok]
+
+    @property
+    def success(self) -> bool:
+        return not self.failed and not self.skipped
+
+    def __bool__(self):
+        return self.success
+
+    def percentile(self, percent: float) -> float:
+        """Latency of the calls in seconds (nearest rank)"""
+        latencies = sorted(result.seconds for result in self.results)
+        if not latencies:
+            return 0.0
+        return latencies[max(math.ceil(percent / 100 * len(latencies)) - 1, 0)]
+
+    def __str__(self):
+        return (
+            f"{len(self.succeeded)} succeeded, {len(self.failed)} failed, {len(self.skipped)} skipped in {self.seconds:.1f}s, "
+            f"latency p50={self.percentile(50):.2f}s p90={self.percentile(90):.2f}s p99={self.percentile(99):.2f}s"
+        )
+
+
+def run_all(
+    func: Callable[..., Any],
+    items: Iterable[T],
+    workers: int = 1,
+    budget: float | None = None,
+    progress: Callable[[RunResult[T], int], Any] | None = None,
+    **kwargs: Any,
+) -> RunSummary[T]:
+    """
+    Call func(item, **kwargs) for every item, the exceptions are part of the results
+
+    :param workers: max parallel calls, values < 2 call func in the current thread
+    :param budget: seconds for the whole run, afterwards no item is started, the running calls are finished
+    :param progress: called with every result and the number of finished items
+    """
+    summary: RunSummary[T] = RunSummary()
+    start = time.monotonic()
+    deadline = start + budget if budget is not None else math.inf
+
+    def call(item: T) -> RunResult[T]:
+        call_start = time.monotonic()
+        try:
+            return RunResult(item, value=func(item, **kwargs), seconds=time.monotonic() - call_start)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("fail to call %s with %s", func, item, exc_info=True)
+            return RunResult(item, error=exc, seconds=time.monotonic() - call_start)
+
+    def add(result: RunResult[T]):
+        summary.results.append(result)
+        if progress is not None:
+            progress(result, len(summary.results))
 
-            thread = Thread(target=update_func, args=(obj_id,), kwargs=kwargs)
-            thread.start()
-            threads.append(thread)
-    except:
-        logger.exception("exception in thread loop ")
-        success = False
+    iterator = iter(items)
+    if workers < 2:
+        for item in iterator:
+            if time.monotonic() >= deadline:
+                summary.skipped.append(item)
+                continue
+            add(call(item))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # only submit up to workers items, so the budget can stop the rest
+            running = {executor.submit(call, item) for item in islice(iterator, workers)}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    add(future.result())
+                for item in islice(iterator, len(done)):
+                    if time.monotonic() >= deadline:
+                        summary.skipped.append(item)
+                        continue
+                    running.add(executor.submit(call, item))
+        summary.skipped.extend(iterator)
 
-    logger.info("waiting for all threads to end")
-    for thread in threads:
-        thread.join()
-    return success
+    summary.seconds = time.monotonic() - start
+    return summary
 
 
-def update_list(ids: list[int], func: Callable[[int, int, int, int], Any] | Callable[[int, int], Any], threads: int = 0, **kwargs: Any) -> bool:
+def update_list(ids: list[int], func: Callable[..., Any], threads: int = 0, budget: float | None = None, **kwargs: Any) -> RunSummary[int]:
+    """Call func(obj_id, **kwargs) for every id with up to threads threads, see run_all"""
     logger.info("update list with threads=%i, kwargs=%s", threads, kwargs)
-    if isinstance(threads, int) and threads > 1:
-        return thread_call(ids, func, kwargs, threads)
-    for obj_id in ids:
-        func(obj_id, **kwargs)  # type: ignore
-    return True
+    summary = run_all(func, ids, workers=threads, budget=budget, **kwargs)
+    logger.info("update list: %s", summary)
+    for result in summary.results:
+        if result.error is not None:
+            logger.warning("fail to update %s: %r", result.item, result.error)
+    return summary
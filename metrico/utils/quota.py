@@ -0,0 +1,110 @@
+"""
+Rate limits and quota accounting of API keys.
+
+TokenBucket limits the requests per second of one key. QuotaLedger counts the quota cost of the
+requests by key and day in a SQLite file, so all processes share the usage. The day starts at
+reset_hour UTC (YouTube resets at midnight Pacific time).
+"""
+from typing import Any, Callable
+
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime, timezone
+from logging import getLogger
+from threading import Lock
+
+logger = getLogger(__name__)
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def get_key_id(kwargs: dict[str, Any]) -> str:
+    """Stable id of the api kwargs, the ledger does not store the keys"""
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], Any] = time.sleep):
+        """
+        :param rate: tokens (requests) per second, 0 = no limit
+        :param capacity: max burst, default is one second of tokens
+        """
+        self.rate, self.capacity, self.clock, self.sleep = rate, capacity or max(rate, 1.0), clock, sleep
+        self.tokens, self.updated = self.capacity, clock()
+        self.lock = Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Take the tokens, wait until they are available"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class QuotaLedger:
+    def __init__(self, path: str = ":memory:", daily_limit: int = 0, reset_hour: int = 8, clock: Callable[[], float] = time.time):
+        """
+        :param path: SQLite file, shared by all processes
+        :param daily_limit: quota of every key per day, 0 = unknown, only the quota errors exhaust a key
+        :param reset_hour: start of the quota day in UTC
+        """
+        self.daily_limit, self.reset_hour, self.clock = daily_limit, reset_hour, clock
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS quota_usage "
+                "(key_id TEXT NOT NULL, day TEXT NOT NULL, used INTEGER NOT NULL DEFAULT 0, exhausted INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (key_id, day))"
+            )
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any] | None):
+        """The ledger of the hunter config, e.g. quota = {path = "quota.db", daily_limit = 10000}"""
+        return cls(**{key: value for key, value in (config or {}).items() if key != "costs"})
+
+    def get_day(self) -> str:
+        return datetime.fromtimestamp(self.clock() - self.reset_hour * 3600, tz=timezone.utc).date().isoformat()
+
+    def add(self, key_id: str, cost: int):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO quota_usage (key_id, day, used) VALUES (?, ?, ?) ON CONFLICT (key_id, day) DO UPDATE SET used = used + excluded.used",
+                (key_id, self.get_day(), cost),
+            )
+
+    def exhaust(self, key_id: str):
+        """The api rejected the key, don't use it until the next day"""
+        logger.info("quota of key %s is exhausted", key_id)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO quota_usage (key_id, day, exhausted) VALUES (?, ?, 1) ON CONFLICT (key_id, day) DO UPDATE SET exhausted = 1",
+                (key_id, self.get_day()),
+            )
+
+    def get_remaining(self, key_ids: list[str]) -> dict[str, int]:
+        """
+        Remaining quota of the usable keys today, without a daily limit the negative usage.
+        Exhausted keys are missing.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT key_id, used, exhausted FROM quota_usage WHERE day = ?", (self.get_day(),)).fetchall()
+        usage = {key_id: (used, exhausted) for key_id, used, exhausted in rows}
+        remaining = {}
+        for key_id in key_ids:
+            used, exhausted = usage.get(key_id, (0, 0))
+            if exhausted or (self.daily_limit and used >= self.daily_limit):
+                continue
+            remaining[key_id] = self.daily_limit - used if self.daily_limit else -used
+        return remaining
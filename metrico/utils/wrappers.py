@@ -1,7 +1,12 @@
-from typing import Any
+from typing import Any, Callable, Iterator
 
 import random
+import time
+from dataclasses import dataclass
 from logging import getLogger
+from threading import Condition, Lock
+
+from metrico.utils.quota import QuotaExceeded, QuotaLedger, TokenBucket, get_key_id
 
 logger = getLogger(__name__)
 
@@ -10,63 +15,196 @@ def basic_check(exc):
     return str(exc).find("The request cannot be completed because you have exceeded your") != -1
 
 
-class MultiObjCaller:
-    def __init__(self, cls, kwargs: list[dict[str, Any]], check_exc=basic_check):
-        self.cls, self.kwargs, self.check_exc = cls, kwargs, check_exc
-        random.shuffle(self.kwargs)
-        self.obj = self._create_obj()
+def iter_pages(method: Callable[..., Any], page_size: int, amount: int = 0, **kwargs: Any) -> Iterator[Any]:
+    """
+    The result pages of a list method with count, limit and page_token (like pyyoutube), 0 amount = all pages.
+    Every page is its own call with one request, so the quota of every request is booked and the caller
+    can stop before the next page is loaded. A failed call (None) ends the pages.
+    """
+    page_token, count = None, 0
+    while True:
+        limit = min(page_size, amount - count) if amount else page_size
+        if (page := method(count=limit, limit=limit, page_token=page_token, **kwargs)) is None:
+            return
+        yield page
+        count += len(page.items or [])
+        page_token = page.nextPageToken
+        if not page_token or not page.items or (amount and count >= amount):
+            return
 
-    def _create_obj(self):
-        if not self.kwargs:
+
+class MultiObjCaller:
+    def __init__(
+        self,
+        cls,
+        kwargs: list[dict[str, Any]],
+        check_exc=basic_check,
+        setup: Callable[[Any], Any] | None = None,
+        quota: QuotaLedger | None = None,
+        rate: float = 0,
+        costs: dict[str, int] | None = None,
+    ):
+        """
+        Every call uses the key with the most remaining quota, a key which exceeded its quota is used again the next day.
+
+        :param setup: called with every new object, e.g. to set the response cache
+        :param quota: shared usage of the keys, default is an in-memory ledger; the cost is booked before the call, also for cached responses.
+            A call should be one request, page the list methods with iter_pages
+        :param rate: max requests per second of every key, 0 = no limit
+        :param costs: quota cost by method name, default is 1
+        """
+        if not kwargs:
             raise Exception("No kwargs to create object")
-        kwargs = self.kwargs.pop()
-        self.obj = self.cls(**kwargs)
-        logger.info("Create object with kwargs=%s", kwargs)
-        return self.obj
+        self.cls, self.check_exc, self.setup = cls, check_exc, setup
+        self.quota, self.costs = quota or QuotaLedger(), costs or {}
+        self.kwargs = {get_key_id(item): item for item in kwargs}
+        self.buckets = {key_id: TokenBucket(rate) for key_id in self.kwargs}
+        self.objs: dict[str, Any] = {}
+        self.obj = self._create_obj(next(iter(self.kwargs)))
+
+    def _create_obj(self, key_id: str):
+        if key_id not in self.objs:
+            self.objs[key_id] = self.cls(**self.kwargs[key_id])
+            if self.setup is not None:
+                self.setup(self.objs[key_id])
+            logger.info("Create object for key %s", key_id)
+        return self.objs[key_id]
+
+    def _select_key(self) -> str:
+        remaining = self.quota.get_remaining(list(self.kwargs))
+        if not remaining:
+            raise QuotaExceeded(f"The quota of all {len(self.kwargs)} keys is exceeded")
+        best = max(remaining.values())
+        return random.choice([key_id for key_id, value in remaining.items() if value == best])
 
     def __getattr__(self, name):
         if not hasattr(self.obj, name):
             raise AttributeError(name)
 
         def wrapper(*args, **kw):
+            # every failed key is exhausted, so the loop ends with QuotaExceeded at the latest
             while True:
-                obj_id = id(self.obj)
+                key_id = self._select_key()
+                self.obj = self._create_obj(key_id)
+                self.buckets[key_id].acquire()
+                self.quota.add(key_id, self.costs.get(name, 1))
                 try:
                     return getattr(self.obj, name)(*args, **kw)
                 except Exception as exc:
-                    if self.check_exc(exc):
+                    if not self.check_exc(exc):
                         logger.debug("Fail to call %s. exc=%s", name, exc)
-                        if obj_id == id(self.obj):
-                            self._create_obj()
-                    else:
-                        break
+                        return None
+                    self.quota.exhaust(key_id)
 
         return wrapper
 
 
-if __name__ == "__main__":
+@dataclass
+class KeyHealth:
+    """Moving averages of the calls of one key, the newest call has the weight alpha"""
+
+    alpha: float = 0.2
+    error_rate: float = 0.0
+    latency: float = 0.0
+    calls: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    failed_at: float = 0.0
+
+    def add(self, latency: float, error: bool, now: float):
+        self.calls += 1
+        self.errors += int(error)
+        if error:
+            self.failed_at = now
+        self.error_rate += self.alpha * (float(error) - self.error_rate)
+        # the first call sets the latency, a default of 0 prefers the unused keys
+        self.latency = latency if self.calls == 1 else self.latency + self.alpha * (latency - self.latency)
+
+    @property
+    def score(self) -> float:
+        """Higher is better: the part of successful calls per second of latency"""
+        return (1.0 - self.error_rate) / (1.0 + self.latency)
+
+
+class KeyPool(MultiObjCaller):
+    def __init__(
+        self,
+        cls,
+        kwargs: list[dict[str, Any]],
+        concurrency: int = 2,
+        max_error_rate: float = 0.5,
+        cooldown: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+        **options: Any,
+    ):
+        """
+        Thread-safe MultiObjCaller, the calls of many threads run on all keys at the same time.
+        Every call uses the free key with the best health score (error rate and latency) and the most remaining quota.
+
+        :param concurrency: max parallel calls of one key, the other threads wait for a free key
+        :param max_error_rate: a key above it is unhealthy and not used for cooldown seconds after its last error
+        :param options: the options of MultiObjCaller (check_exc, setup, quota, rate, costs)
+        """
+        self.concurrency, self.max_error_rate, self.cooldown, self.clock = max(concurrency, 1), max_error_rate, cooldown, clock
+        self.lock = Condition(Lock())
+        super().__init__(cls, kwargs, **options)
+        self.health = {key_id: KeyHealth() for key_id in self.kwargs}
+
+    def _create_obj(self, key_id: str):
+        with self.lock:
+            return super()._create_obj(key_id)
+
+    def is_healthy(self, key_id: str) -> bool:
+        health = self.health[key_id]
+        return health.error_rate <= self.max_error_rate or self.clock() - health.failed_at >= self.cooldown
+
+    def _get_order(self, key_id: str, remaining: dict[str, int]) -> tuple:
+        health = self.health[key_id]
+        return self.is_healthy(key_id), health.score * (1 - health.in_flight / self.concurrency), remaining[key_id]
+
+    def _acquire_key(self) -> str:
+        """Select a key and take one of its slots, wait until a key is free"""
+        while True:
+            remaining = self.quota.get_remaining(list(self.kwargs))
+            if not remaining:
+                raise QuotaExceeded(f"The quota of all {len(self.kwargs)} keys is exceeded")
+            with self.lock:
+                if free := [key_id for key_id in remaining if self.health[key_id].in_flight < self.concurrency]:
+                    key_id = max(free, key=lambda item: self._get_order(item, remaining))
+                    self.health[key_id].in_flight += 1
+                    return key_id
+                # the other threads book quota while this one waits, read the ledger again
+                self.lock.wait()
+
+    def _release_key(self, key_id: str, latency: float, error: bool):
+        with self.lock:
+            health = self.health[key_id]
+            health.in_flight -= 1
+            health.add(latency, error, self.clock())
+            self.lock.notify()
 
-    class TestApi:
-        def __init__(self, name):
-            self.name = name
-
-        def test(self, name: str | None = None):
-            if name is not None:
-                self.name = name
-            if name == "e":
-                raise Exception("Oh no...")
-            print(self.name)
-
-    api = MultiObjCaller(TestApi, [{"name": "1"}, {"name": "2"}, {"name": "3"}])
-    api.test()
-    api.test(name="12")
-    api.test()
-
-    api.test(name="e")
-    api.test()
+    def __getattr__(self, name):
+        if not hasattr(self.obj, name):
+            raise AttributeError(name)
 
-    api.test(name="e")
-    api.test()
+        def wrapper(*args, **kw):
+            # every failed key is exhausted, so the loop ends with QuotaExceeded at the latest
+            while True:
+                key_id = self._acquire_key()
+                obj = self._create_obj(key_id)
+                self.buckets[key_id].acquire()
+                self.quota.add(key_id, self.costs.get(name, 1))
+                start, error = self.clock(), True
+                try:
+                    result = getattr(obj, name)(*args, **kw)
+                    error = False
+                    return result
+                except Exception as exc:
+                    if not self.check_exc(exc):
+                        logger.debug("Fail to call %s with key %s. exc=%s", name, key_id, exc)
+                        return None
+                    self.quota.exhaust(key_id)
+                finally:
+                    self._release_key(key_id, self.clock() - start, error)
 
-    api.test(name="e")
-    api.test()
+        return wrapper
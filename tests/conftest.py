@@ -0,0 +1,25 @@
+import pytest
+
+from metrico import MetricoDB
+
+
+@pytest.fixture
+def db_config() -> dict:
+    """The db config of the db fixture, a test module can override it"""
+    return {"url": "sqlite://"}
+
+
+@pytest.fixture
+def db(db_config: dict) -> MetricoDB:
+    """A new in-memory database for every test, created from the models"""
+    database = MetricoDB(config={"db": db_config})
+    database.setup()
+    return database
+
+
+@pytest.fixture
+def migrated_db() -> MetricoDB:
+    """A new in-memory database for every test, created by the migrations"""
+    database = MetricoDB(config={"db": {"url": "sqlite://"}})
+    database.migrate()
+    return database
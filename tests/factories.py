@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from metrico import schemas
+
+CREATED_AT = datetime(2023, 1, 1)
+
+
+def create_account(index: int, name: str | None = None, bio: str = "bio", **stats: int | None) -> schemas.Account:
+    """The account 'account-{index}', the keyword arguments replace the default stats"""
+    return schemas.Account(
+        identifier=f"account-{index}",
+        info=schemas.AccountInfo(name=name or f"name-{index}", bio=bio),
+        stats=schemas.AccountStats(**{"medias": 1, "views": 100, "followers": 10, "subscriptions": 0, **stats}),
+    )
+
+
+def create_media(
+    index: int,
+    caption: str = "caption",
+    account: schemas.Account | None = None,
+    accounts: int = 3,
+    created: datetime | None = None,
+    **stats: int | None,
+) -> schemas.Media:
+    """
+    The media 'media-{index}', the keyword arguments replace the default stats
+
+    :param account: default is the account 'account-{index % accounts}' without data
+    """
+    return schemas.Media(
+        identifier=f"media-{index}",
+        media_type=schemas.MediaType.VIDEO,
+        account=account or schemas.Account(identifier=f"account-{index % accounts}"),
+        created=schemas.Created(created) if created else None,
+        info=schemas.MediaInfo(title=f"title-{index}", caption=caption),
+        stats=schemas.MediaStats(**{"comments": 0, "likes": 10, "views": 100, **stats}),
+    )
+
+
+def create_comment(
+    index: int, text: str | None = None, likes: int = 1, account: str | None = None, created_at: datetime | None = CREATED_AT
+) -> schemas.MediaComment:
+    """The comment 'comment-{index}' of the account with the identifier account"""
+    return schemas.MediaComment(
+        identifier=f"comment-{index}",
+        account=schemas.Account(identifier=account) if account else None,
+        content=schemas.MediaCommentContent(text=text or f"text-{index}", likes=likes, created_at=created_at),  # type: ignore[arg-type]
+    )
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from metrico import AsyncMetricoDB
+from metrico.database.aio import get_async_url
+from metrico.database.query import AccountQuery, MediaQuery
+from tests.factories import create_account, create_media
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+
+def test_get_async_url():
+    assert str(get_async_url("sqlite://")) == "sqlite+aiosqlite://"
+    assert str(get_async_url("sqlite:///database.db")) == "sqlite+aiosqlite:///database.db"
+    assert str(get_async_url("postgresql://user@localhost/metrico")) == "postgresql+asyncpg://user@localhost/metrico"
+    assert str(get_async_url("postgresql+psycopg://user@localhost/metrico")) == "postgresql+psycopg://user@localhost/metrico"
+
+
+def test_async_db():
+    async def run():
+        db = AsyncMetricoDB(config={"db": {"url": "sqlite://"}})
+        await db.setup()
+
+        account = await db.create_account("async", create_account(0))
+        assert account.info_name == "name-0"
+        medias = [await db.create_media("async", create_media(index, accounts=2)) for index in range(6)]
+        assert len({media.id for media in medias}) == 6
+        assert {media.account_id for media in medias} == {account.id, account.id + 1}
+
+        assert await db.count_query(AccountQuery()) == 2
+        assert await db.count_query(MediaQuery(accounts=account.id)) == 3
+        titles = [media.info_title async for media in db.iter_query(MediaQuery(accounts=account.id))]
+        assert sorted(titles) == ["title-0", "title-2", "title-4"]
+
+        found = await asyncio.gather(*[db.get_media(media.id) for media in medias])
+        assert [media.identifier for media in found] == [f"media-{index}" for index in range(6)]
+        async with db.Session() as session:
+            media = await db.create_media("async", create_media(0, accounts=2), session=session)
+            assert media.id == medias[0].id
+        await db.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_migrate(tmp_path):
+    async def run():
+        db = AsyncMetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'async.db'}"}})
+        await db.migrate()
+        assert await db.count_query(AccountQuery()) == 0
+        await db.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import event
+
+from metrico import schemas
+from metrico.database import crud
+from metrico.database.cache import AccountCache, get_account_cache
+from tests.factories import create_account
+
+
+@pytest.fixture
+def db_config():
+    return {"url": "sqlite://", "account_cache_size": 2}
+
+
+def count_selects(db, func, *args):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *_):
+        if statement.startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = func(*args)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+
+def test_account_cache(db):
+    data = create_account(0)
+    with db.Session() as session:
+        account, selects = count_selects(db, crud.create_account, session, "cache", data)
+        assert selects > 0
+        for _ in range(40):
+            assert count_selects(db, crud.create_account, session, "cache", data) == (account, 0)
+
+        cache = get_account_cache(session)
+        assert (cache.hits, cache.misses) == (40, 1)
+        assert cache.maxsize == 2
+
+        # changed data of a cached account is still written
+        data.info.name = "name-1"
+        crud.create_account(session, "cache", data)
+        assert account.info.count() == 2
+
+
+def test_account_cache_lru(db):
+    with db.Session() as session:
+        cache = get_account_cache(session)
+        for identifier in ["a", "b", "a", "c"]:
+            crud.create_account(session, "lru", schemas.Account(identifier=identifier))
+        assert [key[1] for key in cache.items] == ["a", "c"]
+
+
+def test_account_cache_rollback(db):
+    with db.Session() as session:
+        account = crud.create_account(session, "rollback", schemas.Account(identifier="rollback"))
+        session.rollback()
+        assert get_account_cache(session).get(session, "rollback", "rollback") == (None, None)
+        assert crud.create_account(session, "rollback", schemas.Account(identifier="rollback")) is not account
+
+
+def test_account_cache_rollback_data(db):
+    with db.Session() as session:
+        account = crud.create_account(session, "rollback", schemas.Account(identifier="rollback"))
+        session.commit()
+        data = create_account(0)
+        crud.create_account(session, "rollback", replace(data, identifier="rollback"))
+        session.rollback()
+        # the account is still persistent, the same data is written again
+        crud.create_account(session, "rollback", replace(data, identifier="rollback"))
+        session.commit()
+        assert account.info.count() == account.stats.count() == 1
+        assert account.info_name == "name-0"
+
+
+def test_account_cache_session(db):
+    with db.Session() as session_1, db.Session() as session_2:
+        assert isinstance(get_account_cache(session_1), AccountCache)
+        assert get_account_cache(session_1) is not get_account_cache(session_2)
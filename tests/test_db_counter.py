@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from metrico import schemas
+from metrico.database import crud, models
+from metrico.database.rollup import rollup
+from tests.factories import create_comment, create_media
+
+
+def assert_counts(db):
+    assert db.stats() == db.stats(exact=True)
+
+
+def test_row_counts(db):
+    assert_counts(db)
+    for index in range(4):
+        db.create_media("counter", create_media(index, accounts=2))
+    assert db.stats("Media") == 4
+    assert_counts(db)
+
+    db.ingest("counter", [create_media(index, accounts=2, likes=2) for index in range(2, 8)])
+    assert db.stats("Media") == 8
+    assert_counts(db)
+
+    with db.Session() as session:
+        media = session.scalar(select(models.Media).where(models.Media.identifier == "media-0"))
+        crud.upsert_media_comments(session, media, [create_comment(index) for index in range(5)])
+        crud.upsert_media_comments(session, media, [create_comment(index) for index in range(3, 8)])
+        crud.update_media(session, media, create_comment(10))
+        session.commit()
+    assert db.stats("Media-Comment") == 9
+    assert_counts(db)
+
+    # deleted by the orm cascade
+    with db.Session() as session:
+        session.delete(session.scalar(select(models.Media).where(models.Media.identifier == "media-0")))
+        session.commit()
+    assert db.stats("Media-Comment") == 0
+    assert_counts(db)
+
+    # deleted by the retention
+    with db.Session() as session:
+        rollup(session, until=datetime.utcnow() + timedelta(days=3), retention_days=1)
+        session.commit()
+    assert db.stats("Media-Data") == 0
+    assert_counts(db)
+
+
+def test_row_counts_rollback(db):
+    counts = db.stats()
+    with db.Session() as session:
+        crud.create_media(session, crud.create_account(session, "rollback", schemas.Account(identifier="rollback")), create_media(0, accounts=2))
+        session.rollback()
+        session.commit()
+    assert db.stats() == counts
+    assert_counts(db)
+
+
+def test_recount(db):
+    with db.Session() as session:
+        session.execute(models.RowCount.__table__.update().values(count=-1))
+        session.commit()
+    assert db.recount() == db.stats(exact=True)
+    assert_counts(db)
+
+
+def test_missing_row_counts(db):
+    with db.Session() as session:
+        session.execute(models.RowCount.__table__.delete())
+        session.commit()
+    assert_counts(db)
+
+
+def get_relationship_counts(db):
+    with db.Session() as session:
+        accounts = session.execute(
+            select(models.Account.id, models.Account.medias_count, models.Account.comments_count, models.Account.subscriptions_count, models.Account.followers_count)
+        )
+        medias = session.execute(select(models.Media.id, models.Media.comments_count))
+        return sorted(accounts.tuples().all()), sorted(medias.tuples().all())
+
+
+def test_relationship_counts(db):
+    db.ingest("relationship", [create_media(index, accounts=2) for index in range(4)])
+    media = db.create_media("relationship", create_media(5, accounts=2))
+    with db.Session() as session:
+        media = session.get(models.Media, media.id)
+        assert media.account.medias_count == media.account.medias.count() == 3
+        crud.upsert_media_comments(session, media, [create_comment(index, created_at=None) for index in range(3)])
+        # the author is added to an existing comment and one new comment
+        crud.upsert_media_comments(session, media, [create_comment(index, account="author-1", created_at=None) for index in range(2, 4)])
+        crud.update_media(session, media, create_comment(10, account="author-2", created_at=None))
+        subscriptions = [schemas.Subscription(account=schemas.Account(identifier=f"author-{index}")) for index in range(3)]
+        crud.update_account(session, media.account, *subscriptions)
+        session.commit()
+
+        assert media.comments_count == media.comments.count() == 5
+        assert media.account.subscriptions_count == 3
+        author = session.scalar(select(models.Account).where(models.Account.identifier == "author-1"))
+        assert author.comments_count == 2
+        assert author.followers_count == 1
+
+    counts = get_relationship_counts(db)
+    db.recount()
+    assert get_relationship_counts(db) == counts
+
+    with db.Session() as session:
+        session.execute(models.Account.__table__.update().values(medias_count=0, followers_count=7))
+        session.commit()
+    db.recount()
+    assert get_relationship_counts(db) == counts
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import text
+
+from metrico import MetricoDB, schemas
+from metrico.database import SqlitePragmaCaller
+
+
+def pragma(db: MetricoDB, name: str):
+    with db.engine.connect() as connection:
+        return connection.scalar(text(f"PRAGMA {name}"))
+
+
+def test_sqlite_pragmas(tmp_path):
+    db = MetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'engine.db'}", "sqlite": {"cache_size": -4096}}})
+    db.setup()
+    assert pragma(db, "journal_mode") == "wal"
+    assert pragma(db, "synchronous") == 1
+    assert pragma(db, "busy_timeout") == 5000
+    assert pragma(db, "cache_size") == -4096
+
+
+def test_sqlite_pragmas_disabled(tmp_path):
+    config = {"journal_mode": None, "synchronous": None, "busy_timeout": None}
+    db = MetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'engine.db'}", "sqlite": config}})
+    db.setup()
+    assert pragma(db, "journal_mode") == "delete"
+
+
+def test_sqlite_pragmas_invalid():
+    with pytest.raises(ValueError):
+        SqlitePragmaCaller(schemas.DatabaseSqliteConfig(journal_mode="WAL; DROP TABLE account"))
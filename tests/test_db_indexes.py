@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import event, select, text
+from sqlalchemy.dialects import sqlite
+
+from metrico import schemas
+from metrico.database import crud, models
+from metrico.database.query import AccountQuery, MediaCommentQuery, MediaQuery
+from tests.factories import create_account, create_comment, create_media
+
+
+def query_plan(db, statement: str, parameters=()) -> list[str]:
+    with db.engine.connect() as connection:
+        return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+def assert_indexed(plan: list[str]):
+    for detail in plan:
+        assert not detail.startswith("SCAN") or "INDEX" in detail, plan
+    # sorting a few searched rows is fine, sorting a whole table is not
+    if any(detail.startswith("SCAN") for detail in plan):
+        assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def crud_statements(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    account_data = create_account(0)
+    media_data = create_media(0, account=account_data)
+    comment_data = create_comment(0, account="account-0")
+
+    with db.Session() as session:
+        trigger = crud.create_obj(session, models.Trigger, name="index")
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            account = crud.create_account(session, "index", account_data)
+            media = crud.create_media(session, account, media_data)
+            crud.update_media(session, media, comment_data)
+            crud.update_account(session, account, schemas.Subscription(account=schemas.Account(identifier="account-1")))
+            crud.add_to_trigger(session, trigger.id, account=account.id, media=media.id)
+            media.stats.all()
+            account.info.all()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+        session.rollback()
+    return statements
+
+
+def test_crud_indexes(db):
+    statements = crud_statements(db)
+    assert statements
+    for statement, parameters in statements:
+        assert_indexed(query_plan(db, statement, parameters))
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        AccountQuery(),
+        AccountQuery(accounts="name-0"),
+        MediaQuery(),
+        MediaQuery(accounts=1),
+        MediaCommentQuery(),
+        MediaCommentQuery(accounts=1),
+    ],
+)
+def test_query_indexes(query, db):
+    stmt = query.query()
+    assert_indexed(query_plan(db, str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))))
+
+
+def test_relationship_indexes(db):
+    for stmt in [
+        select(models.Media).where(models.Media.account_id == 1).order_by(models.Media.created_at.desc()),
+        select(models.MediaComment).where(models.MediaComment.media_id == 1).order_by(models.MediaComment.created_at.desc()),
+        select(models.MediaStats).where(models.MediaStats.media_id == 1).order_by(models.MediaStats.timestamp.desc()),
+        select(models.AccountStats).where(models.AccountStats.account_id == 1).order_by(models.AccountStats.timestamp.desc()),
+    ]:
+        assert_indexed(query_plan(db, str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))))
+
+
+def test_migrate_indexes(migrated_db):
+    with migrated_db.engine.connect() as connection:
+        names = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if table.name != "trigger":
+                assert index.name in names
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, inspect, select, update
+
+from metrico.database import crud, models
+from tests.factories import create_account, create_comment, create_media
+
+
+def count(db, model, platform: str):
+    with db.Session() as session:
+        stmt = select(func.count(model.id)).join(models.Account).where(models.Account.platform == platform)
+        return session.scalar(stmt)
+
+
+def test_ingest_accounts(db):
+    ids = db.ingest("ingest-accounts", [create_account(index) for index in range(10)], batch_size=4)
+    assert len(set(ids)) == 10
+    assert count(db, models.AccountInfo, "ingest-accounts") == 10
+    assert count(db, models.AccountStats, "ingest-accounts") == 10
+
+    # unchanged data -> no new history rows, changed stats -> one new stats row
+    datas = [create_account(index, followers=10 if index % 2 else 20) for index in range(10)]
+    assert db.ingest("ingest-accounts", datas) == ids
+    assert count(db, models.AccountInfo, "ingest-accounts") == 10
+    assert count(db, models.AccountStats, "ingest-accounts") == 15
+
+    account = db.get_account(ids[0])
+    assert account.info_name == "name-0"
+    assert account.stats_followers == 20
+
+
+def test_ingest_medias(db):
+    ids = db.ingest("ingest-medias", [create_media(index) for index in range(9)])
+    assert len(set(ids)) == 9
+    with db.Session() as session:
+        stmt = select(func.count(models.Account.id)).where(models.Account.platform == "ingest-medias")
+        assert session.scalar(stmt) == 3
+        media = db.get_media(ids[4], session=session)
+        assert media.identifier == "media-4"
+        assert media.account.identifier == "account-1"
+        assert media.info_title == "title-4"
+        assert media.stats.count() == 1
+
+    assert db.ingest("ingest-medias", [create_media(index, likes=11) for index in range(9)]) == ids
+    with db.Session() as session:
+        assert db.get_media(ids[4], session=session).stats.count() == 2
+
+
+def test_ingest_stats_growth(db):
+    account = create_account(0)
+    (account_id,) = db.ingest("ingest-growth", [account])
+    with db.Session() as session:
+        session.execute(update(models.Account).where(models.Account.id == account_id).values(stats_last_update=datetime.utcnow() - timedelta(days=2)))
+        session.commit()
+
+    account.stats.views = 300
+    db.ingest("ingest-growth", [account])
+    with db.Session() as session:
+        # 200% in two days
+        assert abs(db.get_account(account_id, session=session).stats_growth - 1.0) < 0.01
+
+
+def test_ingest_media_without_account(db):
+    media = create_media(0)
+    media.account = None
+    with pytest.raises(ValueError, match="media-0"):
+        db.ingest("ingest-no-account", [create_account(0), media])
+    # nothing of the batch is stored
+    with db.Session() as session:
+        assert session.scalar(select(func.count(models.Account.id)).where(models.Account.platform == "ingest-no-account")) == 0
+
+
+def test_ingest_matches_create(db):
+    db.ingest("ingest-same", [create_account(0), create_media(0)])
+    db.create_account("create-same", create_account(0))
+    db.create_media("create-same", create_media(0))
+    for model in [models.Media, models.AccountInfo, models.AccountStats]:
+        assert count(db, model, "ingest-same") == count(db, model, "create-same")
+
+
+def test_ingest_statements(db):
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append(args[2])
+
+    datas = [create_media(index) for index in range(60)]
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        db.ingest("ingest-statements", datas, batch_size=30)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    assert len(statements) < 30
+
+
+def test_upsert_media_comments(db):
+    media_id = db.ingest("upsert-comments", [create_media(0)])[0]
+    with db.Session() as session:
+        media = db.get_media(media_id, session=session)
+        crud.upsert_media_comments(session, media, [create_comment(index, account="author") for index in range(10)])
+        crud.upsert_media_comments(session, media, [create_comment(index, likes=5) for index in range(5, 15)])
+        session.commit()
+
+        assert media.comments.count() == 15
+        comments = {comment.identifier: comment for comment in media.comments}
+        assert comments["comment-0"].likes == 1
+        assert comments["comment-5"].likes == 5
+        # a missing account does not remove the stored one
+        assert comments["comment-5"].account.identifier == "author"
+        assert comments["comment-14"].account is None
+
+
+def test_migrate_media_comment_unique(migrated_db):
+    constraints = inspect(migrated_db.engine).get_unique_constraints("media_comment")
+    assert [constraint["column_names"] for constraint in constraints] == [["media_id", "identifier"]]
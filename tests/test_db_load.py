@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import event
+
+from metrico.database import crud
+from metrico.database.query import AccountQuery, MediaCommentQuery, MediaQuery
+from tests.factories import create_account, create_comment, create_media
+
+
+@pytest.fixture
+def db(db):
+    with db.Session() as session:
+        for index in range(10):
+            media = db.create_media("load", create_media(index, account=create_account(index)), session=session)
+            crud.update_media(session, media, *[create_comment(number, account=f"account-{number}") for number in range(3)])
+        session.commit()
+    return db
+
+
+def count_statements(db, func):
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+def list_comments(db, query: MediaCommentQuery):
+    def func():
+        for comment in db.iter_query(query, yield_per=7):
+            assert comment.account.info_name is not None or comment.account.identifier
+            assert comment.media.account.info_name.startswith("name-")
+
+    return func
+
+
+def test_load_comments(db):
+    lazy = count_statements(db, list_comments(db, MediaCommentQuery()))
+    loaded = count_statements(db, list_comments(db, MediaCommentQuery(load=["account", "media.account"])))
+    assert lazy > 30
+    assert loaded <= 2
+
+
+def test_load_dynamic():
+    # the collections are dynamic relationships, they are queries and can't be loaded
+    for query in [MediaQuery(load=["comments"]), AccountQuery(load=["comments.media"])]:
+        with pytest.raises(ValueError):
+            query.query()
+
+
+def test_load_count(db):
+    assert db.count_query(MediaCommentQuery(load=["account", "media.account"])) == db.count_query(MediaCommentQuery()) == 30
+    with db.Session() as session:
+        assert list(MediaQuery(load=["account"]).iter_ids(session)) == list(MediaQuery().iter_ids(session))
+
+
+def test_load_invalid():
+    for load in [["foo"], ["info_name"], ["account.foo"]]:
+        with pytest.raises(ValueError):
+            MediaQuery(load=load).query()
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from metrico.database.query import AccountOrder, AccountQuery, MediaOrder, MediaQuery, encode_cursor
+from tests.factories import create_media
+
+
+@pytest.fixture
+def db(db):
+    # duplicated created_at values and missing likes, the id is the tiebreaker
+    medias = [create_media(index, created=datetime(2023, 1, 1) + timedelta(hours=index // 4), likes=index % 5 if index % 6 else None) for index in range(25)]
+    db.ingest("pages", medias)
+    return db
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        MediaQuery(),
+        MediaQuery(order_asc=True),
+        MediaQuery(order_by=MediaOrder.LIKES),
+        MediaQuery(order_by=MediaOrder.LIKES, order_asc=True),
+        MediaQuery(order_by=MediaOrder.UPDATED),
+        AccountQuery(order_by=AccountOrder.MEDIAS),
+        AccountQuery(order_by=AccountOrder.UPDATED),
+        AccountQuery(accounts=["account-1", "account-2"]),
+    ],
+)
+def test_iter_pages(query, db):
+    with db.Session() as session:
+        expected = [obj.id for obj in query.iter(session)]
+        pages = list(query.iter_pages(session, page_size=4))
+        assert [obj.id for page in pages for obj in page] == expected
+        assert all(len(page) == 4 for page in pages[:-1])
+
+
+def test_iter_pages_limit(db):
+    with db.Session() as session:
+        query = MediaQuery(order_by=MediaOrder.LIKES, limit=10)
+        expected = [obj.id for obj in query.iter(session)]
+        assert [obj.id for page in query.iter_pages(session, page_size=4) for obj in page] == expected
+
+        # the cursor of the last object continues the list
+        query.after = query.get_cursor(list(query.iter(session))[-1])
+        assert [obj.id for obj in query.iter(session)] == [obj.id for obj in MediaQuery(order_by=MediaOrder.LIKES, limit=20).iter(session)][10:]
+
+
+def test_invalid_cursor(db):
+    with pytest.raises(ValueError):
+        MediaQuery(after="no-cursor").query()
+    with pytest.raises(ValueError):
+        MediaQuery(order_by=MediaOrder.LIKES, after=encode_cursor("CREATED", datetime(2023, 1, 1), 1)).query()
+    with pytest.raises(ValueError):
+        MediaQuery(order_by=MediaOrder.RANDOM, after=encode_cursor("RANDOM", None, 1)).query()
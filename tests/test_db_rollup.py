@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, inspect, select
+
+from metrico.analyze import get_lost
+from metrico.database import crud, models
+from metrico.database.rollup import ROLLUP_SOURCES, get_stats, rollup
+from metrico.schemas import RollupPeriod
+from tests.factories import create_media
+
+
+START = datetime(2023, 1, 1)
+LIKES = [10, 12, 11, 15, 14, 14, 20, 18, 25, 30, 29, 40]
+
+
+def create_stats_media(session):
+    media_data = create_media(0)
+    # only the samples below
+    media_data.stats = None
+    account = crud.create_account(session, "rollup", media_data.account)
+    media = crud.create_media(session, account, media_data)
+    # every 20 minutes a sample, 3 per hour
+    for index, likes in enumerate(LIKES):
+        crud.create_obj(session, models.MediaStats, media=media, timestamp=START + timedelta(minutes=20 * index), comments=1, likes=likes, views=100)
+    return media
+
+
+def count_stats(session, media):
+    return session.scalar(select(func.count(models.MediaStats.id)).where(models.MediaStats.media_id == media.id))
+
+
+def test_rollup(db):
+    with db.Session() as session:
+        media = create_stats_media(session)
+        lost = get_lost(media)
+
+        # only closed buckets, the hour of 'until' is still open
+        rollup(session, until=START + timedelta(hours=2, minutes=30))
+        buckets = media.stats_rollups.filter_by(period=RollupPeriod.HOUR).order_by(None).order_by(models.MediaStatsRollup.bucket).all()
+        assert [bucket.bucket for bucket in buckets] == [START, START + timedelta(hours=1)]
+        assert [bucket.samples for bucket in buckets] == [3, 3]
+        assert (buckets[0].likes_first, buckets[0].likes_last, buckets[0].likes_min, buckets[0].likes_max, buckets[0].likes_lost) == (10, 11, 10, 12, 1)
+        assert media.stats_rollups.filter_by(period=RollupPeriod.DAY).count() == 0
+        assert get_lost(media, RollupPeriod.HOUR) == lost
+
+        # incremental, nothing is rolled up twice
+        assert rollup(session, until=START + timedelta(hours=2, minutes=30))["media_stats_rollup"] == 0
+        rollup(session, until=START + timedelta(days=1))
+        assert media.stats_rollups.filter_by(period=RollupPeriod.HOUR).count() == 4
+        assert media.stats_rollups.filter_by(period=RollupPeriod.DAY).count() == 1
+        for period in RollupPeriod:
+            assert get_lost(media, period) == lost
+
+        stats = get_stats(media, RollupPeriod.HOUR)
+        assert [stat.likes for stat in stats] == [40, 25, 14, 11]
+        assert stats[0].timestamp == START + timedelta(hours=3)
+        session.rollback()
+
+
+def test_rollup_retention(db):
+    with db.Session() as session:
+        media = create_stats_media(session)
+        lost = get_lost(media)
+
+        # the daily bucket is still open, so nothing is deleted
+        assert rollup(session, until=START + timedelta(hours=6), retention_days=1)["media_stats"] == 0
+        assert count_stats(session, media) == len(LIKES)
+
+        results = rollup(session, until=START + timedelta(days=3), retention_days=1)
+        assert results["media_stats"] == len(LIKES)
+        assert count_stats(session, media) == 0
+        assert get_lost(media, RollupPeriod.DAY) == lost
+        session.rollback()
+
+
+def test_rollup_sources():
+    for model, source in ROLLUP_SOURCES.items():
+        columns = inspect(source.rollup).columns
+        for field in source.fields:
+            assert f"stats_{field}" in inspect(model).columns
+            for suffix in ["first", "last", "min", "max", "lost"]:
+                assert f"{field}_{suffix}" in columns
+
+
+def test_migrate_rollup(migrated_db):
+    names = inspect(migrated_db.engine).get_table_names()
+    assert "media_stats_rollup" in names
+    assert "account_stats_rollup" in names
@@ -0,0 +1,57 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy import select
+
+from metrico.database import crud, models
+from metrico.database.query import AccountOrder, AccountQuery, MediaCommentOrder, MediaCommentQuery, MediaOrder, MediaQuery
+from metrico.hunting.triggers.simple import SimpleTrigger
+from tests.factories import create_account
+
+
+@pytest.fixture
+def db(db):
+    db.ingest("sample", [create_account(index) for index in range(50)])
+    return db
+
+
+def sample(db, query) -> list[int]:
+    return [obj.id for obj in db.iter_query(query)]
+
+
+def test_sample(db):
+    ids = sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=10, seed=1))
+    assert len(ids) == len(set(ids)) == 10
+    assert sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=10, seed=1)) == ids
+    assert sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=10, seed=2)) != ids
+    assert sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=5, offset=5, seed=1)) == ids[5:]
+    # without a limit every row once
+    assert sorted(sample(db, AccountQuery(order_by=AccountOrder.RANDOM, seed=1))) == list(range(1, 51))
+    assert sorted(sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=100, seed=3))) == list(range(1, 51))
+    # the filters apply to the sample
+    assert len(sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=10, accounts=[1, 2, 3]))) == 3
+    assert db.count_query(AccountQuery(order_by=AccountOrder.RANDOM, limit=10)) == 10
+
+    for query in [MediaQuery(order_by=MediaOrder.RANDOM, limit=3), MediaCommentQuery(order_by=MediaCommentOrder.RANDOM, limit=3)]:
+        assert not sample(db, query)
+
+
+def test_sample_uniform(db):
+    counts: Counter = Counter()
+    for seed in range(500):
+        counts.update(sample(db, AccountQuery(order_by=AccountOrder.RANDOM, limit=10, seed=seed)))
+    assert len(counts) == 50
+    # every account is expected 100 times
+    assert max(counts.values()) < 200
+
+
+def test_sample_trigger(db):
+    with db.Session() as session:
+        crud.bulk_add_to_trigger(session, "sample", accounts=list(range(1, 51)))
+        session.commit()
+        trigger = crud.get_trigger(session, "sample")
+        ids = SimpleTrigger("sample", {"order": "random", "limit": 10, "seed": 1}).get_list(trigger)[0]
+        assert len(set(ids)) == 10
+        assert SimpleTrigger("sample", {"order": "random", "limit": 10, "seed": 1}).get_list(trigger)[0] == ids
+        keys = session.scalars(select(models.TriggerAccount.sample_key).where(models.TriggerAccount.trigger_id == trigger.id))
+        assert len(set(keys)) == 50
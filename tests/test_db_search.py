@@ -0,0 +1,47 @@
+from sqlalchemy import select, update
+
+from metrico.database import crud, models
+from metrico.database.query import AccountQuery, MediaCommentQuery, MediaQuery
+from tests.factories import create_account, create_comment, create_media
+
+
+CAPTIONS = ["Cooking pasta at home", "Pasta, but in the mountains", "Hiking in the mountains"]
+
+
+def search(db, query) -> list[str]:
+    return sorted(obj.identifier for obj in db.iter_query(query))
+
+
+def test_search(db):
+    medias = [create_media(index, caption, account=create_account(index, bio=f"bio about {caption}")) for index, caption in enumerate(CAPTIONS)]
+    db.create_media("search", medias[0])
+    db.ingest("search", medias[1:])
+    with db.Session() as session:
+        media = session.scalar(select(models.Media).where(models.Media.identifier == "media-0"))
+        crud.upsert_media_comments(session, media, [create_comment(0, text="Great recipe!"), create_comment(1, text="too much salt")])
+        crud.update_media(session, media, create_comment(2, text='a "recipe" with salt'))
+        session.commit()
+
+    assert search(db, MediaQuery(search="pasta")) == ["media-0", "media-1"]
+    assert search(db, MediaQuery(search="pasta mountains")) == ["media-1"]
+    assert search(db, MediaQuery(search="title-2")) == ["media-2"]
+    assert search(db, AccountQuery(search="hiking")) == ["account-2"]
+    assert search(db, MediaCommentQuery(search="recipe")) == ["comment-0", "comment-2"]
+    # no query syntax of the user input
+    assert search(db, MediaCommentQuery(search='"recipe" salt OR')) == []
+    assert search(db, MediaCommentQuery(search="   ")) == ["comment-0", "comment-1", "comment-2"]
+    assert db.count_query(MediaQuery(search="mountains", accounts="name-2")) == 1
+
+
+def test_search_sync(db):
+    db.create_media("search-sync", create_media(10, "first caption"))
+    with db.Session() as session:
+        session.execute(update(models.Media).where(models.Media.identifier == "media-10").values(info_caption="second caption"))
+        session.commit()
+    assert search(db, MediaQuery(search="first")) == []
+    assert search(db, MediaQuery(search="second")) == ["media-10"]
+
+    with db.Session() as session:
+        session.delete(session.scalar(select(models.Media).where(models.Media.identifier == "media-10")))
+        session.commit()
+    assert search(db, MediaQuery(search="second")) == []
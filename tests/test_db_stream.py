@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import event
+
+from metrico import Hunter
+from metrico.database.query import AccountOrder, AccountQuery, MediaQuery
+from tests.factories import create_media
+
+
+@pytest.fixture
+def db(db):
+    db.ingest("stream", [create_media(index, accounts=4) for index in range(30)])
+    return db
+
+
+def test_iter_yield_per(db):
+    for query in [MediaQuery(), AccountQuery(order_by=AccountOrder.COMMENTS), MediaQuery(accounts=[1, 2], limit=5)]:
+        with db.Session() as session:
+            expected = [obj.id for obj in query.iter(session)]
+            assert [obj.id for obj in query.iter(session, yield_per=7)] == expected
+            assert list(query.iter_ids(session, yield_per=7)) == expected
+
+
+def test_iter_query_ids(db):
+    options = []
+
+    def before_execute(conn, clauseelement, multiparams, params, execution_options):
+        options.append(execution_options)
+
+    event.listen(db.engine, "before_execute", before_execute)
+    try:
+        chunks = list(db.iter_query_ids(MediaQuery(), chunk_size=8))
+    finally:
+        event.remove(db.engine, "before_execute", before_execute)
+    assert [len(chunk) for chunk in chunks] == [8, 8, 8, 6]
+    assert any(option.get("yield_per") == 8 for option in options)
+
+
+def test_update_query(tmp_path):
+    hunter = Hunter(config={"db": {"url": f"sqlite:///{tmp_path / 'stream.db'}"}})
+    hunter.db.setup()
+    for data in hunter.hunters["test"].analyze("foo", amount=5):
+        hunter.db.create_account("test", data)
+
+    # the updates write while the ids are still streamed
+    updated, update_accounts = [], hunter.update_accounts
+    hunter.update_accounts = lambda account_ids, **kwargs: updated.extend(account_ids) or update_accounts(account_ids, **kwargs)
+    hunter.update_query(AccountQuery(), chunk_size=2, media_count=0)
+    with hunter.db.Session() as session:
+        assert updated == [account.id for account in AccountQuery().iter(session)]
@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta
+
+from pyyoutube import ChannelListResponse, CommentThreadListResponse, PlaylistItemListResponse, VideoListResponse
+
+from metrico import Hunter, MetricoDB, schemas
+from metrico.database import crud
+from metrico.database.models import Media
+from metrico.database.query import AccountQuery, MediaOrder, MediaQuery
+from metrico.hunting.action import update_media
+from metrico.hunting.hunters.youtube import YoutubeHunter
+
+
+class FakeApi:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+        # uploads newest first
+        self.uploads = [f"video-{index}" for index in range(4)]
+        # comment threads newest first
+        self.threads = [self.get_thread(f"thread-{index}", datetime(2023, 2, 1) - timedelta(hours=index)) for index in range(250)]
+
+    @staticmethod
+    def get_thread(identifier: str, created_at: datetime) -> dict:
+        snippet = {"textDisplay": identifier, "likeCount": 0, "publishedAt": created_at.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        return {"id": identifier, "snippet": {"topLevelComment": {"id": identifier, "snippet": snippet}, "totalReplyCount": 0}}
+
+    def get_comment_threads(self, video_id, order, count, limit, page_token=None):
+        self.calls.append([video_id, page_token])
+        offset = int(page_token or 0)
+        items = self.threads[offset : offset + min(count, limit)]
+        next_page_token = str(offset + len(items)) if offset + len(items) < len(self.threads) else None
+        return CommentThreadListResponse.from_dict({"items": items, "nextPageToken": next_page_token})
+
+    def get_video_by_id(self, video_id):
+        self.calls.append(list(video_id))
+        items = [
+            {
+                "id": identifier,
+                "snippet": {"channelId": "channel", "publishedAt": "2023-01-01T00:00:00Z", "title": identifier, "description": "description "},
+                "statistics": {"commentCount": "1", "likeCount": "2", "viewCount": "3"},
+            }
+            for identifier in video_id
+            if not identifier.startswith("missing")
+        ]
+        return VideoListResponse.from_dict({"items": items})
+
+    def get_channel_info(self, channel_id):
+        channel_id = [channel_id] if isinstance(channel_id, str) else list(channel_id)
+        self.calls.append(channel_id)
+        items = [
+            {
+                "id": identifier,
+                "snippet": {"publishedAt": "2023-01-01T00:00:00Z", "title": identifier, "description": "description"},
+                "statistics": {"videoCount": "4", "viewCount": "5", "subscriberCount": "6"},
+                "contentDetails": {"relatedPlaylists": {"uploads": f"uploads-{identifier}"}},
+            }
+            for identifier in channel_id
+            if not identifier.startswith("missing")
+        ]
+        return ChannelListResponse.from_dict({"items": items})
+
+    def get_playlist_items(self, playlist_id, count, limit, page_token=None):
+        self.calls.append([playlist_id])
+        offset = int(page_token or 0)
+        items = [{"contentDetails": {"videoId": video_id}} for video_id in self.uploads[offset : offset + min(count, limit)]]
+        next_page_token = str(offset + len(items)) if offset + len(items) < len(self.uploads) else None
+        return PlaylistItemListResponse.from_dict({"items": items, "nextPageToken": next_page_token})
+
+
+def test_youtube_medias_data():
+    hunter = YoutubeHunter({})
+    hunter.api = FakeApi()
+    identifiers = [f"video-{index}" for index in range(120)] + ["missing-0"]
+    medias = hunter.get_medias_data(identifiers)
+    assert [len(call) for call in hunter.api.calls] == [50, 50, 21]
+    assert list(medias) == identifiers
+    assert medias["missing-0"] is None
+    assert medias["video-7"].stats.likes == 2
+    assert medias["video-7"].info.caption == "description"
+    assert hunter.get_media_data("video-1").account.identifier == "channel"
+
+
+def test_youtube_accounts_data():
+    hunter = YoutubeHunter({})
+    hunter.api = FakeApi()
+    identifiers = ["missing-0"] + [f"channel-{index}" for index in range(60)]
+    accounts = hunter.get_accounts_data(identifiers)
+    assert [len(call) for call in hunter.api.calls] == [50, 11]
+    assert list(accounts) == identifiers
+    assert accounts["missing-0"] is None
+    assert accounts["channel-3"].stats.followers == 6
+    assert hunter.get_account_data("channel-1").info.name == "channel-1"
+    assert accounts["channel-3"].media_list == "uploads-channel-3"
+
+
+def test_youtube_media_list():
+    hunter = YoutubeHunter({})
+    hunter.api = FakeApi()
+    assert len(list(hunter.iter_account_media("channel-0"))) == 4
+    assert hunter.api.calls[:2] == [["channel-0"], ["uploads-channel-0"]]
+
+    # the stored media list saves the channel request
+    hunter.api.calls.clear()
+    assert len(list(hunter.iter_account_media("channel-0", amount=2, media_list="uploads-channel-0"))) == 2
+    assert hunter.api.calls == [["uploads-channel-0"], ["video-0", "video-1"]]
+
+    # one page per request, the listing stops at the first known video
+    hunter.api.uploads = [f"video-{index}" for index in range(120)]
+    hunter.api.calls.clear()
+    assert len(list(hunter.iter_account_media("channel-0", media_list="uploads-channel-0"))) == 120
+    assert [len(call) for call in hunter.api.calls] == [1, 50, 1, 50, 1, 20]
+    hunter.api.calls.clear()
+    medias = list(hunter.iter_account_media("channel-0", media_list="uploads-channel-0", known={"video-3", "video-90"}))
+    assert [media.identifier for media in medias] == ["video-0", "video-1", "video-2"]
+    assert hunter.api.calls == [["uploads-channel-0"], ["video-0", "video-1", "video-2"]]
+
+
+def test_update_accounts(tmp_path):
+    hunter = Hunter(config={"db": {"url": f"sqlite:///{tmp_path / 'batch.db'}"}})
+    hunter.db.setup()
+    for data in hunter.hunters["test"].analyze("foo", amount=5):
+        hunter.db.create_account("test", data)
+
+    calls, get_accounts_data = [], hunter.hunters["test"].get_accounts_data
+    hunter.hunters["test"].get_accounts_data = lambda identifiers: calls.append(identifiers) or get_accounts_data(identifiers)
+    hunter.update_query(AccountQuery(), batch_size=2, media_count=0)
+    assert [len(call) for call in calls] == [2, 2, 1]
+    assert hunter.db.count_query(MediaQuery()) == 50
+    assert hunter.db.count_query(AccountQuery(status=schemas.ModelStatus.FAIL)) == 0
+
+
+def test_account_media_list():
+    db = MetricoDB(config={"db": {"url": "sqlite://"}})
+    db.setup()
+    account = db.create_account("youtube", schemas.Account(identifier="channel-0", media_list="uploads-0"))
+    assert account.media_list == "uploads-0"
+    # unknown lists keep the stored one
+    db.ingest("youtube", [schemas.Account(identifier="channel-0"), schemas.Account(identifier="channel-1", media_list="uploads-1")])
+    with db.Session() as session:
+        assert [account.media_list for account in db.get_accounts([1, 2], session=session)] == ["uploads-0", "uploads-1"]
+
+
+def test_update_medias(tmp_path):
+    hunter = Hunter(config={"db": {"url": f"sqlite:///{tmp_path / 'batch.db'}"}})
+    hunter.db.setup()
+    for data in hunter.hunters["test"].analyze("foo", amount=2):
+        hunter.db.create_account("test", data)
+    for account_id in [1, 2]:
+        hunter.update_account(account_id, media_count=0)
+    media_count = hunter.db.count_query(MediaQuery())
+    assert media_count == 20
+
+    calls, get_medias_data = [], hunter.hunters["test"].get_medias_data
+    hunter.hunters["test"].get_medias_data = lambda identifiers: calls.append(identifiers) or get_medias_data(identifiers)
+    hunter.update_query(MediaQuery(), batch_size=8)
+    assert [len(call) for call in calls] == [8, 8, 4]
+    assert hunter.db.count_query(MediaQuery(status=schemas.ModelStatus.FAIL)) == 0
+
+
+def test_youtube_comments():
+    hunter = YoutubeHunter({})
+    hunter.api = FakeApi()
+    assert len(list(hunter.iter_media_comments("video-0"))) == 250
+    assert [call[1] for call in hunter.api.calls] == [None, "100", "200"]
+
+    hunter.api.calls.clear()
+    assert len(list(hunter.iter_media_comments("video-0", amount=120))) == 120
+    assert [call[1] for call in hunter.api.calls] == [None, "100"]
+
+    # newest first, stop at the mark
+    hunter.api.calls.clear()
+    comments = list(hunter.iter_media_comments("video-0", since=datetime(2023, 2, 1) - timedelta(hours=9)))
+    assert [comment.identifier for comment in comments] == [f"thread-{index}" for index in range(10)]
+    assert len(hunter.api.calls) == 1
+
+
+def test_update_media_comments_incremental():
+    db = MetricoDB(config={"db": {"url": "sqlite://"}})
+    db.setup()
+    hunter = YoutubeHunter({})
+    hunter.api = FakeApi()
+    hunters = {"youtube": hunter}
+
+    def update(comments: int):
+        hunter.api.calls.clear()
+        with db.Session() as session:
+            media = crud.get_medias(session, [1])[0]
+            update_media(session, hunters, media, comment_count=-2, data=schemas.Media(identifier="video-0", media_type=schemas.MediaType.VIDEO, account=None, stats=schemas.MediaStats(comments=comments)))
+            session.commit()
+            return media.comments_count, media.comments_synced_at, len(hunter.api.calls)
+
+    with db.Session() as session:
+        account = crud.create_account(session, "youtube", schemas.Account(identifier="channel-0"))
+        crud.create_media(session, account, schemas.Media(identifier="video-0", media_type=schemas.MediaType.VIDEO, account=None))
+        session.commit()
+
+    # no mark -> all comments
+    count, synced_at, calls = update(250)
+    assert (count, calls) == (250, 3)
+    assert synced_at is not None
+
+    # three new comments, the mark stops the hunter on the first page
+    now = datetime.utcnow()
+    hunter.api.threads[:0] = [hunter.api.get_thread(f"new-{index}", now - timedelta(minutes=index)) for index in range(3)]
+    assert update(253)[0::2] == (253, 1)
+    assert update(253)[0::2] == (253, 0)
+
+    # without a usable mark the first stored comment stops the update
+    with db.Session() as session:
+        crud.get_medias(session, [1])[0].comments_synced_at = datetime(2000, 1, 1)
+        session.commit()
+    hunter.api.threads[:0] = [hunter.api.get_thread("new-3", now)]
+    assert update(254)[0::2] == (254, 1)
+
+
+def test_update_account_medias_incremental(tmp_path):
+    hunter = Hunter(config={"db": {"url": f"sqlite:///{tmp_path / 'batch.db'}"}})
+    hunter.db.setup()
+    test_hunter = hunter.hunters["test"]
+    hunter.db.create_account("test", next(test_hunter.analyze("foo", amount=1)))
+    hunter.update_account(1, media_count=0)
+    assert hunter.db.count_query(MediaQuery()) == 10
+
+    # only the two new medias are loaded
+    test_hunter.accounts[0].stats.medias += 2
+    yielded, iter_account_media = [], test_hunter.iter_account_media
+    test_hunter.iter_account_media = lambda *args, **kwargs: (yielded.append(item.identifier) or item for item in iter_account_media(*args, **kwargs))
+    hunter.update_account(1, media_count=-2)
+    assert yielded == ["0:11", "0:10"]
+    assert hunter.db.count_query(MediaQuery()) == 12
+
+    # nothing to do
+    yielded.clear()
+    hunter.update_account(1, media_count=-2)
+    assert not yielded
+
+    # the stored medias are updated by age
+    assert MediaQuery(order_by=MediaOrder.UPDATED).get_order_field() is Media.stats_last_update
@@ -0,0 +1,118 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+import requests
+
+from metrico.hunting.hunters.youtube import YoutubeHunter
+from metrico.hunting.response_cache import CachedSession, ResponseCache
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests: list[str] = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.requests.append(self.path)
+        body = json.dumps({"items": [{"id": "video-0", "path": self.path.split("?")[0]}]}).encode()
+        etag = f'"{self.path.split("?")[0]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    StubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_response_cache(server, tmp_path):
+    now = [1000.0]
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), ttl=60, ttls={"comments": 0}, clock=lambda: now[0])
+    session = CachedSession(cache)
+
+    # the credentials are not part of the key
+    assert session.get(f"{server}videos", params={"id": "1", "key": "a"}).json()["items"][0]["path"] == "/videos"
+    assert session.get(f"{server}videos", params={"key": "b", "id": "1"}).json()["items"][0]["path"] == "/videos"
+    assert len(StubHandler.requests) == 1
+
+    # expired, revalidated with the etag
+    now[0] += 61
+    response = session.get(f"{server}videos", params={"id": "1"})
+    assert response.status_code == 200 and response.json()["items"][0]["id"] == "video-0"
+    assert len(StubHandler.requests) == 2
+    session.get(f"{server}videos", params={"id": "1"})
+    assert len(StubHandler.requests) == 2
+
+    # ttl 0 of the endpoint
+    session.get(f"{server}comments")
+    session.get(f"{server}comments")
+    assert len(StubHandler.requests) == 4
+
+    assert (cache.stats.hits, cache.stats.revalidated, cache.stats.misses) == (2, 1, 1)
+    assert cache.stats.hit_ratio == 0.75
+
+    # persisted in the file
+    assert ResponseCache(path=str(tmp_path / "cache.db")).get(f"{server}videos?id=1") is not None
+
+
+def test_response_cache_eviction(server):
+    now = [0.0]
+    size = len(requests.get(f"{server}channels", timeout=5).content)
+    cache = ResponseCache(max_size=2 * size, clock=lambda: now[0])
+    session = CachedSession(cache)
+    for index in range(3):
+        now[0] += 1
+        session.get(f"{server}channels", params={"id": str(index)})
+    assert cache.stats.evictions == 1
+    assert cache.size() <= 2 * size
+    assert cache.get(f"{server}channels?id=0") is None
+
+    # the least recently used is evicted, not the oldest
+    now[0] += 1
+    session.get(f"{server}channels", params={"id": "1"})
+    session.get(f"{server}channels", params={"id": "3"})
+    assert cache.get(f"{server}channels?id=1") is not None
+    assert cache.get(f"{server}channels?id=2") is None
+
+
+def test_response_cache_threads(server):
+    cache = ResponseCache()
+    session = CachedSession(cache)
+    session.get(f"{server}videos", params={"id": "threads"})
+
+    def get():
+        for _ in range(20):
+            session.get(f"{server}videos", params={"id": "threads"})
+
+    threads = [Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (cache.stats.misses, cache.stats.hits) == (1, 160)
+
+
+def test_youtube_hunter_cache(server):
+    hunter = YoutubeHunter({"key": "key", "cache": {"ttl": 60}})
+    hunter.api.BASE_URL = server
+    assert hunter.api.get_video_by_id(video_id="video-0").items[0].id == "video-0"
+    assert hunter.api.get_video_by_id(video_id="video-0").items[0].id == "video-0"
+    assert len(StubHandler.requests) == 1
+    assert hunter.cache.stats.hits == 1
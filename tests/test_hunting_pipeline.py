@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from metrico import Hunter, MetricoDB, schemas
+from metrico.database import crud
+from metrico.database.query import AccountQuery, MediaCommentQuery, MediaQuery
+from metrico.hunting.pipeline import Pipeline
+from tests.factories import create_account
+
+
+def test_pipeline(tmp_path):
+    db = MetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'pipeline.db'}"}})
+    written: list[tuple[int, int]] = []
+    pipeline = Pipeline(
+        fetch=lambda task: [(task, index) for index in range(task)],
+        write=lambda session, item: written.append(item),
+        session_factory=db.Session,
+        fetchers=3,
+        batch_size=4,
+    )
+    stats = pipeline.run(range(10))
+    assert sorted(written) == sorted((task, index) for task in range(10) for index in range(task))
+    # the items of a task keep their order
+    assert [item for item in written if item[0] == 7] == [(7, index) for index in range(7)]
+    assert stats.fetch.items == stats.write.items == 45
+    assert stats.commits >= 12
+    assert not stats.interrupted
+
+
+def test_pipeline_backpressure(tmp_path):
+    db = MetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'pipeline.db'}"}})
+    pipeline = Pipeline(
+        fetch=lambda task: range(task),
+        write=lambda session, item: time.sleep(0.01),
+        session_factory=db.Session,
+        fetchers=2,
+        queue_size=2,
+        batch_size=5,
+        max_latency=0.01,
+    )
+    stats = pipeline.run([20, 20])
+    assert stats.write.items == 40
+    assert stats.max_queue <= 2
+    # the fetchers waited for the slow writer
+    assert stats.fetch.blocked > stats.fetch.busy
+
+
+def test_pipeline_interrupt(tmp_path):
+    db = MetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'pipeline.db'}"}})
+    written: list[int] = []
+
+    def tasks():
+        yield 3
+        yield 3
+        time.sleep(0.1)
+        raise KeyboardInterrupt()
+
+    pipeline = Pipeline(fetch=range, write=lambda session, item: written.append(item), session_factory=db.Session, fetchers=2)
+    stats = pipeline.run(tasks())
+    assert stats.interrupted
+    # the fetched items are still written
+    assert sorted(written) == [0, 0, 1, 1, 2, 2]
+
+
+def test_pipeline_broken_item(tmp_path):
+    db = MetricoDB(config={"db": {"url": f"sqlite:///{tmp_path / 'pipeline.db'}"}})
+    db.setup()
+    with db.Session() as session:
+        for index in range(3):
+            crud.create_account(session, "test", schemas.Account(identifier=f"account-{index}"))
+        session.commit()
+
+    def write(session, item: schemas.Account | str):
+        if item == "broken":
+            raise RuntimeError(item)
+        crud.create_account(session, "test", item)
+
+    pipeline = Pipeline(fetch=lambda task: [create_account(0), create_account(1), "broken", create_account(2)], write=write, session_factory=db.Session)
+    stats = pipeline.run([0])
+    # the batch fails, the items are written one by one
+    assert stats.write.items == 3 and stats.write.errors == 1
+    with db.Session() as session:
+        accounts = [db.get_account(account_id, session=session) for account_id in range(1, 4)]
+        # the account cache of the rolled back batch does not skip the data
+        assert all(account.info.count() == account.stats.count() == 1 for account in accounts)
+        assert [account.info_name for account in accounts] == ["name-0", "name-1", "name-2"]
+
+
+def test_update_pipeline(tmp_path):
+    hunter = Hunter(config={"db": {"url": f"sqlite:///{tmp_path / 'pipeline.db'}"}})
+    hunter.db.setup()
+    for data in hunter.hunters["test"].analyze("foo", amount=3):
+        hunter.db.create_account("test", data)
+
+    stats = hunter.update_pipeline(AccountQuery(), fetchers=2, batch_size=2, write_batch_size=20, media_count=0, comment_count=0, subscription_count=-1)
+    assert stats.fetch.errors == stats.write.errors == 0
+    assert hunter.db.count_query(MediaQuery()) == 30
+    # the test hunter disables the comments of some medias
+    comments = sum(media.stats.comments for medias in hunter.hunters["test"].medias for media in medias if not media.info.disable_comments)
+    assert hunter.db.count_query(MediaCommentQuery()) == comments
+    assert hunter.db.stats()["Media-Comment"] == comments
+    with hunter.db.Session() as session:
+        medias = [media for media in hunter.db.get_medias(list(range(1, 31)), session=session) if not media.info_disable_comments]
+        assert all(media.comments_count == 10 and media.comments_synced_at is not None for media in medias)
+
+    # nothing changed, the medias are updated without their comments
+    stats = hunter.update_pipeline(MediaQuery(), fetchers=2, batch_size=8, comment_count=-2)
+    assert stats.write.items == 30
+    assert hunter.db.count_query(MediaQuery(status=schemas.ModelStatus.FAIL)) == 0
+    assert hunter.db.count_query(MediaCommentQuery()) == comments
+
+
+def test_update_pipeline_in_memory():
+    hunter = Hunter(config={"db": {"url": "sqlite://"}})
+    hunter.db.setup()
+    with pytest.raises(ValueError, match="database file"):
+        hunter.update_pipeline(AccountQuery())
+    assert not Hunter(config={"db": {"url": "sqlite:///pipeline.db"}}).db.in_memory
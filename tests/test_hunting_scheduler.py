@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from metrico import Hunter
+from metrico.database import models
+from metrico.hunting.scheduler import UpdateScheduler, get_priority
+from metrico.utils.quota import QuotaExceeded
+
+
+def create_hunter(tmp_path, accounts: int = 3) -> Hunter:
+    hunter = Hunter(config={"db": {"url": f"sqlite:///{tmp_path / 'scheduler.db'}"}})
+    hunter.db.setup()
+    for data in hunter.hunters["test"].analyze("foo", amount=accounts):
+        hunter.db.create_account("test", data)
+    hunter.update_accounts(list(range(1, accounts + 1)), media_count=0)
+    return hunter
+
+
+def set_stats(hunter: Hunter, model, obj_id: int, hours: float, growth: float = 0.0):
+    with hunter.db.Session() as session:
+        last_update = datetime.utcnow() - timedelta(hours=hours)
+        session.execute(update(model).where(model.id == obj_id).values(stats_last_update=last_update, stats_growth=growth))
+        session.commit()
+
+
+def test_priority():
+    now = datetime.utcnow()
+    assert get_priority(now - timedelta(hours=2), 0.0, now) == 2
+    assert get_priority(now - timedelta(hours=2), 0.5, now, weight=2, growth_factor=10) == 24
+    # shrinking objects are not punished below their staleness
+    assert get_priority(now - timedelta(hours=2), -0.5, now) == 2
+    assert get_priority(now + timedelta(hours=1), 1.0, now) == 0
+    assert get_priority(now - timedelta(hours=1), None, now) == 1
+
+
+def test_scheduler_queue(tmp_path):
+    hunter = create_hunter(tmp_path)
+    set_stats(hunter, models.Account, 1, hours=10)
+    set_stats(hunter, models.Account, 2, hours=2, growth=1.0)
+    set_stats(hunter, models.Media, 1, hours=5)
+
+    scheduler = UpdateScheduler(hunter, round_size=10)
+    assert [(item.kind, item.id) for item in scheduler.get_queue()] == [("account", 2), ("account", 1), ("media", 1)]
+    # account 3 and the other medias were updated just now
+    assert UpdateScheduler(hunter, min_age=3 * 3600).get_queue()[-1].id == 1
+    assert [item.kind for item in UpdateScheduler(hunter, weights={"account": 0}).get_queue()] == ["media"]
+    assert len(UpdateScheduler(hunter, round_size=1).get_queue()) == 1
+    # only the stalest object of each kind has a priority, the growing account 2 waits
+    assert [(item.kind, item.id) for item in UpdateScheduler(hunter, candidates=1).get_queue()] == [("account", 1), ("media", 1)]
+
+
+def test_scheduler_round(tmp_path):
+    hunter = create_hunter(tmp_path)
+    set_stats(hunter, models.Account, 1, hours=10)
+    set_stats(hunter, models.Media, 1, hours=10)
+    with hunter.db.Session() as session:
+        views = hunter.db.get_account(1, session=session).stats_views
+
+    scheduler = UpdateScheduler(hunter, concurrency=2, account_kwargs={"media_count": -1})
+    summary = scheduler.run_round()
+    assert summary.success
+    assert sorted((result.item.kind, result.item.id) for result in summary.results) == [("account", 1), ("media", 1)]
+    with hunter.db.Session() as session:
+        account = hunter.db.get_account(1, session=session)
+        assert account.stats_last_update > datetime.utcnow() - timedelta(hours=1)
+        # about 10 hours between the updates
+        assert abs(account.stats_growth - (account.stats_views - views) / max(views, 1) / (10 / 24)) < 0.01
+    # nothing is due anymore
+    assert not scheduler.run_round().results
+
+
+def test_scheduler_quota(tmp_path):
+    hunter = create_hunter(tmp_path)
+    for account_id in range(1, 4):
+        set_stats(hunter, models.Account, account_id, hours=account_id)
+    calls: list[int] = []
+
+    def update_account(account_id: int, **kwargs):
+        calls.append(account_id)
+        raise QuotaExceeded()
+
+    hunter.update_account = update_account
+    now = [0.0]
+    scheduler = UpdateScheduler(
+        hunter, concurrency=1, weights={"media": 0}, pause=100, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds)
+    )
+    summary = scheduler.run_round()
+    # the first update pauses the scheduler
+    assert calls == [3]
+    assert [item.id for item in summary.failed] == [3]
+    assert scheduler.paused
+    # the wait for the end of the pause is not a round
+    scheduler.run(rounds=1)
+    assert calls == [3, 3] and now[0] == 100
+    assert scheduler.paused
+
+
+def test_scheduler_backoff(tmp_path):
+    hunter = create_hunter(tmp_path)
+    for account_id in range(1, 4):
+        set_stats(hunter, models.Account, account_id, hours=account_id)
+    calls: list[int] = []
+
+    def update_account(account_id: int, **kwargs):
+        calls.append(account_id)
+        if account_id == 3:
+            raise RuntimeError("broken")
+        set_stats(hunter, models.Account, account_id, hours=0)
+
+    hunter.update_account = update_account
+    now = [0.0]
+    scheduler = UpdateScheduler(hunter, concurrency=1, round_size=1, weights={"media": 0}, backoff=10, clock=lambda: now[0])
+    # the failing account has the highest priority, but it does not take every round
+    for _ in range(3):
+        scheduler.run_round()
+    assert calls == [3, 2, 1]
+    assert scheduler.failures == {("account", 3): (1, 10.0)}
+
+    now[0] = 10
+    calls.clear()
+    scheduler.run_round()
+    scheduler.run_round()
+    # the backoff doubles, the other accounts are not due yet
+    assert calls == [3] and scheduler.failures == {("account", 3): (2, 30.0)}
+
+
+def test_scheduler_run(tmp_path):
+    hunter = create_hunter(tmp_path)
+    for account_id in range(1, 4):
+        set_stats(hunter, models.Account, account_id, hours=account_id)
+    calls: list[int] = []
+
+    def update_account(account_id: int, **kwargs):
+        calls.append(account_id)
+        set_stats(hunter, models.Account, account_id, hours=0)
+
+    hunter.update_account = update_account
+    now = [0.0]
+    scheduler = UpdateScheduler(
+        hunter, concurrency=1, round_size=1, weights={"media": 0}, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds)
+    )
+    scheduler.paused_until = 50
+    # only the rounds with updates count
+    scheduler.run(rounds=2)
+    assert calls == [3, 2] and now[0] == 50
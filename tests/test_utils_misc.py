@@ -0,0 +1,57 @@
+import threading
+import time
+
+from metrico.utils.misc import RunResult, RunSummary, run_all, update_list
+
+
+def test_run_all():
+    lock, running, max_running = threading.Lock(), [0], [0]
+
+    def func(item: int, fail: int = -1):
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        if item == fail:
+            raise ValueError(item)
+        return item * 2
+
+    progress: list[int] = []
+    summary = run_all(func, range(20), workers=4, progress=lambda result, done: progress.append(done), fail=7)
+    assert max_running[0] == 4
+    assert sorted(result.value for result in summary.results if result.ok) == [item * 2 for item in range(20) if item != 7]
+    assert summary.failed == [7]
+    assert isinstance(next(result.error for result in summary.results if not result.ok), ValueError)
+    assert progress == list(range(1, 21))
+    assert not summary.success and not summary
+
+    # the current thread without workers
+    summary = run_all(func, range(5), fail=10)
+    assert [result.value for result in summary.results] == [0, 2, 4, 6, 8]
+    assert summary and max_running[0] == 4
+
+
+def test_run_all_budget():
+    for workers in [1, 2]:
+        summary = run_all(time.sleep, [0.05] * 10, workers=workers, budget=0.12)
+        assert 0 < len(summary.results) < 10
+        assert len(summary.results) + len(summary.skipped) == 10
+        assert not summary.failed and not summary.success
+
+
+def test_run_summary():
+    summary = RunSummary(results=[RunResult(item, seconds=item / 10) for item in range(1, 11)])
+    assert summary.percentile(50) == 0.5
+    assert summary.percentile(90) == 0.9
+    assert summary.percentile(99) == 1.0
+    assert RunSummary().percentile(50) == 0.0
+    assert "10 succeeded, 0 failed, 0 skipped" in str(summary)
+
+
+def test_update_list():
+    updated: list[int] = []
+    summary = update_list([1, 2, 3], lambda obj_id, value: updated.append(obj_id * value), threads=2, value=10)
+    assert sorted(updated) == [10, 20, 30]
+    assert summary.succeeded and summary.success
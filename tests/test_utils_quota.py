@@ -0,0 +1,198 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from metrico.utils.quota import QuotaExceeded, QuotaLedger, TokenBucket, get_key_id
+from metrico.utils.wrappers import KeyPool, MultiObjCaller, iter_pages
+
+
+class FakeApi:
+    def __init__(self, key: str):
+        self.key = key
+        self.calls = 0
+
+    def search(self, fail: str | None = None):
+        self.calls += 1
+        if fail == self.key or fail == "all":
+            raise Exception("The request cannot be completed because you have exceeded your quota.")
+        if fail == "error":
+            raise Exception("Oh no...")
+        return self.key
+
+    def list_items(self, count: int, limit: int, page_token: str | None = None, total: int = 250):
+        """Pages of a list with total items, like pyyoutube"""
+        self.calls += 1
+        start = int(page_token or 0)
+        end = min(start + min(count, limit), total)
+        return SimpleNamespace(items=list(range(start, end)), nextPageToken=str(end) if end < total else None)
+
+    def block(self, events: dict[str, threading.Event]):
+        events[self.key].wait(timeout=5)
+        return self.key
+
+
+def test_token_bucket():
+    now, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(6):
+        bucket.acquire()
+    # the burst of 2, afterwards one token every 0.5 seconds
+    assert sleeps == [0.5, 0.5, 0.5, 0.5]
+    assert now[0] == 2
+
+
+def test_quota_ledger(tmp_path):
+    now = [86400.0 * 10 + 9 * 3600]
+    ledger = QuotaLedger(path=str(tmp_path / "quota.db"), daily_limit=100, clock=lambda: now[0])
+    ledger.add("a", 60)
+    ledger.add("a", 30)
+    ledger.add("b", 10)
+    ledger.exhaust("c")
+    assert ledger.get_remaining(["a", "b", "c", "d"]) == {"a": 10, "b": 90, "d": 100}
+    ledger.add("a", 10)
+    assert "a" not in ledger.get_remaining(["a"])
+
+    # shared by all processes
+    other = QuotaLedger(path=str(tmp_path / "quota.db"), daily_limit=100, clock=lambda: now[0])
+    assert other.get_remaining(["a", "b", "c"]) == {"b": 90}
+
+    # reset at 8:00 UTC
+    now[0] += 22 * 3600
+    assert other.get_remaining(["a", "b", "c"]) == {"b": 90}
+    now[0] += 2 * 3600
+    assert other.get_remaining(["a", "b", "c"]) == {"a": 100, "b": 100, "c": 100}
+
+
+def test_multi_obj_caller():
+    keys = [{"key": "a"}, {"key": "b"}, {"key": "c"}]
+    ledger = QuotaLedger(daily_limit=100)
+    ledger.add(get_key_id({"key": "b"}), 50)
+    ledger.add(get_key_id({"key": "c"}), 40)
+    api = MultiObjCaller(FakeApi, keys, quota=ledger, costs={"search": 10})
+
+    # the key with the most remaining quota
+    assert [api.search() for _ in range(3)] == ["a", "a", "a"]
+    assert ledger.get_remaining(list(api.kwargs)) == {get_key_id({"key": "a"}): 70, get_key_id({"key": "b"}): 50, get_key_id({"key": "c"}): 60}
+
+    # an exceeded key is skipped, the call is retried with the next key
+    assert api.search(fail="a") == "c"
+    assert "a" not in [api.search() for _ in range(5)]
+    assert api.search(fail="error") is None
+
+    # no endless loop if all keys are exceeded, every remaining key is tried once
+    calls = sum(obj.calls for obj in api.objs.values())
+    with pytest.raises(QuotaExceeded):
+        api.search(fail="all")
+    assert sum(obj.calls for obj in api.objs.values()) == calls + 2
+
+
+class SlowApi(FakeApi):
+    lock = threading.Lock()
+    in_flight: dict[str, int] = {}
+    max_in_flight: dict[str, int] = {}
+
+    def wait(self, barrier: threading.Barrier | None = None):
+        with self.lock:
+            self.in_flight[self.key] = self.in_flight.get(self.key, 0) + 1
+            self.max_in_flight[self.key] = max(self.max_in_flight.get(self.key, 0), self.in_flight[self.key])
+        if barrier is not None:
+            barrier.wait(timeout=5)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight[self.key] -= 1
+        return self.key
+
+
+def test_key_pool_concurrency():
+    pool = KeyPool(SlowApi, [{"key": "a"}, {"key": "b"}, {"key": "c"}], concurrency=1)
+
+    # the barrier only breaks if the three calls run at the same time
+    barrier = threading.Barrier(3)
+    results: list[str] = []
+    threads = [threading.Thread(target=lambda: results.append(pool.wait(barrier))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == ["a", "b", "c"]
+
+    # more threads than slots, they wait for a free key
+    SlowApi.max_in_flight.clear()
+    threads = [threading.Thread(target=pool.wait) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SlowApi.max_in_flight == {"a": 1, "b": 1, "c": 1}
+    assert all(health.in_flight == 0 for health in pool.health.values())
+
+
+def test_key_pool_health():
+    now = [0.0]
+    keys = [{"key": "a"}, {"key": "b"}, {"key": "c"}]
+    pool = KeyPool(FakeApi, keys, max_error_rate=0.1, cooldown=60, clock=lambda: now[0])
+    key_a = get_key_id({"key": "a"})
+
+    # the calls are spread over the keys
+    assert sorted(pool.search() for _ in range(3)) == ["a", "b", "c"]
+
+    # a failing key gets a lower score and is unhealthy until the cooldown is over
+    assert pool.search(fail="error") is None
+    assert pool.health[key_a].errors == 1
+    assert not pool.is_healthy(key_a)
+    assert "a" not in [pool.search() for _ in range(6)]
+    now[0] += 60
+    assert pool.is_healthy(key_a)
+    assert pool.health[key_a].score < pool.health[get_key_id({"key": "b"})].score
+
+    # the quota errors exhaust the keys like MultiObjCaller
+    assert pool.search(fail="b") in ["a", "c"]
+    with pytest.raises(QuotaExceeded):
+        pool.search(fail="all")
+
+
+def test_iter_pages():
+    ledger = QuotaLedger()
+    api = KeyPool(FakeApi, [{"key": "a"}], quota=ledger, costs={"list_items": 3})
+    key_a = get_key_id({"key": "a"})
+
+    # every page is a request with its own quota cost
+    assert [len(page.items) for page in iter_pages(api.list_items, 100)] == [100, 100, 50]
+    assert ledger.get_remaining([key_a]) == {key_a: -9}
+    assert [len(page.items) for page in iter_pages(api.list_items, 100, amount=150)] == [100, 50]
+    assert [len(page.items) for page in iter_pages(api.list_items, 100, total=0)] == [0]
+    assert ledger.get_remaining([key_a]) == {key_a: -18}
+
+
+def test_key_pool_wait_quota():
+    ledger = QuotaLedger()
+    pool = KeyPool(FakeApi, [{"key": "a"}, {"key": "b"}], concurrency=1, quota=ledger)
+    events = {"a": threading.Event(), "b": threading.Event()}
+    results: list[str] = []
+    threads = [threading.Thread(target=lambda: results.append(pool.block(events))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while sum(health.in_flight for health in pool.health.values()) < 2:
+        time.sleep(0.01)
+
+    # both keys are busy, the call waits for a free key
+    waiting = threading.Thread(target=lambda: results.append(pool.search()))
+    waiting.start()
+    time.sleep(0.05)
+    # the quota of b is exceeded in the meantime, the free key b is not used
+    ledger.exhaust(get_key_id({"key": "b"}))
+    events["b"].set()
+    threads[0].join(timeout=0.1)
+    time.sleep(0.05)
+    assert results == ["b"]
+    events["a"].set()
+    for thread in [*threads, waiting]:
+        thread.join()
+    assert results == ["b", "a", "a"]